@@ -3,6 +3,13 @@ ASGI config for FinGest project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Se sirve junto al WSGI (FinGest/wsgi.py) para las vistas asíncronas de larga duración,
+como el stream de notificaciones (alertas_notificaciones/stream/): con ASGI cada pestaña
+abierta es una conexión en espera en el event loop en lugar de un hilo o de un sondeo
+periódico. Por ejemplo, con el proxy enviando esa ruta a:
+
+    uvicorn FinGest.asgi:application --port 8001
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
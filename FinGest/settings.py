@@ -36,6 +36,41 @@ EMAIL_HOST_USER = config("EMAIL_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_PASS")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Entrega de notificaciones: 'cola' las deja pendientes para `manage.py procesar_notificaciones`;
+# 'inmediata' las entrega al confirmar la transacción (desarrollo sin worker)
+NOTIFICACIONES_ENTREGA = config("NOTIFICACIONES_ENTREGA", default="cola")
+# Mensajes enviados por una misma conexión SMTP antes de renovarla
+EMAIL_MAX_POR_CONEXION = config("EMAIL_MAX_POR_CONEXION", default=50, cast=int)
+
+# Generación de reportes: 'cola' deja los trabajos para `manage.py procesar_reportes`;
+# 'inmediata' los procesa al confirmar la transacción (desarrollo sin worker)
+REPORTES_GENERACION = config("REPORTES_GENERACION", default="cola")
+# Tamaño máximo de la caché en disco de archivos exportados (MEDIA_ROOT/cache_reportes)
+REPORTES_CACHE_MAX_MB = config("REPORTES_CACHE_MAX_MB", default=200, cast=int)
+
+# Caché de Django. LocMemCache es por proceso: con ese backend las cachés que deben estar
+# siempre al día no se usan y se consulta la base (ver core/cache.py). Para aprovecharlas
+# usar un backend compartido (p. ej. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# y CACHE_LOCATION=/var/tmp/fingest_cache)
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="fingest"),
+    }
+}
+# Segundos que se conservan los agregados por usuario en caché (dashboard, reportes...);
+# los cambios de datos los invalidan antes, el TTL sólo desaloja versiones viejas
+FINANZAS_CACHE_TIMEOUT = config("FINANZAS_CACHE_TIMEOUT", default=300, cast=int)
+# Segundos que vive el contador de notificaciones no leídas en caché: al vencer se vuelve
+# a contar en la base, lo que corrige cualquier desvío de los incrementos. Sólo se usa con
+# un backend compartido; con LocMemCache se cuenta en la base en cada lectura
+NOTIFICACIONES_CONTADOR_TIMEOUT = config("NOTIFICACIONES_CONTADOR_TIMEOUT", default=300, cast=int)
+# Segundos entre consultas del stream de notificaciones (SSE) cuando no hay LISTEN/NOTIFY
+# (bases que no son PostgreSQL o conexión de LISTEN caída)
+NOTIFICACIONES_SSE_SONDEO = config("NOTIFICACIONES_SSE_SONDEO", default=5, cast=int)
+# Hilos (y por lo tanto conexiones a la base) que comparten todos los streams SSE de un proceso
+NOTIFICACIONES_SSE_HILOS = config("NOTIFICACIONES_SSE_HILOS", default=4, cast=int)
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -66,6 +101,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 ]
 
 MIDDLEWARE = [
@@ -155,6 +191,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Archivos generados (reportes exportados); se descargan a través de vistas con login
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
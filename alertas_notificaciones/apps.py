@@ -4,3 +4,5 @@ from django.apps import AppConfig
 class AlertasNotificacionesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "alertas_notificaciones"
+    def ready(self):
+        import alertas_notificaciones.signals
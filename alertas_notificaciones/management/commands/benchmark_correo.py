@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.mail import get_connection
+from alertas_notificaciones.services import EmailService
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Compara el envío de correos con una conexión por mensaje frente a conexiones reutilizadas. '
+        'Usar contra un servidor SMTP local de pruebas (p. ej. `python -m aiosmtpd -n -l localhost:8025`) '
+        'o con --backend locmem'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensajes', type=int, default=200, help='Cantidad de correos a enviar')
+        parser.add_argument('--max-por-conexion', type=int, default=50, help='Mensajes por conexión SMTP')
+        parser.add_argument('--host', default='localhost', help='Servidor SMTP de pruebas')
+        parser.add_argument('--port', type=int, default=8025, help='Puerto del servidor SMTP de pruebas')
+        parser.add_argument(
+            '--backend',
+            choices=['smtp', 'locmem'],
+            default='smtp',
+            help='smtp (servidor de pruebas indicado) o locmem (en memoria, sin red)',
+        )
+        parser.add_argument('--destinatario', default='benchmark@fingest.local')
+
+    def handle(self, *args, **options):
+        if options['mensajes'] < 1:
+            raise CommandError('--mensajes debe ser mayor a 0')
+
+        if options['backend'] == 'smtp':
+            backend = {
+                'backend': 'django.core.mail.backends.smtp.EmailBackend',
+                'host': options['host'],
+                'port': options['port'],
+                'username': '',
+                'password': '',
+                'use_tls': False,
+                'use_ssl': False,
+                'timeout': 10,
+            }
+        else:
+            backend = {'backend': 'django.core.mail.backends.locmem.EmailBackend'}
+
+        mensajes = [
+            EmailService.crear_mensaje(
+                f'Benchmark {i}',
+                f'Mensaje de prueba {i}',
+                [options['destinatario']],
+                html=f'<p>Mensaje de prueba <strong>{i}</strong></p>',
+            )
+            for i in range(options['mensajes'])
+        ]
+
+        # Patrón anterior: send_mail abre y cierra una conexión por mensaje
+        inicio = time.perf_counter()
+        fallidos = 0
+        for mensaje in mensajes:
+            try:
+                conexion = get_connection(fail_silently=False, **backend)
+                conexion.send_messages([mensaje])
+            except Exception as e:
+                fallidos += 1
+                if fallidos == 1:
+                    self.stderr.write(f'   ⚠️  {e}')
+        duracion_individual = time.perf_counter() - inicio
+        enviados_individual = len(mensajes) - fallidos
+
+        # Conexiones reutilizadas
+        inicio = time.perf_counter()
+        reporte = EmailService.enviar_lote(mensajes, options['max_por_conexion'], **backend)
+        duracion_lote = time.perf_counter() - inicio
+
+        self.stdout.write(f"📊 {len(mensajes)} correos ({options['backend']})")
+        self.stdout.write(
+            f'   Una conexión por mensaje: {enviados_individual} enviados, {fallidos} fallidos, '
+            f'{len(mensajes)} conexiones, {duracion_individual:.2f}s '
+            f'({enviados_individual / duracion_individual:.1f} mensajes/s)'
+        )
+        self.stdout.write(
+            f"   Conexiones reutilizadas:  {reporte['enviados']} enviados, {reporte['fallidos']} fallidos, "
+            f"{reporte['conexiones']} conexiones, {duracion_lote:.2f}s "
+            f"({reporte['enviados'] / duracion_lote:.1f} mensajes/s)"
+        )
+        if duracion_lote:
+            self.stdout.write(self.style.SUCCESS(f'✅ Aceleración: x{duracion_individual / duracion_lote:.1f}'))
@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from alertas_notificaciones.models import Notificacion, PlantillaNotificacion
+from alertas_notificaciones.services import EmailService, PlantillaCache
+from cuentas.models import Moneda
+from usuarios.models import Usuario
+import time
+
+class Command(BaseCommand):
+    help = 'Compara el render de plantillas de notificación anterior (consulta + str.replace) con el compilado en caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notificaciones', type=int, default=10000, help='Cantidad de notificaciones a renderizar')
+
+    def handle(self, *args, **options):
+        cantidad = options['notificaciones']
+        if cantidad < 1:
+            raise CommandError('--notificaciones debe ser mayor a 0')
+
+        plantilla = PlantillaNotificacion.objects.filter(activa=True).select_related('tipo_notificacion').first()
+        if plantilla is None:
+            raise CommandError('No hay plantillas activas (ejecuta `manage.py crear_tipos_notificaciones`)')
+
+        # Notificaciones en memoria: el benchmark no escribe en la base de datos
+        usuario = Usuario(nombres='Benchmark', correo='benchmark@fingest.local', id_moneda=Moneda(simbolo='S/'))
+        ahora = timezone.now()
+        notificaciones = [
+            Notificacion(
+                usuario=usuario,
+                tipo_notificacion=plantilla.tipo_notificacion,
+                titulo=f'Notificación {i}',
+                mensaje=f'Mensaje de prueba número {i}',
+                categoria='Metas',
+                fecha_creacion=ahora,
+                datos_adicionales={
+                    'meta_nombre': f'Meta {i % 50}',
+                    'meta_objetivo': 1500,
+                    'aporte_monto': 25.5,
+                    'progreso_actual': i % 100,
+                    'monto_faltante': 300,
+                    'cuenta_nombre': 'Principal',
+                    'saldo_actual': 1234.56,
+                    'limite_configurado': 100,
+                },
+            )
+            for i in range(cantidad)
+        ]
+
+        # Ruta anterior: una consulta por notificación y reemplazos sobre todo el texto por cada variable
+        inicio = time.perf_counter()
+        for notificacion in notificaciones:
+            actual = PlantillaNotificacion.objects.filter(
+                tipo_notificacion=notificacion.tipo_notificacion,
+                activa=True
+            ).first()
+            self._renderizar_legado(actual.asunto_email, notificacion)
+            self._renderizar_legado(actual.plantilla_email, notificacion)
+        duracion_legado = time.perf_counter() - inicio
+
+        # Ruta compilada: plantilla en caché por tipo y render en una pasada
+        PlantillaCache.invalidar()
+        inicio = time.perf_counter()
+        for notificacion in notificaciones:
+            asunto, contenido = PlantillaCache.obtener(notificacion.tipo_notificacion_id)
+            contexto = EmailService._contexto_plantilla(notificacion)
+            asunto.renderizar(contexto)
+            contenido.renderizar(contexto)
+        duracion_compilada = time.perf_counter() - inicio
+
+        # Contenido por defecto (tipos sin plantilla), ahora con la plantilla HTML del loader
+        inicio = time.perf_counter()
+        for notificacion in notificaciones:
+            EmailService._generar_contenido_default(notificacion)
+        duracion_default = time.perf_counter() - inicio
+
+        self.stdout.write(f'📊 {cantidad} notificaciones con la plantilla "{plantilla.nombre}"')
+        self.stdout.write(f'   Anterior (consulta + str.replace): {duracion_legado:.2f}s ({cantidad / duracion_legado:.0f}/s)')
+        self.stdout.write(f'   Compilada en caché:                {duracion_compilada:.2f}s ({cantidad / duracion_compilada:.0f}/s)')
+        self.stdout.write(f'   HTML por defecto (sin plantilla):  {duracion_default:.2f}s ({cantidad / duracion_default:.0f}/s)')
+        self.stdout.write(self.style.SUCCESS(f'✅ Aceleración con plantilla: x{duracion_legado / duracion_compilada:.1f}'))
+
+    @staticmethod
+    def _renderizar_legado(plantilla_texto, notificacion):
+        """Renderizado de plantillas que usaba EmailService antes de PlantillaCompilada, como referencia"""
+        contexto = {
+            'usuario': notificacion.usuario,
+            'notificacion': notificacion,
+            'titulo': notificacion.titulo,
+            'mensaje': notificacion.mensaje,
+            'categoria': notificacion.categoria,
+            'fecha': notificacion.fecha_creacion,
+            'url_accion': notificacion.url_accion,
+            **notificacion.datos_adicionales
+        }
+        contenido = plantilla_texto
+        for key, value in contexto.items():
+            if value is not None:
+                contenido = contenido.replace(f'{{{key}}}', str(value))
+        return contenido
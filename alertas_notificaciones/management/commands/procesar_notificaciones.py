@@ -0,0 +1,47 @@
+from django.core.management.base import CommandError
+from core.management.base import WorkerColaCommand
+from alertas_notificaciones.services import ColaNotificaciones
+import time
+
+class Command(WorkerColaCommand):
+    help = 'Worker de la cola de notificaciones: entrega las notificaciones pendientes (email, push)'
+
+    CANAL = ColaNotificaciones.CANAL
+    LOTE = 50
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--hilos', type=int, default=4, help='Hilos de entrega concurrentes')
+        parser.add_argument(
+            '--max-intentos',
+            type=int,
+            default=ColaNotificaciones.MAX_INTENTOS,
+            help='Intentos antes de marcar la notificación como error',
+        )
+
+    def handle(self, *args, **options):
+        if options['hilos'] < 1:
+            raise CommandError('--hilos debe ser mayor a 0')
+        super().handle(*args, **options)
+
+    def inicio(self, options):
+        return f"📬 Procesando notificaciones con {options['hilos']} hilos, lotes de {options['lote']}"
+
+    def procesar_lote(self, options):
+        inicio = time.perf_counter()
+        resultado = ColaNotificaciones.procesar_lote(
+            hilos=options['hilos'],
+            limite=options['lote'],
+            max_intentos=options['max_intentos'],
+        )
+        total = resultado['enviadas'] + resultado['reintentos'] + resultado['errores']
+        if total:
+            duracion = time.perf_counter() - inicio
+            correo = resultado['correo']
+            self.stdout.write(
+                f"   ✉️  {resultado['enviadas']} enviadas, {resultado['reintentos']} para reintento, "
+                f"{resultado['errores']} con error ({total / duracion:.1f}/s) | "
+                f"SMTP: {correo['enviados']} ok, {correo['fallidos']} fallidos, "
+                f"{correo['conexiones']} conexiones, {correo['por_segundo']:.1f} mensajes/s"
+            )
+        return total
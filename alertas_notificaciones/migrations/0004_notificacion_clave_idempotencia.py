@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alertas_notificaciones', '0003_notificacion_cola'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, max_length=150, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alertas_notificaciones', '0004_notificacion_clave_idempotencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'enviada'])), fields=['usuario'], name='notificacion_no_leidas_idx'),
+        ),
+    ]
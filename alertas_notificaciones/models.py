@@ -106,12 +106,29 @@ class Notificacion(models.Model):
     url_accion = models.URLField(null=True, blank=True)  # URL para acción relacionada
     etiquetas = models.JSONField(default=list, blank=True)  # Tags para filtrado
     
+    # Cola de entrega (ver ColaNotificaciones y `manage.py procesar_notificaciones`)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(null=True, blank=True)  # Reintento o fin del reclamo de un worker
+    ultimo_error = models.TextField(blank=True, default='')
+    
+    # Clave determinista del evento que originó la notificación (p. ej. 'movimiento_financiero:movimiento:42').
+    # El índice único descarta los duplicados al insertar (ver NotificationService.crear_notificacion)
+    clave_idempotencia = models.CharField(max_length=150, null=True, blank=True, unique=True)
+    
     class Meta:
         ordering = ['-fecha_creacion']
         indexes = [
             models.Index(fields=['usuario', 'estado']),
             models.Index(fields=['categoria', 'fecha_creacion']),
             models.Index(fields=['tipo_notificacion', 'fecha_creacion']),
+            models.Index(fields=['estado', 'proximo_intento']),
+            # Sólo las no leídas: el recuento del contador (ContadorNoLeidas) se resuelve
+            # con un Index Only Scan de un índice que no crece con el historial leído
+            models.Index(
+                fields=['usuario'],
+                name='notificacion_no_leidas_idx',
+                condition=models.Q(estado__in=['pendiente', 'enviada']),
+            ),
         ]
     
     def __str__(self):
@@ -1,10 +1,23 @@
-from django.core.mail import send_mail
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models import Case, F, Max, Q, Value, When
+from core.cache import cache_compartida
 from .models import Notificacion, TipoNotificacion, ConfiguracionNotificacion, PlantillaNotificacion
+import asyncio
+import json
 import logging
+import re
+import threading
+import time
+import weakref
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +35,12 @@ class NotificationService:
             titulo: Título de la notificación
             mensaje: Mensaje de la notificación
             categoria: Categoría (ej: 'Metas', 'Saldo', 'Transacciones')
-            **kwargs: Argumentos opcionales (prioridad, url_accion, datos_adicionales, etc.)
+            **kwargs: Argumentos opcionales (prioridad, url_accion, datos_adicionales, etc.).
+                clave_idempotencia: clave del evento (ver clave_idempotencia()); si ya existe
+                una notificación con la misma clave no se crea otra
         
         Returns:
-            Notificacion: Instancia de la notificación creada o None si está deshabilitada
+            Notificacion: Instancia de la notificación creada o None si está deshabilitada o duplicada
         """
         try:
             # Obtener el tipo de notificación
@@ -50,9 +65,10 @@ class NotificationService:
             if not config.activo:
                 return None
             
-            # Crear la notificación
+            # Crear la notificación como pendiente; la entrega (email, push) la hace
+            # el worker de la cola, fuera de la transacción de quien la generó
             with transaction.atomic():
-                notificacion = Notificacion.objects.create(
+                notificacion = Notificacion(
                     usuario=usuario,
                     tipo_notificacion=tipo_obj,
                     titulo=titulo,
@@ -63,11 +79,29 @@ class NotificationService:
                     prioridad=kwargs.get('prioridad', 'media'),
                     url_accion=kwargs.get('url_accion'),
                     datos_adicionales=kwargs.get('datos_adicionales', {}),
-                    etiquetas=kwargs.get('etiquetas', [])
+                    etiquetas=kwargs.get('etiquetas', []),
+                    estado='pendiente',
+                    clave_idempotencia=kwargs.get('clave_idempotencia'),
                 )
                 
-                # Procesar envío según configuración
-                NotificationProcessor.procesar_notificacion(notificacion, config)
+                if notificacion.clave_idempotencia:
+                    # Savepoint: si otra ejecución ya insertó la misma clave, el índice único
+                    # rechaza el INSERT y sólo se revierte este punto, no la transacción exterior
+                    try:
+                        with transaction.atomic():
+                            notificacion.save()
+                    except IntegrityError:
+                        if not Notificacion.objects.filter(
+                            clave_idempotencia=notificacion.clave_idempotencia
+                        ).exists():
+                            raise
+                        logger.info(f"Notificación duplicada descartada: {notificacion.clave_idempotencia}")
+                        return None
+                else:
+                    notificacion.save()
+                
+                # Encolar sólo cuando la transacción exterior se confirme
+                transaction.on_commit(lambda: ColaNotificaciones.encolar(notificacion.id))
                 
                 logger.info(f"Notificación creada: {notificacion.id} para usuario {usuario.id}")
                 return notificacion
@@ -76,6 +110,84 @@ class NotificationService:
             logger.error(f"Error creando notificación: {str(e)}")
             return None
     
+    @staticmethod
+    def crear_lote(tipo_notificacion, notificaciones):
+        """
+        Crea en bloque notificaciones de un mismo tipo generadas por procesos programados
+
+        Equivale a crear_notificacion para cada una, con un número fijo de consultas por lote:
+        respeta la configuración de cada usuario (creando la configuración por defecto a quien
+        no la tiene) y descarta con ON CONFLICT DO NOTHING las claves de idempotencia existentes.
+
+        Args:
+            tipo_notificacion: Nombre del tipo de notificación
+            notificaciones: Notificacion sin guardar, con usuario_id y clave_idempotencia
+
+        Returns:
+            dict: cantidades 'creadas', 'duplicadas' y 'deshabilitadas'
+        """
+        resultado = {'creadas': 0, 'duplicadas': 0, 'deshabilitadas': 0}
+        if not notificaciones:
+            return resultado
+
+        tipo_obj = TipoNotificacion.objects.filter(nombre=tipo_notificacion, activo=True).first()
+        if tipo_obj is None:
+            logger.warning(f"Tipo de notificación no encontrado: {tipo_notificacion}")
+            resultado['deshabilitadas'] = len(notificaciones)
+            return resultado
+
+        usuarios = {n.usuario_id for n in notificaciones}
+        activos = dict(ConfiguracionNotificacion.objects.filter(
+            usuario_id__in=usuarios,
+            tipo_notificacion=tipo_obj,
+        ).values_list('usuario_id', 'activo'))
+        sin_configuracion = usuarios - activos.keys()
+        if sin_configuracion:
+            ConfiguracionNotificacion.objects.bulk_create([
+                ConfiguracionNotificacion(
+                    usuario_id=usuario_id,
+                    tipo_notificacion=tipo_obj,
+                    email_habilitado=True,
+                    push_habilitado=True,
+                    sms_habilitado=False,
+                    activo=True
+                )
+                for usuario_id in sin_configuracion
+            ], ignore_conflicts=True)
+            activos.update(dict.fromkeys(sin_configuracion, True))
+
+        existentes = set(Notificacion.objects.filter(
+            clave_idempotencia__in=[n.clave_idempotencia for n in notificaciones if n.clave_idempotencia]
+        ).values_list('clave_idempotencia', flat=True))
+
+        nuevas = []
+        for notificacion in notificaciones:
+            if not activos[notificacion.usuario_id]:
+                resultado['deshabilitadas'] += 1
+            elif notificacion.clave_idempotencia in existentes:
+                resultado['duplicadas'] += 1
+            else:
+                notificacion.tipo_notificacion = tipo_obj
+                notificacion.estado = 'pendiente'
+                nuevas.append(notificacion)
+
+        if nuevas:
+            with transaction.atomic():
+                # Una ejecución concurrente pudo insertar la misma clave: el índice único la descarta
+                Notificacion.objects.bulk_create(nuevas, ignore_conflicts=True)
+                # Con ON CONFLICT no se sabe cuáles se insertaron: se recuentan al leer
+                ContadorNoLeidas.invalidar(*{n.usuario_id for n in nuevas})
+                # La entrega queda siempre a cargo del worker, aun con NOTIFICACIONES_ENTREGA='inmediata':
+                # un proceso masivo no debe enviar miles de correos dentro de su propia ejecución
+                transaction.on_commit(ColaNotificaciones.avisar)
+        resultado['creadas'] = len(nuevas)
+        return resultado
+
+    @staticmethod
+    def clave_idempotencia(tipo_notificacion, *partes):
+        """Clave determinista de un evento, p. ej. clave_idempotencia('nueva_meta', 'meta', 7) -> 'nueva_meta:meta:7'"""
+        return ':'.join(str(parte) for parte in (tipo_notificacion, *partes))
+    
     @staticmethod
     def _crear_configuracion_default(usuario, tipo_notificacion):
         """Crea configuración por defecto para un usuario y tipo de notificación"""
@@ -91,32 +203,47 @@ class NotificationService:
     @staticmethod
     def marcar_como_leida(notificacion_id, usuario):
         """Marca una notificación como leída"""
-        try:
-            notificacion = Notificacion.objects.get(id=notificacion_id, usuario=usuario)
-            notificacion.estado = 'leida'
-            notificacion.fecha_lectura = timezone.now()
-            notificacion.save()
-            logger.info(f"Notificación {notificacion_id} marcada como leída")
-            return True
-        except Notificacion.DoesNotExist:
-            logger.warning(f"Notificación {notificacion_id} no encontrada para usuario {usuario.id}")
-            return False
+        with transaction.atomic():
+            # Sólo cambia (y descuenta del contador) si todavía no estaba leída
+            actualizadas = Notificacion.objects.filter(
+                id=notificacion_id,
+                usuario=usuario,
+                estado__in=ContadorNoLeidas.ESTADOS,
+            ).update(estado='leida', fecha_lectura=timezone.now())
+            if actualizadas:
+                ContadorNoLeidas.decrementar(usuario.id)
+            elif not Notificacion.objects.filter(id=notificacion_id, usuario=usuario).exists():
+                logger.warning(f"Notificación {notificacion_id} no encontrada para usuario {usuario.id}")
+                return False
+        logger.info(f"Notificación {notificacion_id} marcada como leída")
+        return True
+    
+    @staticmethod
+    def marcar_todas_como_leidas(usuario):
+        """Marca como leídas todas las notificaciones no leídas del usuario; devuelve cuántas cambiaron"""
+        with transaction.atomic():
+            cantidad = Notificacion.objects.filter(
+                usuario=usuario,
+                estado__in=ContadorNoLeidas.ESTADOS
+            ).update(
+                estado='leida',
+                fecha_lectura=timezone.now()
+            )
+            ContadorNoLeidas.reiniciar(usuario.id)
+        return cantidad
     
     @staticmethod
     def obtener_no_leidas(usuario):
         """Obtiene notificaciones no leídas del usuario"""
         return Notificacion.objects.filter(
             usuario=usuario,
-            estado__in=['enviada', 'pendiente']
+            estado__in=ContadorNoLeidas.ESTADOS
         ).order_by('-fecha_creacion')
     
     @staticmethod
     def obtener_contador_no_leidas(usuario):
-        """Obtiene el contador de notificaciones no leídas"""
-        return Notificacion.objects.filter(
-            usuario=usuario,
-            estado__in=['enviada', 'pendiente']
-        ).count()
+        """Obtiene el contador de notificaciones no leídas (ver ContadorNoLeidas)"""
+        return ContadorNoLeidas.obtener(usuario.id)
     
     @staticmethod
     def _format_currency(amount, usuario):
@@ -144,56 +271,723 @@ class NotificationService:
             return f"${amount}"
     
 
+class ContadorNoLeidas:
+    """
+    Cantidad de notificaciones no leídas por usuario, en la caché de Django.
+
+    Crear una notificación incrementa el contador y leerla lo decrementa; marcar todas
+    lo pone en cero. Los cambios se aplican al confirmar la transacción. La entrada vence
+    a los NOTIFICACIONES_CONTADOR_TIMEOUT segundos y entonces se vuelve a contar en la
+    base (índice parcial notificacion_no_leidas_idx), lo que corrige los desvíos de
+    incrementos perdidos o de backends sin incr atómico.
+
+    Sólo se usa con una caché compartida entre procesos (core.cache.cache_compartida): con
+    LocMemCache los incrementos sólo llegarían al proceso que escribió, así que obtener()
+    cuenta en la base en cada lectura. El stream (StreamNotificaciones) cuenta siempre en
+    la base con contar() cada vez que despierta.
+    """
+
+    PREFIJO = 'notificaciones:no_leidas'
+    ESTADOS = ('pendiente', 'enviada')
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'NOTIFICACIONES_CONTADOR_TIMEOUT', 300)
+
+    @staticmethod
+    def clave(usuario_id):
+        return f'{ContadorNoLeidas.PREFIJO}:{usuario_id}'
+
+    @staticmethod
+    def contar(usuario_id):
+        """Cuenta en la base, usando sólo el índice parcial de no leídas"""
+        return Notificacion.objects.filter(usuario_id=usuario_id, estado__in=ContadorNoLeidas.ESTADOS).count()
+
+    @staticmethod
+    def obtener(usuario_id):
+        if not cache_compartida():
+            return ContadorNoLeidas.contar(usuario_id)
+        clave = ContadorNoLeidas.clave(usuario_id)
+        cantidad = cache.get(clave)
+        if cantidad is None:
+            cantidad = ContadorNoLeidas.contar(usuario_id)
+            # add y no set: no pisar un incremento ocurrido mientras se contaba
+            cache.add(clave, cantidad, ContadorNoLeidas.timeout())
+        return cantidad
+
+    @staticmethod
+    def _sumar(usuario_id, delta):
+        if cache_compartida():
+            clave = ContadorNoLeidas.clave(usuario_id)
+            try:
+                cantidad = cache.incr(clave, delta)
+            except ValueError:
+                # Sin contador en caché: la próxima lectura lo cuenta en la base
+                cantidad = 0
+            if cantidad < 0:
+                cache.delete(clave)
+        EscuchaNotificaciones.avisar(usuario_id)
+
+    @staticmethod
+    def _reiniciar(usuario_id):
+        if cache_compartida():
+            cache.set(ContadorNoLeidas.clave(usuario_id), 0, ContadorNoLeidas.timeout())
+        EscuchaNotificaciones.avisar(usuario_id)
+
+    @staticmethod
+    def _invalidar(usuario_ids):
+        if cache_compartida():
+            cache.delete_many([ContadorNoLeidas.clave(usuario_id) for usuario_id in usuario_ids])
+        EscuchaNotificaciones.avisar(*usuario_ids)
+
+    @staticmethod
+    def incrementar(usuario_id, cantidad=1):
+        transaction.on_commit(lambda: ContadorNoLeidas._sumar(usuario_id, cantidad))
+
+    @staticmethod
+    def decrementar(usuario_id, cantidad=1):
+        transaction.on_commit(lambda: ContadorNoLeidas._sumar(usuario_id, -cantidad))
+
+    @staticmethod
+    def reiniciar(usuario_id):
+        transaction.on_commit(lambda: ContadorNoLeidas._reiniciar(usuario_id))
+
+    @staticmethod
+    def invalidar(*usuario_ids):
+        """Descarta los contadores: se vuelven a contar en la base en la próxima lectura"""
+        usuario_ids = {usuario_id for usuario_id in usuario_ids if usuario_id}
+        transaction.on_commit(lambda: ContadorNoLeidas._invalidar(usuario_ids))
+
+
+class EscuchaNotificaciones:
+    """
+    Avisos en vivo de cambios en las notificaciones de cada usuario, para el stream SSE
+    (views.stream_notificaciones).
+
+    Emisor: cada cambio del contador de no leídas (crear, leer, marcar todas...) ejecuta
+    avisar() al confirmarse, con un NOTIFY en el canal CANAL cuyo payload es el id del usuario.
+    Receptor: una sola conexión con LISTEN por event loop (un proceso ASGI), leída con
+    add_reader sin ocupar hilos, que despierta a los streams abiertos de ese usuario.
+    Fuera de PostgreSQL, o mientras la conexión de LISTEN está caída, los streams
+    sondean la base cada NOTIFICACIONES_SSE_SONDEO segundos.
+    """
+
+    CANAL = 'notificaciones_usuario'
+
+    _por_loop = weakref.WeakKeyDictionary()
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.suscriptores = {}  # usuario_id -> set de asyncio.Queue
+        self.conexion = None
+        self._conectando = False
+
+    @staticmethod
+    def avisar(*usuario_ids):
+        """Despierta los streams de los usuarios indicados (sólo PostgreSQL)"""
+        if connection.vendor != 'postgresql' or not usuario_ids:
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_notify(%s, usuario_id::text) FROM unnest(%s::integer[]) AS usuario_id',
+                    [EscuchaNotificaciones.CANAL, list(usuario_ids)],
+                )
+        except Exception as e:
+            # Los streams igualmente ven el cambio cuando vuelvan a consultar
+            logger.warning(f"No se pudo avisar a los streams de notificaciones: {e}")
+
+    @classmethod
+    def actual(cls):
+        """Escucha del event loop en curso"""
+        loop = asyncio.get_running_loop()
+        escucha = cls._por_loop.get(loop)
+        if escucha is None:
+            escucha = cls._por_loop[loop] = cls(loop)
+        return escucha
+
+    @property
+    def activa(self):
+        return self.conexion is not None
+
+    async def suscribir(self, usuario_id):
+        """Cola que recibe un aviso (coalescido) por cada cambio del usuario"""
+        cola = asyncio.Queue(maxsize=1)
+        self.suscriptores.setdefault(usuario_id, set()).add(cola)
+        await self.conectar()
+        return cola
+
+    def desuscribir(self, usuario_id, cola):
+        colas = self.suscriptores.get(usuario_id, set())
+        colas.discard(cola)
+        if not colas:
+            self.suscriptores.pop(usuario_id, None)
+        # Sin streams abiertos no se mantiene la conexión de LISTEN
+        if not self.suscriptores:
+            self._cerrar()
+
+    async def conectar(self):
+        """Abre la conexión de LISTEN si no está abierta; si falla, los streams siguen sondeando"""
+        if self.conexion is not None or self._conectando or connection.vendor != 'postgresql':
+            return
+        self._conectando = True
+        try:
+            conexion = await sync_to_async(self._abrir_conexion, thread_sensitive=False)()
+        except Exception as e:
+            logger.warning(f"Stream de notificaciones sin LISTEN, se sondea la base: {e}")
+            return
+        finally:
+            self._conectando = False
+
+        if not self.suscriptores:
+            conexion.close()
+            return
+        self.conexion = conexion
+        self.loop.add_reader(conexion.fileno(), self._leer)
+        # Lo ocurrido mientras no se escuchaba sólo se ve consultando
+        self._despertar(self.suscriptores)
+
+    @staticmethod
+    def _abrir_conexion():
+        # Conexión propia, fuera del manejo de conexiones de Django: vive mientras haya streams
+        base = connections[DEFAULT_DB_ALIAS]
+        conexion = base.get_new_connection(base.get_connection_params())
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            cursor.execute(f'LISTEN {EscuchaNotificaciones.CANAL}')
+        return conexion
+
+    def _leer(self):
+        try:
+            self.conexion.poll()
+        except Exception as e:
+            logger.warning(f"Se perdió la conexión de LISTEN de notificaciones: {e}")
+            self._cerrar()
+            # Los streams pasan a sondear y reintentan la conexión
+            self._despertar(self.suscriptores)
+            return
+
+        usuario_ids = set()
+        while self.conexion.notifies:
+            aviso = self.conexion.notifies.pop()
+            if aviso.payload.isdigit():
+                usuario_ids.add(int(aviso.payload))
+        self._despertar(usuario_ids)
+
+    def _despertar(self, usuario_ids):
+        for usuario_id in list(usuario_ids):
+            for cola in self.suscriptores.get(usuario_id, ()):
+                if cola.empty():
+                    cola.put_nowait(True)
+
+    def _cerrar(self):
+        if self.conexion is None:
+            return
+        conexion, self.conexion = self.conexion, None
+        try:
+            self.loop.remove_reader(conexion.fileno())
+        except Exception:
+            pass
+        conexion.close()
+
+
+class StreamNotificaciones:
+    """Eventos Server-Sent Events de las notificaciones de un usuario"""
+
+    # Segundos entre comentarios de keep-alive (evitan que proxies corten la conexión)
+    LATIDO = 25
+    # Notificaciones nuevas enviadas por consulta
+    LIMITE = 20
+
+    # Pool de hilos compartido por todos los streams del proceso (ver ejecutor())
+    _ejecutor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def intervalo_sondeo():
+        return getattr(settings, 'NOTIFICACIONES_SSE_SONDEO', 5)
+
+    @classmethod
+    def ejecutor(cls):
+        """
+        Pool acotado a NOTIFICACIONES_SSE_HILOS donde corren las consultas de todos los
+        streams. Con sync_to_async por defecto (thread_sensitive) cada request ASGI tendría
+        su propio hilo, y su propia conexión a la base, mientras el stream siga abierto.
+        """
+        with cls._lock:
+            if cls._ejecutor is None:
+                cls._ejecutor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'NOTIFICACIONES_SSE_HILOS', 4),
+                    thread_name_prefix='notificaciones-sse',
+                )
+            return cls._ejecutor
+
+    @staticmethod
+    def evento(nombre, datos, id_evento=None):
+        lineas = [f'event: {nombre}']
+        if id_evento is not None:
+            lineas.append(f'id: {id_evento}')
+        lineas.append(f'data: {json.dumps(datos, ensure_ascii=False, default=str)}')
+        return '\n'.join(lineas) + '\n\n'
+
+    @staticmethod
+    def cambios(usuario_id, ultimo_id):
+        """
+        Notificaciones del usuario posteriores a ultimo_id y el contador de no leídas
+
+        El contador se cuenta en la base (índice parcial) y no se lee de ContadorNoLeidas:
+        el stream suele correr en otro proceso que quien escribió, y con una caché por
+        proceso su copia estaría desactualizada.
+
+        Returns:
+            tuple: (notificaciones, ultimo_id, contador). Sin ultimo_id (primera
+            conexión) no se envían notificaciones anteriores: sólo se toma el último id
+        """
+        notificaciones = []
+        if ultimo_id is None:
+            ultimo_id = Notificacion.objects.filter(usuario_id=usuario_id).aggregate(ultimo=Max('id'))['ultimo'] or 0
+        else:
+            notificaciones = list(
+                Notificacion.objects.filter(usuario_id=usuario_id, id__gt=ultimo_id).order_by('id').values(
+                    'id', 'titulo', 'mensaje', 'categoria', 'prioridad', 'estado', 'url_accion', 'fecha_creacion'
+                )[:StreamNotificaciones.LIMITE]
+            )
+            if notificaciones:
+                ultimo_id = notificaciones[-1]['id']
+        return notificaciones, ultimo_id, ContadorNoLeidas.contar(usuario_id)
+
+    @staticmethod
+    def _consultar(usuario_id, ultimo_id):
+        """cambios() desde un hilo del pool: la conexión se cierra para no retenerla entre avisos"""
+        try:
+            return StreamNotificaciones.cambios(usuario_id, ultimo_id)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def instantanea(usuario_id, ultimo_id=None):
+        """
+        Respuesta de una sola vez para servidores WSGI, que no pueden mantener el stream:
+        el navegador se reconecta a los `retry` milisegundos, lo que equivale a un sondeo
+        """
+        notificaciones, ultimo_id, cantidad = StreamNotificaciones.cambios(usuario_id, ultimo_id)
+        return ''.join([
+            f'retry: {StreamNotificaciones.intervalo_sondeo() * 1000}\n\n',
+            *(StreamNotificaciones.evento('notificacion', n, n['id']) for n in notificaciones),
+            StreamNotificaciones.evento('contador', {'count': cantidad}, ultimo_id),
+        ])
+
+    @staticmethod
+    async def eventos(usuario_id, ultimo_id=None):
+        """
+        Generador asíncrono del stream: envía el contador al conectar y luego, con cada
+        aviso de EscuchaNotificaciones (o en cada sondeo), las notificaciones nuevas
+        y el contador si cambió. Cada evento lleva el id de la última notificación vista:
+        con Last-Event-ID el navegador retoma donde quedó.
+        """
+        escucha = EscuchaNotificaciones.actual()
+        cola = await escucha.suscribir(usuario_id)
+        cambios = sync_to_async(
+            StreamNotificaciones._consultar,
+            thread_sensitive=False,
+            executor=StreamNotificaciones.ejecutor(),
+        )
+        try:
+            yield f'retry: {StreamNotificaciones.intervalo_sondeo() * 1000}\n\n'
+            contador = None
+            while True:
+                notificaciones, ultimo_id, cantidad = await cambios(usuario_id, ultimo_id)
+                for notificacion in notificaciones:
+                    yield StreamNotificaciones.evento('notificacion', notificacion, notificacion['id'])
+                if cantidad != contador:
+                    contador = cantidad
+                    yield StreamNotificaciones.evento('contador', {'count': cantidad}, ultimo_id)
+                if len(notificaciones) == StreamNotificaciones.LIMITE:
+                    continue
+
+                while True:
+                    espera = StreamNotificaciones.LATIDO if escucha.activa else StreamNotificaciones.intervalo_sondeo()
+                    try:
+                        await asyncio.wait_for(cola.get(), espera)
+                        break
+                    except asyncio.TimeoutError:
+                        if not escucha.activa:
+                            # Sondeo: reintentar LISTEN y volver a consultar
+                            await escucha.conectar()
+                            break
+                        yield ': ping\n\n'
+        finally:
+            escucha.desuscribir(usuario_id, cola)
+
+
 class NotificationProcessor:
     """Procesador de notificaciones para diferentes canales"""
     
     @staticmethod
-    def procesar_notificacion(notificacion, config):
-        """Procesa el envío de una notificación según configuración"""
-        try:
-            # Email
-            if config.email_habilitado:
-                EmailService.enviar_notificacion(notificacion)
-                
-            # Push notification (por ahora solo marcar como enviado)
-            if config.push_habilitado:
-                notificacion.push_enviado = True
-                
-            # SMS (futuro)
-            if config.sms_habilitado:
-                # TODO: Implementar SMS
-                pass
-            
-            # Actualizar estado
-            notificacion.estado = 'enviada'
-            notificacion.fecha_envio = timezone.now()
-            notificacion.save()
+    def procesar_notificacion(notificacion, config, correo=None):
+        """
+        Entrega una notificación por los canales habilitados en la configuración.
+        El estado lo actualiza ColaNotificaciones; si el envío falla se propaga la excepción.
+        
+        Args:
+            correo: ConexionCorreo a reutilizar para el email (opcional)
+        """
+        # Sin configuración (p. ej. eliminada) se usan los valores por defecto
+        email_habilitado = config.email_habilitado if config else True
+        push_habilitado = config.push_habilitado if config else True
+        
+        # Email
+        if email_habilitado and not notificacion.email_enviado:
+            EmailService.enviar_notificacion(notificacion, correo=correo)
             
-            logger.info(f"Notificación {notificacion.id} procesada correctamente")
+        # Push notification (por ahora solo marcar como enviado)
+        if push_habilitado:
+            notificacion.push_enviado = True
             
+        # SMS (futuro)
+        if config and config.sms_habilitado:
+            # TODO: Implementar SMS
+            pass
+        
+        logger.info(f"Notificación {notificacion.id} procesada correctamente")
+
+
+class ColaNotificaciones:
+    """
+    Cola de entrega de notificaciones sobre la propia tabla Notificacion.
+
+    Las notificaciones se crean como 'pendiente'. El worker (`manage.py procesar_notificaciones`)
+    las reclama por lotes con SELECT ... FOR UPDATE SKIP LOCKED, las entrega en un pool de
+    hilos y reintenta los fallos con backoff exponencial hasta pasarlas a 'error'.
+    """
+
+    # Canal de LISTEN/NOTIFY con el que se despierta al worker en PostgreSQL
+    CANAL = 'notificaciones_pendientes'
+
+    # Tiempo que una notificación reclamada queda reservada para el worker que la tomó;
+    # si el worker muere, otro la vuelve a tomar al vencer
+    RECLAMO = timedelta(minutes=5)
+
+    BACKOFF_BASE = 30  # segundos; se duplica en cada intento
+    MAX_INTENTOS = 5
+
+    @staticmethod
+    def encolar(notificacion_id):
+        """Se ejecuta en on_commit: avisa al worker o entrega en el momento según NOTIFICACIONES_ENTREGA"""
+        if getattr(settings, 'NOTIFICACIONES_ENTREGA', 'cola') == 'inmediata':
+            ColaNotificaciones.procesar_lote(hilos=1, ids=[notificacion_id])
+        else:
+            ColaNotificaciones.avisar()
+
+    @staticmethod
+    def avisar():
+        """Despierta a los workers que esperan con LISTEN (sólo PostgreSQL)"""
+        if connection.vendor != 'postgresql':
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, '')", [ColaNotificaciones.CANAL])
         except Exception as e:
-            notificacion.estado = 'error'
-            notificacion.save()
-            logger.error(f"Error procesando notificación {notificacion.id}: {str(e)}")
+            # El worker igualmente encuentra la notificación en su siguiente sondeo
+            logger.warning(f"No se pudo avisar a la cola de notificaciones: {e}")
+
+    @staticmethod
+    def reclamar(limite, ids=None):
+        """
+        Reserva hasta `limite` notificaciones pendientes listas para entregar
+
+        Las filas bloqueadas por otro worker se saltan (SKIP LOCKED) y las reclamadas
+        quedan reservadas hasta proximo_intento, con su contador de intentos incrementado.
+
+        Returns:
+            list: ids reclamados
+        """
+        ahora = timezone.now()
+        with transaction.atomic():
+            pendientes = Notificacion.objects.select_for_update(skip_locked=True).filter(
+                Q(proximo_intento__isnull=True) | Q(proximo_intento__lte=ahora),
+                estado='pendiente',
+            )
+            if ids is not None:
+                pendientes = pendientes.filter(id__in=ids)
+            reclamados = list(
+                pendientes.order_by('fecha_creacion').values_list('id', flat=True)[:limite]
+            )
+            if reclamados:
+                Notificacion.objects.filter(id__in=reclamados).update(
+                    intentos=F('intentos') + 1,
+                    proximo_intento=ahora + ColaNotificaciones.RECLAMO,
+                )
+        return reclamados
+
+    @staticmethod
+    def procesar_lote(hilos=4, limite=50, max_intentos=None, ids=None):
+        """
+        Reclama un lote y lo entrega repartido entre `hilos` hilos
+
+        Returns:
+            dict: cantidades 'enviadas', 'reintentos' y 'errores', y en 'correo'
+            el reporte de envío SMTP sumado de todos los hilos
+        """
+        max_intentos = max_intentos or ColaNotificaciones.MAX_INTENTOS
+        resultado = {'enviadas': 0, 'reintentos': 0, 'errores': 0, 'correo': ConexionCorreo.reporte_vacio()}
+
+        reclamados = ColaNotificaciones.reclamar(limite, ids=ids)
+        if not reclamados:
+            return resultado
+
+        notificaciones = list(
+            Notificacion.objects.filter(id__in=reclamados).select_related(
+                'usuario__id_moneda', 'tipo_notificacion'
+            )
+        )
+        configuraciones = {
+            (config.usuario_id, config.tipo_notificacion_id): config
+            for config in ConfiguracionNotificacion.objects.filter(
+                usuario_id__in={n.usuario_id for n in notificaciones},
+                tipo_notificacion_id__in={n.tipo_notificacion_id for n in notificaciones},
+            )
+        }
+        trabajos = [
+            (n, configuraciones.get((n.usuario_id, n.tipo_notificacion_id)))
+            for n in notificaciones
+        ]
+
+        hilos = max(1, min(hilos, len(trabajos)))
+        if hilos == 1:
+            grupos = [ColaNotificaciones._entregar_grupo(trabajos, max_intentos, cerrar_conexion=False)]
+        else:
+            # Cada hilo entrega un grupo completo y cierra su conexión a la BD al terminar
+            with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='notificaciones') as pool:
+                grupos = list(pool.map(
+                    lambda grupo: ColaNotificaciones._entregar_grupo(grupo, max_intentos),
+                    [trabajos[i::hilos] for i in range(hilos)],
+                ))
+
+        for estados, reporte in grupos:
+            for estado in estados:
+                resultado[estado] += 1
+            resultado['correo'] = ConexionCorreo.sumar_reportes(resultado['correo'], reporte)
+        return resultado
+
+    @staticmethod
+    def _entregar_grupo(trabajos, max_intentos, cerrar_conexion=True):
+        """Entrega un grupo reutilizando una sola conexión SMTP; devuelve (estados, reporte de correo)"""
+        try:
+            with ConexionCorreo() as correo:
+                estados = [
+                    ColaNotificaciones.entregar(notificacion, config, max_intentos, correo=correo)
+                    for notificacion, config in trabajos
+                ]
+            return estados, correo.reporte()
+        finally:
+            if cerrar_conexion:
+                connection.close()
+
+    @staticmethod
+    def entregar(notificacion, config, max_intentos, correo=None):
+        """
+        Entrega una notificación reclamada y registra el resultado
+
+        Returns:
+            str: 'enviadas', 'reintentos' o 'errores'
+        """
+        try:
+            NotificationProcessor.procesar_notificacion(notificacion, config, correo=correo)
+        except Exception as e:
+            return ColaNotificaciones.registrar_fallo(notificacion, e, max_intentos)
+
+        # Si el usuario ya la leyó en la app, se conserva su estado
+        Notificacion.objects.filter(pk=notificacion.pk).update(
+            estado=Case(When(estado='pendiente', then=Value('enviada')), default=F('estado')),
+            fecha_envio=timezone.now(),
+            email_enviado=notificacion.email_enviado,
+            push_enviado=notificacion.push_enviado,
+            proximo_intento=None,
+            ultimo_error='',
+        )
+        return 'enviadas'
+
+    @staticmethod
+    def registrar_fallo(notificacion, error, max_intentos):
+        """Programa el siguiente intento con backoff exponencial o pasa la notificación a 'error'"""
+        # El contador ya incluye el intento actual (se incrementa al reclamar)
+        intentos = notificacion.intentos
+        cambios = {
+            'ultimo_error': str(error)[:1000],
+            'email_enviado': notificacion.email_enviado,
+        }
+        if intentos >= max_intentos:
+            cambios.update(estado='error', proximo_intento=None)
+            resultado = 'errores'
+            logger.error(f"Notificación {notificacion.id} descartada tras {intentos} intentos: {error}")
+        else:
+            espera = ColaNotificaciones.BACKOFF_BASE * 2 ** (intentos - 1)
+            cambios['proximo_intento'] = timezone.now() + timedelta(seconds=espera)
+            resultado = 'reintentos'
+            logger.warning(f"Notificación {notificacion.id} falló (intento {intentos}), reintento en {espera}s: {error}")
+
+        actualizadas = Notificacion.objects.filter(pk=notificacion.pk, estado='pendiente').update(**cambios)
+        if actualizadas and cambios.get('estado') == 'error':
+            # Las notificaciones con error dejan de contar como no leídas
+            ContadorNoLeidas.decrementar(notificacion.usuario_id)
+        return resultado
+
+
+class ConexionCorreo:
+    """
+    Conexión de correo reutilizable para enviar muchos mensajes sin repetir el
+    handshake SMTP/TLS por cada uno. Se renueva cada `max_por_conexion` mensajes
+    (los servidores SMTP suelen cortar sesiones largas) y tras cualquier fallo.
+
+    Uso:
+        with ConexionCorreo() as correo:
+            for mensaje in mensajes:
+                correo.enviar(mensaje)
+        correo.reporte()
+    """
+
+    MAX_POR_CONEXION = 50
+
+    def __init__(self, max_por_conexion=None, **opciones_backend):
+        self.max_por_conexion = max_por_conexion or getattr(
+            settings, 'EMAIL_MAX_POR_CONEXION', ConexionCorreo.MAX_POR_CONEXION
+        )
+        self.opciones_backend = opciones_backend
+        self._conexion = None
+        self._mensajes_conexion = 0
+        self.enviados = 0
+        self.fallidos = 0
+        self.conexiones = 0
+        self.duracion = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cerrar()
+
+    def _abrir(self):
+        self.cerrar()
+        self._conexion = get_connection(fail_silently=False, **self.opciones_backend)
+        self._conexion.open()
+        self._mensajes_conexion = 0
+        self.conexiones += 1
+
+    def cerrar(self):
+        if self._conexion is not None:
+            try:
+                self._conexion.close()
+            except Exception:
+                pass
+            self._conexion = None
+
+    def enviar(self, mensaje):
+        """Envía un EmailMessage por la conexión abierta; si falla se propaga la excepción"""
+        inicio = time.perf_counter()
+        try:
+            if self._conexion is None or self._mensajes_conexion >= self.max_por_conexion:
+                self._abrir()
+            mensaje.connection = self._conexion
+            self._conexion.send_messages([mensaje])
+            self._mensajes_conexion += 1
+            self.enviados += 1
+        except Exception:
+            # La sesión puede haber quedado inutilizable: abrir otra en el siguiente envío
+            self.cerrar()
+            self.fallidos += 1
+            raise
+        finally:
+            self.duracion += time.perf_counter() - inicio
+
+    def reporte(self):
+        """Mensajes enviados y fallidos, conexiones abiertas y rendimiento (mensajes/s)"""
+        return {
+            'enviados': self.enviados,
+            'fallidos': self.fallidos,
+            'conexiones': self.conexiones,
+            'duracion': self.duracion,
+            'por_segundo': self.enviados / self.duracion if self.duracion else 0.0,
+        }
+
+    @staticmethod
+    def reporte_vacio():
+        return {'enviados': 0, 'fallidos': 0, 'conexiones': 0, 'duracion': 0.0, 'por_segundo': 0.0}
+
+    @staticmethod
+    def sumar_reportes(a, b):
+        """Combina reportes de varios hilos (la duración es la del hilo más lento)"""
+        total = {
+            'enviados': a['enviados'] + b['enviados'],
+            'fallidos': a['fallidos'] + b['fallidos'],
+            'conexiones': a['conexiones'] + b['conexiones'],
+            'duracion': max(a['duracion'], b['duracion']),
+        }
+        total['por_segundo'] = total['enviados'] / total['duracion'] if total['duracion'] else 0.0
+        return total
 
 
 class EmailService:
     """Servicio para envío de emails"""
     
     @staticmethod
-    def enviar_notificacion(notificacion):
-        """Envía notificación por email"""
+    def enviar_lote(mensajes, max_por_conexion=None, **opciones_backend):
+        """
+        Envía una lista de EmailMessage reutilizando conexiones SMTP
+
+        Un mensaje que falla no detiene el resto del lote. opciones_backend se
+        pasan a get_connection (p. ej. backend, host, port).
+
+        Returns:
+            dict: reporte de ConexionCorreo más 'errores' [(índice, error)]
+        """
+        errores = []
+        with ConexionCorreo(max_por_conexion, **opciones_backend) as correo:
+            for indice, mensaje in enumerate(mensajes):
+                try:
+                    correo.enviar(mensaje)
+                except Exception as e:
+                    logger.error(f"Error enviando email a {', '.join(mensaje.to)}: {e}")
+                    errores.append((indice, str(e)))
+        reporte = correo.reporte()
+        reporte['errores'] = errores
+        logger.info(
+            f"Lote de correo: {reporte['enviados']} enviados, {reporte['fallidos']} fallidos, "
+            f"{reporte['conexiones']} conexiones, {reporte['por_segundo']:.1f} mensajes/s"
+        )
+        return reporte
+    
+    @staticmethod
+    def crear_mensaje(asunto, texto, destinatarios, html=None):
+        """EmailMultiAlternatives con versión de texto y, opcionalmente, HTML"""
+        mensaje = EmailMultiAlternatives(
+            subject=asunto,
+            body=texto,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=destinatarios,
+        )
+        if html:
+            mensaje.attach_alternative(html, 'text/html')
+        return mensaje
+    
+    @staticmethod
+    def enviar_notificacion(notificacion, correo=None):
+        """
+        Envía notificación por email
+        
+        Args:
+            correo: ConexionCorreo abierta para reutilizar; si no se indica se usa una propia
+        """
         try:
-            # Buscar plantilla específica
-            plantilla = PlantillaNotificacion.objects.filter(
-                tipo_notificacion=notificacion.tipo_notificacion,
-                activa=True
-            ).first()
+            # Buscar plantilla específica (compilada y en caché por tipo)
+            plantilla = PlantillaCache.obtener(notificacion.tipo_notificacion_id)
             
             if plantilla:
                 # Usar plantilla personalizada
-                asunto = EmailService._renderizar_plantilla(plantilla.asunto_email, notificacion)
-                contenido = EmailService._renderizar_plantilla(plantilla.plantilla_email, notificacion)
+                plantilla_asunto, plantilla_email = plantilla
+                contexto = EmailService._contexto_plantilla(notificacion)
+                asunto = plantilla_asunto.renderizar(contexto)
+                contenido = plantilla_email.renderizar(contexto)
             else:
                 # Generar asunto dinámico basado en el contenido
                 datos = notificacion.datos_adicionales or {}
@@ -206,17 +1000,14 @@ class EmailService:
                 contenido = EmailService._generar_contenido_default(notificacion)
             
             # Enviar email
-            send_mail(
-                subject=asunto,
-                message=contenido,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[notificacion.usuario.correo],
-                html_message=contenido,
-                fail_silently=False
-            )
+            mensaje = EmailService.crear_mensaje(asunto, contenido, [notificacion.usuario.correo], html=contenido)
+            if correo is not None:
+                correo.enviar(mensaje)
+            else:
+                with ConexionCorreo() as correo_propio:
+                    correo_propio.enviar(mensaje)
             
             notificacion.email_enviado = True
-            notificacion.save()
             
             logger.info(f"Email enviado para notificación {notificacion.id}")
             
@@ -225,10 +1016,9 @@ class EmailService:
             raise
     
     @staticmethod
-    def _renderizar_plantilla(plantilla_texto, notificacion):
-        """Renderiza una plantilla con los datos de la notificación"""
-        # Variables disponibles para las plantillas
-        contexto = {
+    def _contexto_plantilla(notificacion):
+        """Variables disponibles para las plantillas de PlantillaNotificacion"""
+        return {
             'usuario': notificacion.usuario,
             'notificacion': notificacion,
             'titulo': notificacion.titulo,
@@ -236,230 +1026,152 @@ class EmailService:
             'categoria': notificacion.categoria,
             'fecha': notificacion.fecha_creacion,
             'url_accion': notificacion.url_accion,
-            **notificacion.datos_adicionales
+            **(notificacion.datos_adicionales or {})
         }
-        
-        # Reemplazar variables en la plantilla
-        contenido = plantilla_texto
-        for key, value in contexto.items():
-            if value is not None:
-                contenido = contenido.replace(f'{{{key}}}', str(value))
-        
-        return contenido
     
     @staticmethod
     def _generar_contenido_default(notificacion):
-        """Genera contenido HTML por defecto para el email"""
+        """Genera contenido HTML por defecto para el email (plantilla compilada una vez por el loader)"""
         # Obtener el usuario de la notificación
         usuario = notificacion.usuario
         # Determinar el color del icono basado en el tipo de notificación
+        titulo = notificacion.titulo.lower()
         icon_color = "#3B82F6"  # Azul por defecto
-        if "gasto" in notificacion.titulo.lower() or "egreso" in notificacion.titulo.lower():
+        if "gasto" in titulo or "egreso" in titulo:
             icon_color = "#EF4444"  # Rojo para gastos
-        elif "ingreso" in notificacion.titulo.lower():
+        elif "ingreso" in titulo:
             icon_color = "#10B981"  # Verde para ingresos
-        elif "meta" in notificacion.titulo.lower():
+        elif "meta" in titulo:
             icon_color = "#8B5CF6"  # Morado para metas
-        elif "saldo" in notificacion.titulo.lower():
+        elif "saldo" in titulo:
             icon_color = "#F59E0B"  # Naranja para alertas de saldo
         
         # Obtener datos adicionales
         datos = notificacion.datos_adicionales or {}
+        contexto = {
+            'notificacion': notificacion,
+            'datos': datos,
+            'icon_color': icon_color,
+            'fecha': notificacion.fecha_creacion.strftime('%d de %B de %Y a las %H:%M'),
+        }
         
-        # Crear secciones de información adicional
-        info_adicional = ""
+        # Detalles de la transacción
         if datos.get('movimiento_tipo'):
-            tipo_mov = "Ingreso" if datos.get('movimiento_tipo') == 'ingreso' else "Gasto"
-            emoji_tipo = "💰" if datos.get('movimiento_tipo') == 'ingreso' else "💸"
-            info_adicional += f"""
-            <div style="background-color: #f8fafc; border-radius: 8px; padding: 16px; margin: 20px 0;">
-                <h4 style="margin: 0 0 10px 0; color: #1f2937; font-size: 16px;">📋 Detalles de la Transacción</h4>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                    <span style="color: #6b7280;"><strong>Tipo:</strong></span>
-                    <span style="color: {icon_color}; font-weight: bold;">{emoji_tipo} {tipo_mov}</span>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                    <span style="color: #6b7280;"><strong>Monto:</strong></span>
-                    <span style="color: #1f2937; font-weight: bold; font-size: 18px;">{NotificationService._format_currency(datos.get('monto', 0), usuario)}</span>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                    <span style="color: #6b7280;"><strong>Cuenta:</strong></span>
-                    <span style="color: #1f2937;">{datos.get('cuenta_nombre', 'N/A')}</span>
-                </div>
-                <div style="display: flex; justify-content: space-between;">
-                    <span style="color: #6b7280;"><strong>Saldo actual:</strong></span>
-                    <span style="color: #059669; font-weight: bold;">{NotificationService._format_currency(datos.get('saldo_actual', 0), usuario)}</span>
-                </div>
-            </div>
-            """
+            es_ingreso = datos.get('movimiento_tipo') == 'ingreso'
+            contexto.update({
+                'tipo_movimiento': "Ingreso" if es_ingreso else "Gasto",
+                'emoji_tipo': "💰" if es_ingreso else "💸",
+                'monto': NotificationService._format_currency(datos.get('monto', 0), usuario),
+                'saldo_actual': NotificationService._format_currency(datos.get('saldo_actual', 0), usuario),
+            })
         
         # Información para metas de ahorro
         if datos.get('meta_nombre'):
-            info_adicional += f"""
-            <div style="background-color: #f0f9ff; border-radius: 8px; padding: 16px; margin: 20px 0;">
-                <h4 style="margin: 0 0 10px 0; color: #1f2937; font-size: 16px;">🎯 Información de la Meta</h4>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                    <span style="color: #6b7280;"><strong>Meta:</strong></span>
-                    <span style="color: #1f2937; font-weight: bold;">{datos.get('meta_nombre')}</span>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 8px;">
-                    <span style="color: #6b7280;"><strong>Progreso:</strong></span>
-                    <span style="color: #8B5CF6; font-weight: bold;">{datos.get('progreso_porcentaje', 0):.1f}%</span>
-                </div>
-                <div style="display: flex; justify-content: space-between;">
-                    <span style="color: #6b7280;"><strong>Objetivo:</strong></span>
-                    <span style="color: #1f2937; font-weight: bold;">{NotificationService._format_currency(datos.get('monto_objetivo', 0), usuario)}</span>
-                </div>
-            </div>
-            """
+            contexto.update({
+                'progreso_porcentaje': f"{datos.get('progreso_porcentaje', 0):.1f}",
+                'monto_objetivo': NotificationService._format_currency(datos.get('monto_objetivo', 0), usuario),
+            })
         
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>FinGest - {notificacion.titulo}</title>
-            <style>
-                body {{ 
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif; 
-                    margin: 0; 
-                    padding: 20px; 
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                }}
-                .container {{ 
-                    max-width: 600px; 
-                    margin: 0 auto; 
-                    background-color: white; 
-                    border-radius: 16px; 
-                    padding: 0; 
-                    box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-                    overflow: hidden;
-                }}
-                .header {{ 
-                    background: linear-gradient(135deg, {icon_color} 0%, {icon_color}dd 100%);
-                    color: white;
-                    text-align: center; 
-                    padding: 30px 20px;
-                }}
-                .logo {{ 
-                    font-size: 28px; 
-                    font-weight: 800; 
-                    margin-bottom: 10px;
-                    letter-spacing: -0.5px;
-                }}
-                .notification-icon {{ 
-                    font-size: 64px; 
-                    margin: 15px 0;
-                    text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                }}
-                .header-subtitle {{
-                    font-size: 14px;
-                    opacity: 0.9;
-                    margin: 0;
-                }}
-                .content {{
-                    padding: 30px;
-                }}
-                .title {{ 
-                    color: #1f2937; 
-                    font-size: 24px; 
-                    font-weight: 700; 
-                    margin-bottom: 20px;
-                    line-height: 1.3;
-                }}
-                .message {{ 
-                    color: #4b5563; 
-                    line-height: 1.6; 
-                    margin-bottom: 25px;
-                    font-size: 16px;
-                }}
-                .category {{ 
-                    background: linear-gradient(135deg, #f3f4f6 0%, #e5e7eb 100%);
-                    color: #374151; 
-                    padding: 8px 16px; 
-                    border-radius: 20px; 
-                    font-size: 12px; 
-                    font-weight: 600; 
-                    display: inline-block; 
-                    margin-bottom: 20px;
-                    text-transform: uppercase;
-                    letter-spacing: 0.5px;
-                }}
-                .action-button {{ 
-                    display: inline-block; 
-                    background: linear-gradient(135deg, {icon_color} 0%, {icon_color}dd 100%);
-                    color: white; 
-                    padding: 14px 28px; 
-                    text-decoration: none; 
-                    border-radius: 8px; 
-                    font-weight: 600;
-                    margin: 20px 0;
-                    transition: transform 0.2s ease;
-                }}
-                .action-button:hover {{
-                    transform: translateY(-2px);
-                    box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-                }}
-                .footer {{ 
-                    margin-top: 40px; 
-                    padding-top: 20px; 
-                    border-top: 2px solid #e5e7eb; 
-                    text-align: center; 
-                    color: #6b7280; 
-                    font-size: 14px;
-                }}
-                .footer a {{
-                    color: {icon_color};
-                    text-decoration: none;
-                    font-weight: 600;
-                }}
-                .timestamp {{
-                    background-color: #f9fafb;
-                    border-radius: 8px;
-                    padding: 12px;
-                    margin: 20px 0;
-                    text-align: center;
-                    color: #6b7280;
-                    font-size: 14px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <div class="logo">FinGest</div>
-                    <div class="notification-icon">{notificacion.tipo_notificacion.icono}</div>
-                    <p class="header-subtitle">Tu asistente financiero personal</p>
-                </div>
-                
-                <div class="content">
-                    <div class="category">{notificacion.categoria}</div>
-                    <div class="title">{notificacion.titulo}</div>
-                    <div class="message">{notificacion.mensaje}</div>
-                    
-                    {info_adicional}
-                    
-                    <div class="timestamp">
-                        📅 {notificacion.fecha_creacion.strftime('%d de %B de %Y a las %H:%M')}
-                    </div>
-                    
-                    {f'<a href="{notificacion.url_accion}" class="action-button">🔍 Ver Detalles</a>' if notificacion.url_accion else ''}
-                    
-                    <div class="footer">
-                        <p>📧 Has recibido esta notificación porque tienes habilitadas las notificaciones por email en FinGest.</p>
-                        <p>🔧 Si no deseas recibir estas notificaciones, puedes <a href="#">modificar tu configuración</a>.</p>
-                        <br>
-                        <p style="margin: 0; color: #9ca3af; font-size: 12px;">
-                            © 2025 FinGest - Tu compañero en el camino hacia la libertad financiera
-                        </p>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
+        return render_to_string('alertas_notificaciones/emails/notificacion.html', contexto)
+
+
+class PlantillaCompilada:
+    """
+    Plantilla de PlantillaNotificacion ya analizada: los marcadores {variable} u
+    {objeto.atributo} se localizan una sola vez y el render es una única pasada
+    que concatena literales y valores. Un marcador sin valor se deja tal cual.
+    """
+    
+    MARCADOR = re.compile(r'\{([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\}')
+    
+    def __init__(self, texto):
+        self.partes = []
+        posicion = 0
+        for coincidencia in PlantillaCompilada.MARCADOR.finditer(texto):
+            if coincidencia.start() > posicion:
+                self.partes.append(texto[posicion:coincidencia.start()])
+            self.partes.append((coincidencia.group(0), tuple(coincidencia.group(1).split('.'))))
+            posicion = coincidencia.end()
+        if posicion < len(texto):
+            self.partes.append(texto[posicion:])
+    
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def compilar(texto):
+        return PlantillaCompilada(texto)
+    
+    @staticmethod
+    def _resolver(contexto, ruta):
+        valor = contexto.get(ruta[0])
+        for atributo in ruta[1:]:
+            if valor is None:
+                break
+            valor = valor.get(atributo) if isinstance(valor, dict) else getattr(valor, atributo, None)
+        return valor
+    
+    def renderizar(self, contexto):
+        salida = []
+        for parte in self.partes:
+            if isinstance(parte, str):
+                salida.append(parte)
+                continue
+            marcador, ruta = parte
+            valor = PlantillaCompilada._resolver(contexto, ruta)
+            salida.append(marcador if valor is None else str(valor))
+        return ''.join(salida)
+
+
+class PlantillaCache:
+    """
+    Plantillas activas compiladas por tipo de notificación, en memoria del proceso.
+
+    Guardar o eliminar una PlantillaNotificacion incrementa una versión en la caché
+    de Django (ver signals.py), lo que descarta las compiladas en todos los procesos
+    que compartan ese backend de caché.
+    """
+    
+    CLAVE_VERSION = 'alertas_notificaciones:plantillas:version'
+    
+    _compiladas = {}
+    _version = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def obtener(cls, tipo_notificacion_id):
         """
+        Returns:
+            tuple: (asunto, contenido) como PlantillaCompilada, o None si el tipo no tiene plantilla activa
+        """
+        version = cache.get(cls.CLAVE_VERSION, 0)
+        with cls._lock:
+            if version != cls._version:
+                cls._compiladas = {}
+                cls._version = version
+            if tipo_notificacion_id in cls._compiladas:
+                return cls._compiladas[tipo_notificacion_id]
+        
+        plantilla = PlantillaNotificacion.objects.filter(
+            tipo_notificacion_id=tipo_notificacion_id,
+            activa=True
+        ).only('asunto_email', 'plantilla_email').first()
+        compilada = None
+        if plantilla:
+            compilada = (PlantillaCompilada(plantilla.asunto_email), PlantillaCompilada(plantilla.plantilla_email))
+        
+        with cls._lock:
+            if version == cls._version:
+                cls._compiladas[tipo_notificacion_id] = compilada
+        return compilada
+    
+    @classmethod
+    def invalidar(cls):
+        try:
+            cache.incr(cls.CLAVE_VERSION)
+        except ValueError:
+            cache.set(cls.CLAVE_VERSION, 1, None)
+        with cls._lock:
+            cls._compiladas = {}
+            cls._version = None
 
 
 class ConfigurationNotificationService:
@@ -545,14 +1257,11 @@ Estos cambios son efectivos inmediatamente. Puedes modificar tu configuración e
         </html>
         """
         
-        send_mail(
-            subject=asunto,
-            message=mensaje,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[usuario.correo],
-            html_message=contenido_html,
-            fail_silently=False
-        )
+        reporte = EmailService.enviar_lote([
+            EmailService.crear_mensaje(asunto, mensaje, [usuario.correo], html=contenido_html)
+        ])
+        if reporte['errores']:
+            raise RuntimeError(reporte['errores'][0][1])
 
 # Añadir método al EmailService
 EmailService.enviar_email_configuracion = ConfigurationNotificationService.enviar_email_configuracion
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Notificacion, PlantillaNotificacion
+from .services import ContadorNoLeidas, PlantillaCache
+
+@receiver(post_save, sender=PlantillaNotificacion)
+@receiver(post_delete, sender=PlantillaNotificacion)
+def invalidar_plantillas_compiladas(sender, **kwargs):
+    """Descarta las plantillas compiladas en caché cuando se edita una plantilla"""
+    PlantillaCache.invalidar()
+
+
+@receiver(post_save, sender=Notificacion)
+def contar_notificacion_creada(sender, instance, created, **kwargs):
+    """Suma al contador de no leídas del usuario las notificaciones nuevas"""
+    if created and instance.estado in ContadorNoLeidas.ESTADOS:
+        ContadorNoLeidas.incrementar(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Notificacion)
+def descontar_notificacion_eliminada(sender, instance, **kwargs):
+    if instance.estado in ContadorNoLeidas.ESTADOS:
+        ContadorNoLeidas.decrementar(instance.usuario_id)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('marcar-todas-leidas/', views.marcar_todas_leidas, name='marcar_todas_leidas'),
     path('marcar-todas-leidas-simple/', views.marcar_todas_leidas_simple, name='marcar_todas_leidas_simple'),
     path('contador/', views.obtener_contador_notificaciones, name='contador'),
+    path('stream/', views.stream_notificaciones, name='stream'),
     path('test/', views.test_notification, name='test'),
     path('test-currency/', views.test_currency, name='test_currency'),
     path('debug-currency/', views.debug_currency, name='debug_currency'),
@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
@@ -10,7 +12,7 @@ from datetime import timedelta
 import json
 
 from .models import TipoNotificacion, ConfiguracionNotificacion, Notificacion
-from .services import NotificationService, ConfigurationNotificationService
+from .services import NotificationService, ConfigurationNotificationService, ContadorNoLeidas, StreamNotificaciones
 
 def get_relative_time(timestamp):
     now = timezone.now()
@@ -281,13 +283,7 @@ def marcar_notificacion_leida(request, notificacion_id):
 def marcar_todas_leidas(request):
     """API para marcar todas las notificaciones como leídas"""
     try:
-        count = Notificacion.objects.filter(
-            usuario=request.user,
-            estado__in=['enviada', 'pendiente']
-        ).update(
-            estado='leida',
-            fecha_lectura=timezone.now()
-        )
+        count = NotificationService.marcar_todas_como_leidas(request.user)
         
         return JsonResponse({
             'status': 'success', 
@@ -305,6 +301,32 @@ def obtener_contador_notificaciones(request):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)})
 
+@login_required
+async def stream_notificaciones(request):
+    """
+    Stream Server-Sent Events con las notificaciones nuevas y el contador de no leídas.
+    Pensado para servirse por ASGI (FinGest/asgi.py): cada pestaña abierta es una conexión
+    en espera, sin hilo ni conexión a la base propios; las consultas corren en el pool
+    compartido de StreamNotificaciones sólo cuando hay cambios.
+    """
+    usuario = await request.auser()
+    ultimo_id = request.headers.get('Last-Event-ID')
+    ultimo_id = int(ultimo_id) if ultimo_id and ultimo_id.isdigit() else None
+
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            StreamNotificaciones.eventos(usuario.id, ultimo_id),
+            content_type='text/event-stream',
+        )
+    else:
+        # Bajo WSGI un stream infinito bloquearía el worker: se responde el estado actual
+        contenido = await sync_to_async(StreamNotificaciones.instantanea)(usuario.id, ultimo_id)
+        response = HttpResponse(contenido, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Sin buffer en proxies como nginx, para que cada evento llegue en el momento
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # Función de prueba para enviar notificación
 @login_required
 def test_notification(request):
@@ -341,15 +363,19 @@ def marcar_leida_simple(request, notificacion_id):
         )
         
         if notificacion.estado != 'leida':
+            no_leida = notificacion.estado in ContadorNoLeidas.ESTADOS
             notificacion.estado = 'leida'
             notificacion.fecha_lectura = timezone.now()
             notificacion.save()
+            if no_leida:
+                ContadorNoLeidas.decrementar(request.user.id)
             messages.success(request, 'Notificación marcada como leída')
         else:
             # Si ya está leída, marcar como no leída
             notificacion.estado = 'enviada'
             notificacion.fecha_lectura = None
             notificacion.save()
+            ContadorNoLeidas.incrementar(request.user.id)
             messages.success(request, 'Notificación marcada como no leída')
             
     except Notificacion.DoesNotExist:
@@ -363,13 +389,7 @@ def marcar_leida_simple(request, notificacion_id):
 def marcar_todas_leidas_simple(request):
     """Vista simple para marcar todas las notificaciones como leídas (GET request)"""
     try:
-        count = Notificacion.objects.filter(
-            usuario=request.user,
-            estado__in=['enviada', 'pendiente']
-        ).update(
-            estado='leida',
-            fecha_lectura=timezone.now()
-        )
+        count = NotificationService.marcar_todas_como_leidas(request.user)
         
         if count > 0:
             messages.success(request, f'{count} notificaciones marcadas como leídas')
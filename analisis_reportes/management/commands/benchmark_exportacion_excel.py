@@ -0,0 +1,137 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from openpyxl import Workbook
+from usuarios.models import Usuario
+from cuentas.models import Moneda, Cuenta
+from gestion_financiera_basica.models import Movimiento
+from analisis_reportes.services import ExportacionExcelService
+import resource
+import tempfile
+import time
+import uuid
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria de la exportación a Excel en modo streaming (write-only) con un historial grande'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=500000, help='Movimientos a exportar')
+        parser.add_argument('--lote', type=int, default=ExportacionExcelService.TAMANO_LOTE, help='chunk_size de iterator()')
+        parser.add_argument(
+            '--legado',
+            action='store_true',
+            help='Medir también el patrón anterior (Workbook en memoria, una consulta por cuenta). Lento con muchas filas',
+        )
+
+    def handle(self, *args, **options):
+        if options['filas'] < 1 or options['lote'] < 1:
+            raise CommandError('--filas y --lote deben ser mayores a 0')
+
+        # Todo ocurre en una transacción que se revierte al final: no quedan datos de prueba
+        with transaction.atomic():
+            usuario, inicio, fin = self._preparar(options['filas'])
+            self.stdout.write(f"📊 {options['filas']} movimientos (RSS inicial {self._pico_rss():.0f} MB)")
+
+            self._medir('Streaming (write-only + iterator)', lambda archivo: ExportacionExcelService.escribir(
+                archivo,
+                titulo='Benchmark',
+                encabezado=[],
+                resumen=[],
+                filas=ExportacionExcelService.movimientos(usuario, inicio, fin, options['lote']),
+                columnas=['fecha', 'descripcion', 'tipo', 'cuenta', 'monto'],
+            ))
+            if options['legado']:
+                self._medir('Anterior (Workbook en memoria)', lambda archivo: self._exportar_legado(
+                    archivo, usuario, inicio, fin
+                ))
+
+            transaction.set_rollback(True)
+
+    def _medir(self, nombre, exportar):
+        pico_antes = self._pico_rss()
+        with tempfile.TemporaryFile() as archivo:
+            inicio = time.perf_counter()
+            filas = exportar(archivo)
+            duracion = time.perf_counter() - inicio
+            tamano = archivo.tell() / 1024 / 1024
+        pico = self._pico_rss()
+        self.stdout.write(
+            f'   {nombre}: {filas} filas en {duracion:.1f}s ({filas / duracion:.0f} filas/s), '
+            f'{tamano:.1f} MB de archivo, pico RSS {pico:.0f} MB (+{pico - pico_antes:.0f} MB)'
+        )
+
+    @staticmethod
+    def _pico_rss():
+        """Pico de memoria residente del proceso en MB (ru_maxrss está en KB en Linux)"""
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def _preparar(self, filas):
+        """Usuario temporal con dos cuentas y N movimientos repartidos en varios años"""
+        moneda = Moneda.objects.first()
+        if moneda is None:
+            raise CommandError('No hay monedas registradas')
+
+        sufijo = uuid.uuid4().hex[:8]
+        usuario = Usuario.objects.create_user(
+            f'benchmark-{sufijo}@fingest.local',
+            uuid.uuid4().hex,
+            nombres='Benchmark',
+            apellido_paterno='Exportacion',
+            apellido_materno=sufijo,
+            documento_identidad=sufijo,
+            telefono=0,
+            id_moneda=moneda,
+            is_active=False,
+        )
+        cuentas = [
+            Cuenta.objects.create(
+                nombre=f'Benchmark {i}', descripcion='Cuenta temporal de benchmark', saldo_cuenta=0, id_usuario=usuario
+            )
+            for i in range(2)
+        ]
+
+        fin = timezone.now()
+        inicio = fin - timedelta(days=5 * 365)
+        paso = (fin - inicio) / filas
+        # bulk_create en tandas para no tener todos los objetos en memoria a la vez
+        for desde in range(0, filas, 10000):
+            Movimiento.objects.bulk_create([
+                Movimiento(
+                    nombre=f'Movimiento {i}',
+                    tipo='ingreso' if i % 3 == 0 else 'egreso',
+                    monto=Decimal(i % 5000) + Decimal('0.99'),
+                    fecha_movimiento=inicio + paso * i,
+                    id_cuenta=cuentas[i % 2],
+                    id_usuario=usuario,
+                )
+                for i in range(desde, min(desde + 10000, filas))
+            ])
+        return usuario, inicio, fin
+
+    @staticmethod
+    def _exportar_legado(archivo, usuario, fecha_inicio, fecha_fin):
+        """Patrón anterior de exportar_excel: modelos completos, cuenta por fila y recorrido final de anchos"""
+        wb = Workbook()
+        ws = wb.active
+        row = 1
+        transacciones = Movimiento.objects.filter(
+            id_cuenta__id_usuario=usuario,
+            fecha_movimiento__range=[fecha_inicio, fecha_fin]
+        ).order_by('-fecha_movimiento')
+
+        for transaccion in transacciones:
+            row += 1
+            ws[f'A{row}'] = transaccion.fecha_movimiento.strftime('%d/%m/%Y')
+            ws[f'B{row}'] = transaccion.nombre
+            ws[f'C{row}'] = transaccion.tipo.title()
+            ws[f'D{row}'] = transaccion.id_cuenta.nombre
+            ws[f'E{row}'] = f"${transaccion.monto:,.2f}"
+
+        for column in ws.columns:
+            max_length = max(len(str(cell.value)) for cell in column)
+            ws.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+
+        wb.save(archivo)
+        return row - 1
@@ -0,0 +1,49 @@
+from core.management.base import WorkerColaCommand
+from analisis_reportes.services import ColaReportes
+import time
+
+class Command(WorkerColaCommand):
+    help = 'Worker de la cola de reportes: calcula los reportes solicitados y guarda los archivos exportados'
+
+    CANAL = ColaReportes.CANAL
+    LOTE = 5
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--max-intentos',
+            type=int,
+            default=ColaReportes.MAX_INTENTOS,
+            help='Intentos antes de marcar el trabajo como error',
+        )
+        parser.add_argument(
+            '--retener-dias',
+            type=int,
+            default=7,
+            help='Días que se conservan los trabajos terminados y sus archivos; se purgan al iniciar y cada hora (0 para no purgar)',
+        )
+
+    def inicio(self, options):
+        return f"📊 Procesando reportes en lotes de {options['lote']}"
+
+    def procesar_lote(self, options):
+        inicio = time.perf_counter()
+        resultado = ColaReportes.procesar_lote(
+            limite=options['lote'],
+            max_intentos=options['max_intentos'],
+        )
+        total = resultado['completados'] + resultado['reintentos'] + resultado['errores']
+        if total:
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(
+                f"   📄 {resultado['completados']} completados, {resultado['reintentos']} para reintento, "
+                f"{resultado['errores']} con error ({duracion:.1f}s)"
+            )
+        return total
+
+    def mantenimiento(self, options):
+        dias = options['retener_dias']
+        if dias > 0:
+            eliminados = ColaReportes.purgar(dias)
+            if eliminados:
+                self.stdout.write(f'   🗑️  {eliminados} trabajos de más de {dias} días eliminados')
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:10
+
+import json
+
+from django.db import migrations, models
+
+
+def copiar_datos(apps, schema_editor):
+    """Pasa el texto de datos_json a la columna JSON; las secciones se calculan al ver el reporte"""
+    Reporte = apps.get_model('analisis_reportes', 'Reporte')
+
+    for reporte in Reporte.objects.exclude(datos_json__isnull=True).exclude(datos_json='').only('id', 'datos_json').iterator():
+        try:
+            datos = json.loads(reporte.datos_json)
+        except ValueError:
+            continue
+        Reporte.objects.filter(pk=reporte.pk).update(datos=datos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisis_reportes', '0003_trabajoreporte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='datos',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='secciones',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(copiar_datos, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='reporte',
+            name='datos_json',
+        ),
+    ]
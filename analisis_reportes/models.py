@@ -20,7 +20,8 @@ class Reporte(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_inicio = models.DateTimeField(auto_now_add=True)
     fecha_fin = models.DateTimeField(auto_now_add=True)
-    datos_json = models.TextField(blank=True, null=True)  # Para almacenar datos del reporte en JSON
+    datos = models.JSONField(blank=True, null=True)  # Datos del reporte (jsonb en PostgreSQL)
+    secciones = models.JSONField(blank=True, null=True)  # Datos ya procesados para ver_reporte
     id_usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     id_cuenta = models.ForeignKey("cuentas.Cuenta", on_delete=models.CASCADE, null=True, blank=True)
     
@@ -29,13 +30,15 @@ class Reporte(models.Model):
     
     def get_datos(self):
         """Devuelve los datos del reporte como diccionario"""
-        if self.datos_json:
-            return json.loads(self.datos_json)
-        return {}
+        return self.datos or {}
     
-    def set_datos(self, datos):
-        """Guarda los datos del reporte como JSON"""
-        self.datos_json = json.dumps(datos, default=str)
+    def set_datos(self, datos, secciones=None):
+        """
+        Guarda los datos del reporte (decimales y fechas como texto) y, si se
+        indican, las secciones ya procesadas para el template
+        """
+        self.datos = json.loads(json.dumps(datos, default=str))
+        self.secciones = secciones
     
     class Meta:
         ordering = ['-fecha_creacion']
@@ -63,3 +66,44 @@ class ConfiguracionReporte(models.Model):
     class Meta:
         verbose_name = 'Configuración de Reporte'
         verbose_name_plural = 'Configuraciones de Reportes'
+
+
+class TrabajoReporte(models.Model):
+    """
+    Generación de un reporte en segundo plano (ver ColaReportes y `manage.py procesar_reportes`):
+    calcula los datos si aún no hay reporte y, si se pidió un formato, guarda el archivo exportado
+    """
+    ESTADOS = (
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    )
+    
+    id_usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    reporte = models.ForeignKey(Reporte, on_delete=models.CASCADE, null=True, blank=True, related_name='trabajos')
+    parametros = models.JSONField(default=dict, blank=True)  # tipo_reporte, titulo, descripcion, fechas
+    formato = models.CharField(max_length=10, choices=ConfiguracionReporte.FORMATOS_EXPORT, blank=True)
+    
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    archivo = models.FileField(upload_to='reportes/%Y/%m/', blank=True)
+    nombre_archivo = models.CharField(max_length=200, blank=True)
+    
+    # Control de la cola
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(null=True, blank=True)  # Reintento o fin del reclamo de un worker
+    ultimo_error = models.TextField(blank=True, default='')
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_completado = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Trabajo {self.id} ({self.get_estado_display()})"
+    
+    class Meta:
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reportes'
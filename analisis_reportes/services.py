@@ -0,0 +1,773 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import DateField, F, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+
+from cuentas.models import Cuenta, TransferenciaSubCuenta, TransferenciaCuentaPrincipal
+from gestion_financiera_basica.models import Movimiento
+from gestion_financiera_basica.services import CacheFinancieraUsuario
+from .models import Reporte, TrabajoReporte
+from pathlib import Path
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def a_fecha(valor):
+    """Fecha de un date, un datetime o un texto AAAA-MM-DD"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def inicio_del_dia(fecha):
+    """Medianoche de la fecha en la zona horaria actual"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class RollupService:
+    """Series temporales de ingresos/egresos agregadas en una sola consulta"""
+
+    # Granularidades aceptadas (nombre en español -> kind de Trunc)
+    GRANULARIDADES = {
+        'dia': 'day',
+        'semana': 'week',
+        'mes': 'month',
+        'trimestre': 'quarter',
+        'anio': 'year',
+    }
+
+    @staticmethod
+    def normalizar_granularidad(granularidad):
+        """Devuelve el kind de Trunc para una granularidad (acepta 'mes' o 'month')"""
+        if granularidad in RollupService.GRANULARIDADES:
+            return RollupService.GRANULARIDADES[granularidad]
+        if granularidad in RollupService.GRANULARIDADES.values():
+            return granularidad
+        return 'month'
+
+    @staticmethod
+    def serie(usuario, fecha_inicio, fecha_fin, granularidad='mes'):
+        """
+        Calcula ingresos, egresos y neto por periodo entre dos fechas
+
+        Args:
+            usuario: Usuario propietario de los movimientos
+            fecha_inicio: Fecha (o datetime) inicial del rango, inclusive
+            fecha_fin: Fecha (o datetime) final del rango, inclusive
+            granularidad: 'dia', 'semana', 'mes', 'trimestre' o 'anio'
+
+        Returns:
+            dict: labels, periodos (ISO), ingresos, egresos y neto, con ceros
+            en los periodos sin movimientos
+        """
+        kind = RollupService.normalizar_granularidad(granularidad)
+        inicio = a_fecha(fecha_inicio)
+        fin = a_fecha(fecha_fin)
+
+        filas = Movimiento.objects.filter(
+            id_usuario=usuario,
+            fecha_movimiento__gte=inicio_del_dia(inicio),
+            fecha_movimiento__lt=inicio_del_dia(fin + timedelta(days=1)),
+        ).annotate(
+            periodo=Trunc('fecha_movimiento', kind, output_field=DateField())
+        ).values('periodo').annotate(
+            ingresos=Sum('monto', filter=Q(tipo='ingreso')),
+            egresos=Sum('monto', filter=Q(tipo='egreso')),
+        ).order_by('periodo')
+
+        totales = {fila['periodo']: fila for fila in filas}
+
+        labels = []
+        periodos = []
+        ingresos = []
+        egresos = []
+        neto = []
+
+        for periodo in RollupService.periodos(inicio, fin, kind):
+            fila = totales.get(periodo, {})
+            ingreso = fila.get('ingresos') or Decimal('0')
+            egreso = fila.get('egresos') or Decimal('0')
+
+            labels.append(RollupService.etiqueta(periodo, kind))
+            periodos.append(periodo.isoformat())
+            ingresos.append(float(ingreso))
+            egresos.append(float(egreso))
+            neto.append(float(ingreso - egreso))
+
+        return {
+            'granularidad': kind,
+            'labels': labels,
+            'periodos': periodos,
+            'ingresos': ingresos,
+            'egresos': egresos,
+            'neto': neto,
+        }
+
+    @staticmethod
+    def periodos(inicio, fin, kind):
+        """Genera el inicio de cada periodo entre dos fechas (rellena huecos)"""
+        actual = RollupService.truncar(inicio, kind)
+        while actual <= fin:
+            yield actual
+            actual = RollupService._siguiente(actual, kind)
+
+    @staticmethod
+    def truncar(fecha, kind):
+        """Trunca una fecha igual que Trunc() en la base de datos"""
+        if kind == 'day':
+            return fecha
+        if kind == 'week':
+            return fecha - timedelta(days=fecha.weekday())
+        if kind == 'month':
+            return fecha.replace(day=1)
+        if kind == 'quarter':
+            return fecha.replace(month=((fecha.month - 1) // 3) * 3 + 1, day=1)
+        return fecha.replace(month=1, day=1)
+
+    @staticmethod
+    def etiqueta(periodo, kind):
+        """Texto a mostrar en el eje del gráfico para un periodo"""
+        if kind == 'day':
+            return periodo.strftime('%d %b %Y')
+        if kind == 'week':
+            return f"Sem {periodo.strftime('%d %b %Y')}"
+        if kind == 'month':
+            return periodo.strftime('%b %Y')
+        if kind == 'quarter':
+            return f"T{(periodo.month - 1) // 3 + 1} {periodo.year}"
+        return str(periodo.year)
+
+    @staticmethod
+    def _siguiente(periodo, kind):
+        if kind == 'day':
+            return periodo + timedelta(days=1)
+        if kind == 'week':
+            return periodo + timedelta(days=7)
+        if kind == 'year':
+            return periodo.replace(year=periodo.year + 1)
+        meses = 3 if kind == 'quarter' else 1
+        mes = periodo.month - 1 + meses
+        return periodo.replace(year=periodo.year + mes // 12, month=mes % 12 + 1)
+
+
+class ExportacionExcelService:
+    """
+    Exportación de movimientos a Excel en modo write-only de openpyxl.
+
+    Las filas se leen con iterator() en lotes y se escriben a medida que llegan,
+    así la memoria usada no depende del número de movimientos exportados.
+    """
+
+    TAMANO_LOTE = 2000
+    CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    # Columnas disponibles: (encabezado, ancho)
+    COLUMNAS = {
+        'fecha': ('Fecha', 12),
+        'descripcion': ('Descripción', 40),
+        'tipo': ('Tipo', 10),
+        'cuenta': ('Cuenta', 25),
+        'monto': ('Monto', 16),
+    }
+
+    @staticmethod
+    def movimientos(usuario, fecha_inicio, fecha_fin, tamano_lote=None):
+        """
+        Movimientos del período como tuplas (fecha_movimiento, nombre, tipo, cuenta, monto),
+        del más reciente al más antiguo, sin instanciar modelos ni consultar cada cuenta
+        """
+        return Movimiento.objects.filter(
+            id_usuario=usuario,
+            fecha_movimiento__range=[fecha_inicio, fecha_fin]
+        ).order_by('-fecha_movimiento').values_list(
+            'fecha_movimiento', 'nombre', 'tipo', 'id_cuenta__nombre', 'monto'
+        ).iterator(chunk_size=tamano_lote or ExportacionExcelService.TAMANO_LOTE)
+
+    @staticmethod
+    def escribir(archivo, titulo, encabezado, resumen, filas, columnas, hoja='Reporte Financiero', monto_con_signo=False):
+        """
+        Escribe el libro en un archivo (ruta o archivo binario abierto)
+
+        Args:
+            archivo: Destino del .xlsx
+            titulo: Título de la primera fila
+            encabezado: Líneas de texto bajo el título (período, fecha de generación)
+            resumen: Lista de pares (etiqueta, valor) del resumen general
+            filas: Iterable de tuplas como las de movimientos()
+            columnas: Claves de COLUMNAS en el orden a escribir
+            hoja: Nombre de la hoja
+            monto_con_signo: Si es True los egresos se escriben en negativo
+
+        Returns:
+            int: Cantidad de movimientos escritos
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(hoja)
+
+        # En modo write-only no se puede recorrer la hoja al final: los anchos se fijan antes
+        for indice, clave in enumerate(columnas):
+            ws.column_dimensions[chr(ord('A') + indice)].width = ExportacionExcelService.COLUMNAS[clave][1]
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+
+        def celda(valor, font=None, fill=None):
+            cell = WriteOnlyCell(ws, value=valor)
+            if font:
+                cell.font = font
+            if fill:
+                cell.fill = fill
+            return cell
+
+        ws.append([celda(titulo, Font(bold=True, size=16))])
+        for linea in encabezado:
+            ws.append([linea])
+        ws.append([])
+
+        ws.append([celda("RESUMEN GENERAL", header_font, header_fill)])
+        etiqueta_font = Font(bold=True)
+        for etiqueta, valor in resumen:
+            ws.append([celda(etiqueta, etiqueta_font), valor])
+        ws.append([])
+        ws.append([])
+
+        ws.append([celda("TRANSACCIONES DETALLADAS", header_font, header_fill)])
+        ws.append([
+            celda(ExportacionExcelService.COLUMNAS[clave][0], header_font, header_fill)
+            for clave in columnas
+        ])
+
+        total = 0
+        for fecha, nombre, tipo, cuenta, monto in filas:
+            if monto_con_signo and tipo != 'ingreso':
+                monto = -monto
+            valores = {
+                'fecha': fecha.strftime('%d/%m/%Y'),
+                'descripcion': nombre,
+                'tipo': tipo.title(),
+                'cuenta': cuenta,
+                'monto': f"${monto:,.2f}",
+            }
+            ws.append([valores[clave] for clave in columnas])
+            total += 1
+
+        wb.save(archivo)
+        return total
+
+
+class ExportacionCSVError(Exception):
+    """Parámetros de exportación no válidos (fuente, columnas o fechas)"""
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+class ExportacionCSVService:
+    """
+    Exportación CSV del historial completo (movimientos y transferencias).
+
+    Las filas se generan a medida que se consumen: la primera línea sale antes de
+    ejecutar la consulta y el resto se lee con un cursor del servidor (iterator()),
+    así la memoria no depende del tamaño del historial.
+    """
+
+    TAMANO_LOTE = 2000
+
+    # fuente -> modelo, campo de usuario, campo de fecha y columnas {clave: (encabezado, lookup)}
+    FUENTES = {
+        'movimientos': {
+            'modelo': Movimiento,
+            'usuario': 'id_usuario',
+            'fecha': 'fecha_movimiento',
+            'columnas': {
+                'fecha': ('Fecha', 'fecha_movimiento'),
+                'tipo': ('Tipo', 'tipo'),
+                'categoria': ('Categoría', 'categoria'),
+                'nombre': ('Nombre', 'nombre'),
+                'descripcion': ('Descripción', 'descripcion'),
+                'monto': ('Monto', 'monto'),
+                'cuenta': ('Cuenta', 'id_cuenta__nombre'),
+            },
+        },
+        'transferencias_subcuentas': {
+            'modelo': TransferenciaSubCuenta,
+            'usuario': 'id_usuario',
+            'fecha': 'fecha_transferencia',
+            'columnas': {
+                'fecha': ('Fecha', 'fecha_transferencia'),
+                'origen': ('Subcuenta origen', 'subcuenta_origen__nombre'),
+                'destino': ('Subcuenta destino', 'subcuenta_destino__nombre'),
+                'monto': ('Monto', 'monto'),
+                'descripcion': ('Descripción', 'descripcion'),
+            },
+        },
+        'transferencias_principal': {
+            'modelo': TransferenciaCuentaPrincipal,
+            'usuario': 'id_usuario',
+            'fecha': 'fecha_transferencia',
+            'columnas': {
+                'fecha': ('Fecha', 'fecha_transferencia'),
+                'tipo': ('Tipo', 'tipo'),
+                'subcuenta': ('Subcuenta', 'subcuenta__nombre'),
+                'cuenta': ('Cuenta principal', 'cuenta_destino__nombre'),
+                'monto': ('Monto', 'monto'),
+                'descripcion': ('Descripción', 'descripcion'),
+            },
+        },
+    }
+
+    @staticmethod
+    def validar(fuente, columnas=None):
+        """
+        Devuelve la lista de columnas a exportar (todas si no se indican)
+
+        Raises:
+            ExportacionCSVError: Si la fuente o alguna columna no existe
+        """
+        if fuente not in ExportacionCSVService.FUENTES:
+            raise ExportacionCSVError(
+                f"Fuente no válida: {fuente}. Opciones: {', '.join(ExportacionCSVService.FUENTES)}"
+            )
+        disponibles = ExportacionCSVService.FUENTES[fuente]['columnas']
+        if not columnas:
+            return list(disponibles)
+        invalidas = [columna for columna in columnas if columna not in disponibles]
+        if invalidas:
+            raise ExportacionCSVError(
+                f"Columnas no válidas para {fuente}: {', '.join(invalidas)}. Opciones: {', '.join(disponibles)}"
+            )
+        return list(columnas)
+
+    @staticmethod
+    def consulta(fuente, usuario, columnas, desde=None, hasta=None):
+        """
+        Tuplas con las columnas pedidas, de la más antigua a la más reciente
+
+        Args:
+            desde / hasta: Fechas (date o 'YYYY-MM-DD') inclusivas, opcionales
+        """
+        definicion = ExportacionCSVService.FUENTES[fuente]
+        campo_fecha = definicion['fecha']
+        filas = definicion['modelo'].objects.filter(**{definicion['usuario']: usuario})
+        if desde:
+            filas = filas.filter(**{
+                f'{campo_fecha}__gte': inicio_del_dia(a_fecha(desde))
+            })
+        if hasta:
+            filas = filas.filter(**{
+                f'{campo_fecha}__lt': inicio_del_dia(a_fecha(hasta) + timedelta(days=1))
+            })
+        return filas.order_by(campo_fecha, 'pk').values_list(
+            *[definicion['columnas'][columna][1] for columna in columnas]
+        )
+
+    @staticmethod
+    def lineas(fuente, usuario, columnas=None, desde=None, hasta=None, tamano_lote=None):
+        """
+        Generador de líneas CSV (encabezado incluido) para usar con StreamingHttpResponse.
+        Las fechas se escriben en hora local y los montos sin formato de moneda.
+
+        Raises:
+            ExportacionCSVError: Si los parámetros no son válidos (antes de generar nada)
+        """
+        columnas = ExportacionCSVService.validar(fuente, columnas)
+        try:
+            desde = a_fecha(desde) if desde else None
+            hasta = a_fecha(hasta) if hasta else None
+        except ValueError:
+            raise ExportacionCSVError('Las fechas deben tener el formato YYYY-MM-DD')
+        if desde and hasta and desde > hasta:
+            raise ExportacionCSVError('La fecha inicial no puede ser posterior a la final')
+        definicion = ExportacionCSVService.FUENTES[fuente]
+        indice_fecha = columnas.index('fecha') if 'fecha' in columnas else None
+
+        def generar():
+            writer = csv.writer(_Eco())
+            yield writer.writerow([definicion['columnas'][columna][0] for columna in columnas])
+            filas = ExportacionCSVService.consulta(fuente, usuario, columnas, desde, hasta).iterator(
+                chunk_size=tamano_lote or ExportacionCSVService.TAMANO_LOTE
+            )
+            for fila in filas:
+                if indice_fecha is not None:
+                    fila = list(fila)
+                    fila[indice_fecha] = timezone.localtime(fila[indice_fecha]).strftime('%Y-%m-%d %H:%M:%S')
+                yield writer.writerow(fila)
+
+        return generar()
+
+
+class ColaReportes:
+    """
+    Cola de generación de reportes sobre la tabla TrabajoReporte.
+
+    La vista crea el trabajo y responde al instante; el worker (`manage.py procesar_reportes`)
+    lo reclama con SELECT ... FOR UPDATE SKIP LOCKED, calcula los datos, exporta el archivo
+    al almacenamiento y reintenta los fallos con backoff exponencial hasta pasarlo a 'error'.
+    """
+
+    # Canal de LISTEN/NOTIFY con el que se despierta al worker en PostgreSQL
+    CANAL = 'reportes_pendientes'
+
+    # Tiempo que un trabajo reclamado queda reservado; si el worker muere, otro lo retoma al vencer
+    RECLAMO = timedelta(minutes=15)
+
+    BACKOFF_BASE = 30  # segundos; se duplica en cada intento
+    MAX_INTENTOS = 3
+
+    @staticmethod
+    def solicitar(usuario, parametros=None, formato='', reporte=None):
+        """
+        Crea un trabajo y lo encola al confirmar la transacción
+
+        Args:
+            usuario: Dueño del reporte
+            parametros: tipo_reporte, titulo, descripcion, fecha_inicio y fecha_fin (ISO) para
+                generar un reporte nuevo; se ignoran si se indica `reporte`
+            formato: 'pdf', 'excel', 'csv' o '' para sólo calcular los datos
+            reporte: Reporte ya generado que sólo hay que exportar
+        """
+        with transaction.atomic():
+            trabajo = TrabajoReporte.objects.create(
+                id_usuario=usuario,
+                reporte=reporte,
+                parametros=parametros or {},
+                formato=formato or '',
+            )
+            transaction.on_commit(lambda: ColaReportes.encolar(trabajo.id))
+        if getattr(settings, 'REPORTES_GENERACION', 'cola') == 'inmediata':
+            # Ya se procesó en on_commit (si no hay una transacción exterior)
+            trabajo.refresh_from_db()
+        return trabajo
+
+    @staticmethod
+    def encolar(trabajo_id):
+        """Se ejecuta en on_commit: avisa al worker o procesa en el momento según REPORTES_GENERACION"""
+        if getattr(settings, 'REPORTES_GENERACION', 'cola') == 'inmediata':
+            ColaReportes.procesar_lote(ids=[trabajo_id])
+        else:
+            ColaReportes.avisar()
+
+    @staticmethod
+    def avisar():
+        """Despierta a los workers que esperan con LISTEN (sólo PostgreSQL)"""
+        if connection.vendor != 'postgresql':
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, '')", [ColaReportes.CANAL])
+        except Exception as e:
+            # El worker igualmente encuentra el trabajo en su siguiente sondeo
+            logger.warning(f"No se pudo avisar a la cola de reportes: {e}")
+
+    @staticmethod
+    def reclamar(limite, ids=None):
+        """
+        Reserva hasta `limite` trabajos listos: pendientes o en proceso con el reclamo vencido
+
+        Returns:
+            list: ids reclamados (quedan 'procesando' hasta proximo_intento)
+        """
+        ahora = timezone.now()
+        with transaction.atomic():
+            listos = TrabajoReporte.objects.select_for_update(skip_locked=True).filter(
+                Q(estado='pendiente', proximo_intento__isnull=True)
+                | Q(estado__in=['pendiente', 'procesando'], proximo_intento__lte=ahora)
+            )
+            if ids is not None:
+                listos = listos.filter(id__in=ids)
+            reclamados = list(listos.order_by('fecha_creacion').values_list('id', flat=True)[:limite])
+            if reclamados:
+                TrabajoReporte.objects.filter(id__in=reclamados).update(
+                    estado='procesando',
+                    intentos=F('intentos') + 1,
+                    proximo_intento=ahora + ColaReportes.RECLAMO,
+                )
+        return reclamados
+
+    @staticmethod
+    def procesar_lote(limite=5, max_intentos=None, ids=None):
+        """
+        Reclama y procesa un lote, de a un trabajo por vez (ReportLab y matplotlib
+        no son seguros entre hilos)
+
+        Returns:
+            dict: cantidades 'completados', 'reintentos' y 'errores'
+        """
+        max_intentos = max_intentos or ColaReportes.MAX_INTENTOS
+        resultado = {'completados': 0, 'reintentos': 0, 'errores': 0}
+
+        for trabajo in TrabajoReporte.objects.filter(
+            id__in=ColaReportes.reclamar(limite, ids=ids)
+        ).select_related('id_usuario', 'reporte').order_by('fecha_creacion'):
+            try:
+                ColaReportes.procesar(trabajo)
+            except Exception as e:
+                resultado[ColaReportes.registrar_fallo(trabajo, e, max_intentos)] += 1
+            else:
+                resultado['completados'] += 1
+        return resultado
+
+    @staticmethod
+    def procesar(trabajo):
+        """Calcula los datos (si hace falta), guarda el archivo exportado y marca el trabajo completado"""
+        from .views import calcular_datos_reporte, procesar_datos_para_template
+
+        reporte = trabajo.reporte
+        if reporte is None:
+            parametros = trabajo.parametros
+            fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
+            fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
+            datos = calcular_datos_reporte(trabajo.id_usuario, parametros['tipo_reporte'], fecha_inicio, fecha_fin)
+            reporte = Reporte(
+                tipo_reporte=parametros['tipo_reporte'],
+                titulo=parametros.get('titulo') or f"Reporte {parametros['tipo_reporte']}",
+                descripcion=parametros.get('descripcion', ''),
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                id_usuario=trabajo.id_usuario,
+            )
+            reporte.set_datos(datos)
+            # Las secciones del template se calculan aquí una vez; ver_reporte no reprocesa los datos
+            reporte.secciones = procesar_datos_para_template(reporte.tipo_reporte, reporte.datos)
+            reporte.save()
+            # Queda asociado aunque la exportación falle: el reintento sólo exporta
+            TrabajoReporte.objects.filter(pk=trabajo.pk).update(reporte=reporte)
+            trabajo.reporte = reporte
+
+        if trabajo.formato:
+            # Se renderiza a través de la caché: las descargas directas del mismo reporte la reutilizan
+            archivo, _ = CacheArtefactosReporte.abrir(reporte, trabajo.formato)
+            nombre = CacheArtefactosReporte.nombre_descarga(reporte, trabajo.formato)
+            with archivo:
+                trabajo.archivo.save(nombre, File(archivo, name=nombre), save=False)
+            trabajo.nombre_archivo = nombre
+
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(
+            estado='completado',
+            archivo=trabajo.archivo.name or '',
+            nombre_archivo=trabajo.nombre_archivo,
+            proximo_intento=None,
+            ultimo_error='',
+            fecha_completado=timezone.now(),
+        )
+
+    @staticmethod
+    def registrar_fallo(trabajo, error, max_intentos):
+        """Programa el siguiente intento con backoff exponencial o pasa el trabajo a 'error'"""
+        # El contador ya incluye el intento actual (se incrementa al reclamar)
+        intentos = trabajo.intentos
+        cambios = {'ultimo_error': str(error)[:1000]}
+        if intentos >= max_intentos:
+            cambios.update(estado='error', proximo_intento=None)
+            resultado = 'errores'
+            logger.error(f"Trabajo de reporte {trabajo.id} descartado tras {intentos} intentos: {error}")
+        else:
+            espera = ColaReportes.BACKOFF_BASE * 2 ** (intentos - 1)
+            cambios.update(estado='pendiente', proximo_intento=timezone.now() + timedelta(seconds=espera))
+            resultado = 'reintentos'
+            logger.warning(f"Trabajo de reporte {trabajo.id} falló (intento {intentos}), reintento en {espera}s: {error}")
+
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(**cambios)
+        return resultado
+
+    @staticmethod
+    def purgar(dias):
+        """Elimina los trabajos terminados hace más de `dias` días junto con sus archivos"""
+        limite = timezone.now() - timedelta(days=dias)
+        viejos = TrabajoReporte.objects.filter(
+            Q(fecha_completado__lt=limite) | Q(estado='error', fecha_creacion__lt=limite)
+        )
+        eliminados = 0
+        for trabajo in viejos.only('id', 'archivo'):
+            if trabajo.archivo:
+                trabajo.archivo.delete(save=False)
+            trabajo.delete()
+            eliminados += 1
+        return eliminados
+
+
+class CacheArtefactosReporte:
+    """
+    Caché en disco de los archivos exportados de un Reporte.
+
+    La clave es (reporte, formato, hash de datos, VERSION_RENDER). Los archivos no se
+    comparten entre reportes aunque tengan los mismos datos: PDF, Excel y CSV imprimen el
+    título, la fecha de creación y el período de cada reporte. El Excel lee los movimientos
+    actuales y sólo se guarda con una caché compartida (ver CacheFinancieraUsuario.version).
+    El directorio se limita a REPORTES_CACHE_MAX_MB y se desalojan primero los archivos
+    usados hace más tiempo (mtime se renueva en cada acierto).
+    """
+
+    # Incrementar al cambiar exportar_pdf / exportar_reporte_excel / exportar_csv
+    VERSION_RENDER = 1
+
+    EXTENSIONES = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv'}
+    CONTENT_TYPES = {
+        'pdf': 'application/pdf',
+        'excel': ExportacionExcelService.CONTENT_TYPE,
+        'csv': 'text/csv',
+    }
+
+    @staticmethod
+    def directorio():
+        return Path(getattr(settings, 'REPORTES_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'cache_reportes'))
+
+    @staticmethod
+    def max_bytes():
+        return getattr(settings, 'REPORTES_CACHE_MAX_MB', 200) * 1024 * 1024
+
+    @staticmethod
+    def entradas(reporte, formato):
+        """Todo lo que determina el archivo exportado de un reporte en un formato"""
+        entradas = {
+            'reporte': reporte.pk,
+            'formato': formato,
+            'version': CacheArtefactosReporte.VERSION_RENDER,
+            'datos': hashlib.sha256(json.dumps(reporte.datos, sort_keys=True).encode()).hexdigest(),
+        }
+        if formato == 'excel':
+            # El Excel lista los movimientos y saldos actuales, no la foto de datos: depende
+            # de la versión de datos del usuario, que cambia con cada escritura de Movimiento o Cuenta
+            version = CacheFinancieraUsuario.version(reporte.id_usuario_id)
+            if version is None:
+                # Sin caché compartida no hay versión confiable: el Excel no se guarda
+                return None
+            entradas['datos_usuario'] = version
+        return entradas
+
+    @staticmethod
+    def clave(reporte, formato):
+        """Hash de las entradas del exportador; también se usa como ETag. None si no se guarda en caché"""
+        entradas = CacheArtefactosReporte.entradas(reporte, formato)
+        if entradas is None:
+            return None
+        return hashlib.sha256(json.dumps(entradas, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def nombre_descarga(reporte, formato):
+        """Nombre de archivo para el usuario (no depende de la entrada de caché compartida)"""
+        tipo_clean = reporte.get_tipo_reporte_display().replace(' ', '_').replace('/', '-')
+        fecha_str = reporte.fecha_creacion.strftime('%Y%m%d_%H%M')
+        return f"FinGest_Reporte_{tipo_clean}_{fecha_str}.{CacheArtefactosReporte.EXTENSIONES[formato]}"
+
+    @staticmethod
+    def abrir(reporte, formato, clave=None):
+        """
+        Devuelve el archivo exportado abierto en modo binario, generándolo si no está en caché
+
+        El archivo se abre antes de devolverlo, así un desalojo concurrente no lo invalida.
+
+        Returns:
+            tuple: (archivo abierto, clave); clave es None si el formato no se guarda en caché
+        """
+        clave = clave or CacheArtefactosReporte.clave(reporte, formato)
+        if clave is None:
+            archivo = tempfile.TemporaryFile()
+            CacheArtefactosReporte._escribir(reporte, formato, archivo)
+            archivo.seek(0)
+            return archivo, None
+        ruta = CacheArtefactosReporte.directorio() / f"{clave}.{CacheArtefactosReporte.EXTENSIONES[formato]}"
+
+        try:
+            archivo = open(ruta, 'rb')
+        except FileNotFoundError:
+            CacheArtefactosReporte._generar(reporte, formato, ruta)
+            archivo = open(ruta, 'rb')
+        else:
+            # Acierto: renovar la antigüedad para el desalojo LRU
+            try:
+                os.utime(ruta)
+            except OSError:
+                pass
+        return archivo, clave
+
+    @staticmethod
+    def _escribir(reporte, formato, destino):
+        """Exporta el reporte al archivo binario abierto `destino`"""
+        from .views import exportar_archivo_reporte
+
+        respuesta = exportar_archivo_reporte(reporte, formato)
+        try:
+            origen = getattr(respuesta, 'file_to_stream', None)
+            if origen is not None:
+                shutil.copyfileobj(origen, destino)
+            else:
+                destino.write(respuesta.content)
+        finally:
+            respuesta.close()
+
+    @staticmethod
+    def _generar(reporte, formato, ruta):
+        """Exporta el reporte y lo publica en la caché con un rename atómico"""
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = tempfile.NamedTemporaryFile(dir=ruta.parent, suffix='.tmp', delete=False)
+        try:
+            with temporal:
+                CacheArtefactosReporte._escribir(reporte, formato, temporal)
+            os.replace(temporal.name, ruta)
+        except Exception:
+            os.unlink(temporal.name)
+            raise
+        CacheArtefactosReporte.desalojar()
+
+    @staticmethod
+    def desalojar(max_bytes=None):
+        """
+        Elimina los archivos usados hace más tiempo hasta dejar la caché bajo el límite
+
+        Returns:
+            int: Archivos eliminados
+        """
+        max_bytes = CacheArtefactosReporte.max_bytes() if max_bytes is None else max_bytes
+        try:
+            entradas = [
+                entrada for entrada in os.scandir(CacheArtefactosReporte.directorio())
+                if entrada.is_file() and not entrada.name.endswith('.tmp')
+            ]
+        except FileNotFoundError:
+            return 0
+
+        archivos = []
+        total = 0
+        for entrada in entradas:
+            try:
+                estado = entrada.stat()
+            except FileNotFoundError:
+                continue
+            archivos.append((estado.st_mtime, estado.st_size, entrada.path))
+            total += estado.st_size
+        if total <= max_bytes:
+            return 0
+
+        eliminados = 0
+        for _, tamano, ruta in sorted(archivos):
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            eliminados += 1
+        return eliminados
@@ -9,7 +9,11 @@ urlpatterns = [
     path('generar/', views.generar_reporte, name='generar_reporte'),
     path('ver/<int:reporte_id>/', views.ver_reporte, name='ver_reporte'),
     path('exportar/<int:reporte_id>/<str:formato>/', views.exportar_reporte, name='exportar_reporte'),
+    path('trabajos/<int:trabajo_id>/', views.ver_trabajo, name='ver_trabajo'),
+    path('trabajos/<int:trabajo_id>/estado/', views.estado_trabajo, name='estado_trabajo'),
+    path('trabajos/<int:trabajo_id>/descargar/', views.descargar_trabajo, name='descargar_trabajo'),
     path('exportar-excel/', views.exportar_excel, name='exportar_excel'),
+    path('exportar-csv/', views.exportar_historial_csv, name='exportar_historial_csv'),
     path('exportar-pdf/', views.exportar_pdf_simple, name='exportar_pdf'),
     path('api/datos/<str:tipo>/', views.api_datos_grafico, name='api_datos_grafico'),
 ]
\ No newline at end of file
@@ -1,8 +1,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, Q, Avg
+from django.urls import reverse
+from django.db.models import Sum, Count, Q, Avg, TextField
+from django.db.models.functions import Cast
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -22,15 +24,39 @@ import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import base64
+import tempfile
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils.dataframe import dataframe_to_rows
 from django.utils.text import slugify
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 
 from core.decorators import fast_access_pin_verified
-from .models import Reporte, ConfiguracionReporte
+from .models import Reporte, ConfiguracionReporte, TrabajoReporte
+from .services import CacheArtefactosReporte, ColaReportes, ExportacionCSVError, ExportacionCSVService, ExportacionExcelService, RollupService
 from cuentas.models import Cuenta, SubCuenta, TransferenciaSubCuenta
+from cuentas.services import CarteraSubcuentasService
 from gestion_financiera_basica.models import Movimiento, MetaAhorro
+from gestion_financiera_basica.services import CacheFinancieraUsuario, ResumenMensualService
+
+def datos_dashboard_reportes(usuario, fecha_inicio, fecha_fin, granularidad):
+    """
+    Estadísticas y series del dashboard de reportes para un período, en caché
+    hasta el próximo cambio de datos del usuario (ver CacheFinancieraUsuario)
+    """
+    def calcular():
+        # Una sola consulta agrupada alimenta ambos gráficos temporales
+        serie = RollupService.serie(usuario, fecha_inicio, fecha_fin, granularidad)
+        return {
+            'stats': calcular_estadisticas_generales(usuario, fecha_inicio, fecha_fin),
+            'gastos_categoria': get_gastos_por_categoria(usuario, fecha_inicio, fecha_fin),
+            'ingresos_egresos': get_ingresos_vs_egresos(usuario, fecha_inicio, fecha_fin, serie=serie),
+            'subcuentas_data': get_estadisticas_subcuentas(usuario),
+            'flujo_mensual': get_flujo_mensual(usuario, fecha_inicio, fecha_fin, serie=serie),
+        }
+
+    return CacheFinancieraUsuario.obtener(usuario, 'reportes', calcular, fecha_inicio, fecha_fin, granularidad)
 
 @login_required
 @fast_access_pin_verified
@@ -44,6 +70,7 @@ def reports(request):
     
     # Obtener parámetros de filtro
     periodo = request.GET.get('periodo', config.periodo_default)
+    granularidad = request.GET.get('granularidad', 'mes')
     
     # Manejar fechas personalizadas
     if periodo == 'personalizado':
@@ -64,22 +91,15 @@ def reports(request):
     # Si es una request AJAX para actualizar filtros
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         try:
-            stats = calcular_estadisticas_generales(request.user, fecha_inicio, fecha_fin)
-            gastos_categoria = get_gastos_por_categoria(request.user, fecha_inicio, fecha_fin)
-            ingresos_egresos = get_ingresos_vs_egresos(request.user, fecha_inicio, fecha_fin)
-            subcuentas_data = get_estadisticas_subcuentas(request.user)
-            flujo_mensual = get_flujo_mensual(request.user, fecha_inicio, fecha_fin)
+            datos = datos_dashboard_reportes(request.user, fecha_inicio, fecha_fin, granularidad)
             
             return JsonResponse({
                 'success': True,
-                'stats': stats,
-                'gastos_categoria': gastos_categoria,
-                'ingresos_egresos': ingresos_egresos,
-                'subcuentas_data': subcuentas_data,
-                'flujo_mensual': flujo_mensual,
+                **datos,
                 'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
                 'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
                 'periodo': periodo,
+                'granularidad': granularidad,
             })
         except Exception as e:
             return JsonResponse({
@@ -90,24 +110,19 @@ def reports(request):
     # Obtener cuentas del usuario
     cuentas = Cuenta.objects.filter(id_usuario=request.user)
     
-    # Calcular estadísticas generales
-    stats = calcular_estadisticas_generales(request.user, fecha_inicio, fecha_fin)
-    
-    # Datos para gráficos
-    gastos_categoria = get_gastos_por_categoria(request.user, fecha_inicio, fecha_fin)
-    ingresos_egresos = get_ingresos_vs_egresos(request.user, fecha_inicio, fecha_fin)
-    subcuentas_data = get_estadisticas_subcuentas(request.user)
-    flujo_mensual = get_flujo_mensual(request.user, fecha_inicio, fecha_fin)
+    # Estadísticas generales y datos para gráficos
+    datos = datos_dashboard_reportes(request.user, fecha_inicio, fecha_fin, granularidad)
     
     # Reportes recientes
-    reportes_recientes = Reporte.objects.filter(id_usuario=request.user).order_by('-fecha_creacion')[:5]
+    # El listado sólo muestra títulos y fechas: no se traen los datos del reporte
+    reportes_recientes = Reporte.objects.filter(id_usuario=request.user).defer('datos', 'secciones').order_by('-fecha_creacion')[:5]
     
     context = {
-        'stats': stats,
-        'gastos_categoria': json.dumps(gastos_categoria),
-        'ingresos_egresos': json.dumps(ingresos_egresos),
-        'subcuentas_data': json.dumps(subcuentas_data),
-        'flujo_mensual': json.dumps(flujo_mensual),
+        'stats': datos['stats'],
+        'gastos_categoria': json.dumps(datos['gastos_categoria']),
+        'ingresos_egresos': json.dumps(datos['ingresos_egresos']),
+        'subcuentas_data': json.dumps(datos['subcuentas_data']),
+        'flujo_mensual': json.dumps(datos['flujo_mensual']),
         'reportes_recientes': reportes_recientes,
         'periodo_actual': periodo,
         'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
@@ -121,101 +136,215 @@ def reports(request):
 @login_required
 @fast_access_pin_verified
 def generar_reporte(request):
-    """Vista para generar un reporte específico"""
+    """
+    Vista para generar un reporte específico
+
+    El cálculo y la exportación (formato_export) se encolan como TrabajoReporte; la respuesta
+    es inmediata: JSON con la URL de estado (AJAX) o redirección a la página del trabajo.
+    """
     if request.method == 'POST':
         tipo_reporte = request.POST.get('tipo_reporte')
         titulo = request.POST.get('titulo', f'Reporte {tipo_reporte}')
-        fecha_inicio = datetime.strptime(request.POST.get('fecha_inicio'), '%Y-%m-%d')
-        fecha_fin = datetime.strptime(request.POST.get('fecha_fin'), '%Y-%m-%d')
-        
-        # Generar datos según el tipo de reporte
-        datos_reporte = {}
-        
-        if tipo_reporte == 'gastos_categoria':
-            datos_reporte = get_gastos_por_categoria(request.user, fecha_inicio, fecha_fin)
-        elif tipo_reporte == 'ingresos_egresos':
-            datos_reporte = get_ingresos_vs_egresos(request.user, fecha_inicio, fecha_fin)
-        elif tipo_reporte == 'subcuentas_analisis':
-            datos_reporte = get_estadisticas_subcuentas(request.user)
-        elif tipo_reporte == 'balance_general':
-            datos_reporte = get_balance_general(request.user, fecha_inicio, fecha_fin)
-        elif tipo_reporte == 'flujo_efectivo':
-            datos_reporte = get_flujo_mensual(request.user, fecha_inicio, fecha_fin)
-        
-        # Crear el reporte
-        reporte = Reporte.objects.create(
-            tipo_reporte=tipo_reporte,
-            titulo=titulo,
-            descripcion=request.POST.get('descripcion', ''),
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-            id_usuario=request.user,
-            datos_json=json.dumps(datos_reporte, default=str)
+        formato_export = request.POST.get('formato_export', '')
+        
+        if tipo_reporte not in dict(Reporte.TIPOS_REPORTE):
+            messages.error(request, 'Tipo de reporte no válido.')
+            return redirect('analisis_reportes:reports')
+        if formato_export and formato_export not in dict(ConfiguracionReporte.FORMATOS_EXPORT):
+            messages.error(request, 'Formato de exportación no válido.')
+            return redirect('analisis_reportes:reports')
+        try:
+            fecha_inicio = datetime.strptime(request.POST.get('fecha_inicio', ''), '%Y-%m-%d')
+            fecha_fin = datetime.strptime(request.POST.get('fecha_fin', ''), '%Y-%m-%d')
+        except ValueError:
+            messages.error(request, 'Las fechas del reporte no son válidas.')
+            return redirect('analisis_reportes:reports')
+        
+        trabajo = ColaReportes.solicitar(
+            request.user,
+            parametros={
+                'tipo_reporte': tipo_reporte,
+                'titulo': titulo,
+                'descripcion': request.POST.get('descripcion', ''),
+                'fecha_inicio': fecha_inicio.date().isoformat(),
+                'fecha_fin': fecha_fin.date().isoformat(),
+            },
+            formato=formato_export,
         )
-        
-        messages.success(request, f'Reporte "{titulo}" generado exitosamente.')
-        
-        # Si se solicita exportación inmediata
-        formato_export = request.POST.get('formato_export')
-        if formato_export:
-            return exportar_reporte(request, reporte.id, formato_export)
-        
-        return redirect('analisis_reportes:ver_reporte', reporte_id=reporte.id)
+        return respuesta_trabajo(request, trabajo, f'Reporte "{titulo}" en preparación.')
     
     return redirect('analisis_reportes:reports')
 
+def calcular_datos_reporte(usuario, tipo_reporte, fecha_inicio, fecha_fin):
+    """Genera los datos según el tipo de reporte (lo usa el worker de ColaReportes)"""
+    if tipo_reporte == 'gastos_categoria':
+        return get_gastos_por_categoria(usuario, fecha_inicio, fecha_fin)
+    elif tipo_reporte == 'ingresos_egresos':
+        return get_ingresos_vs_egresos(usuario, fecha_inicio, fecha_fin)
+    elif tipo_reporte == 'subcuentas_analisis':
+        return get_estadisticas_subcuentas(usuario)
+    elif tipo_reporte == 'balance_general':
+        return get_balance_general(usuario, fecha_inicio, fecha_fin)
+    elif tipo_reporte == 'flujo_efectivo':
+        return get_flujo_mensual(usuario, fecha_inicio, fecha_fin)
+    return {}
+
+def exportar_archivo_reporte(reporte, formato):
+    """Respuesta de exportación de un reporte guardado (lo usa el worker de ColaReportes)"""
+    datos = reporte.get_datos()
+    if formato == 'pdf':
+        return exportar_pdf(reporte, datos)
+    elif formato == 'excel':
+        return exportar_reporte_excel(reporte, datos)
+    return exportar_csv(reporte, datos)
+
+def respuesta_trabajo(request, trabajo, mensaje):
+    """202 con el estado del trabajo para peticiones AJAX; si no, redirección a su página"""
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'application/json' in request.headers.get('accept', ''):
+        return JsonResponse(estado_trabajo_json(trabajo), status=202)
+    messages.info(request, mensaje)
+    return redirect('analisis_reportes:ver_trabajo', trabajo_id=trabajo.id)
+
+def estado_trabajo_json(trabajo):
+    """Estado de un TrabajoReporte para el sondeo desde la página"""
+    datos = {
+        'trabajo_id': trabajo.id,
+        'estado': trabajo.estado,
+        'estado_display': trabajo.get_estado_display(),
+        'formato': trabajo.formato,
+        'estado_url': reverse('analisis_reportes:estado_trabajo', args=[trabajo.id]),
+        'ver_url': None,
+        'descarga_url': None,
+        'error': None,
+    }
+    if trabajo.reporte_id:
+        datos['ver_url'] = reverse('analisis_reportes:ver_reporte', args=[trabajo.reporte_id])
+    if trabajo.estado == 'completado' and trabajo.archivo:
+        datos['descarga_url'] = reverse('analisis_reportes:descargar_trabajo', args=[trabajo.id])
+    if trabajo.estado == 'error':
+        datos['error'] = trabajo.ultimo_error
+    return datos
+
+@login_required
+@fast_access_pin_verified
+def ver_trabajo(request, trabajo_id):
+    """Página que sondea el estado de un trabajo y ofrece la descarga al terminar"""
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, id_usuario=request.user)
+    if trabajo.estado == 'completado' and not trabajo.formato:
+        return redirect('analisis_reportes:ver_reporte', reporte_id=trabajo.reporte_id)
+    return render(request, 'analisis_reportes/trabajo_reporte.html', {
+        'trabajo': trabajo,
+        'estado': estado_trabajo_json(trabajo),
+    })
+
+@login_required
+@fast_access_pin_verified
+def estado_trabajo(request, trabajo_id):
+    """API de estado de un trabajo de reporte"""
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, id_usuario=request.user)
+    return JsonResponse(estado_trabajo_json(trabajo))
+
+@login_required
+@fast_access_pin_verified
+def descargar_trabajo(request, trabajo_id):
+    """Descarga el archivo generado por un trabajo desde el almacenamiento"""
+    trabajo = get_object_or_404(
+        TrabajoReporte, id=trabajo_id, id_usuario=request.user, estado='completado'
+    )
+    if not trabajo.archivo:
+        raise Http404("El trabajo no generó ningún archivo")
+    return FileResponse(
+        trabajo.archivo.open('rb'),
+        as_attachment=True,
+        filename=trabajo.nombre_archivo or trabajo.archivo.name.rsplit('/', 1)[-1],
+    )
+
 @login_required
 @fast_access_pin_verified
 def ver_reporte(request, reporte_id):
     """Vista para ver un reporte específico"""
-    reporte = get_object_or_404(Reporte, id=reporte_id, id_usuario=request.user)
-    datos = reporte.get_datos()
+    # Los datos sólo van al gráfico: se leen como texto JSON de la base, sin decodificarlos
+    reporte = get_object_or_404(
+        Reporte.objects.defer('datos').annotate(datos_texto=Cast('datos', TextField())),
+        id=reporte_id,
+        id_usuario=request.user,
+    )
     
-    # Procesar datos para el template
-    datos_procesados = procesar_datos_para_template(reporte.tipo_reporte, datos)
+    # Secciones precalculadas al generar el reporte
+    datos_procesados = reporte.secciones
+    if datos_procesados is None:
+        # Reportes anteriores a las secciones: se procesan una vez y se guardan
+        datos_procesados = procesar_datos_para_template(reporte.tipo_reporte, reporte.get_datos())
+        Reporte.objects.filter(pk=reporte.pk).update(secciones=datos_procesados)
     
     context = {
         'reporte': reporte,
-        'datos': datos,
+        'datos': reporte.datos_texto,
         'datos_procesados': datos_procesados,
-        'datos_json': json.dumps(datos),
+        'datos_json': reporte.datos_texto,
     }
     
     return render(request, 'analisis_reportes/ver_reporte.html', context)
 
+def _clave_exportacion(request, reporte_id, formato):
+    """Clave de caché (y ETag) del archivo pedido; sólo para descargas GET/HEAD"""
+    if request.method not in ('GET', 'HEAD') or formato not in CacheArtefactosReporte.EXTENSIONES:
+        return None
+    # Se guarda en el request para que el ETag y la vista calculen la clave una sola vez
+    if not hasattr(request, '_exportacion'):
+        reporte = Reporte.objects.filter(id=reporte_id, id_usuario=request.user).defer('secciones').first()
+        request._exportacion = (reporte, CacheArtefactosReporte.clave(reporte, formato) if reporte else None)
+    return request._exportacion[1]
+
 @login_required
 @fast_access_pin_verified  
+@condition(etag_func=_clave_exportacion)
 def exportar_reporte(request, reporte_id, formato):
-    """Vista para exportar reportes en diferentes formatos"""
+    """
+    Vista para exportar reportes en diferentes formatos
+
+    POST encola la exportación (TrabajoReporte); GET la sirve desde la caché de archivos
+    exportados (CacheArtefactosReporte), generándola si hace falta, con ETag.
+    """
     reporte = get_object_or_404(Reporte, id=reporte_id, id_usuario=request.user)
-    datos = reporte.get_datos()
     
-    if formato == 'pdf':
-        return exportar_pdf(reporte, datos)
-    elif formato == 'excel':
-        return exportar_excel(reporte, datos)
-    elif formato == 'csv':
-        return exportar_csv(reporte, datos)
-    else:
+    if formato not in dict(ConfiguracionReporte.FORMATOS_EXPORT):
         messages.error(request, 'Formato de exportación no válido.')
         return redirect('analisis_reportes:ver_reporte', reporte_id=reporte_id)
+    
+    if request.method == 'POST':
+        trabajo = ColaReportes.solicitar(request.user, formato=formato, reporte=reporte)
+        return respuesta_trabajo(request, trabajo, f'Exportación a {formato.upper()} en preparación.')
+    
+    archivo, clave = CacheArtefactosReporte.abrir(reporte, formato, _clave_exportacion(request, reporte_id, formato))
+    response = FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=CacheArtefactosReporte.nombre_descarga(reporte, formato),
+        content_type=CacheArtefactosReporte.CONTENT_TYPES[formato],
+    )
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 @fast_access_pin_verified
-def api_datos_grafico(request):
+def api_datos_grafico(request, tipo=None):
     """API para obtener datos de gráficos via AJAX"""
-    tipo = request.GET.get('tipo')
+    tipo = tipo or request.GET.get('tipo')
     periodo = request.GET.get('periodo', 'mes_actual')
+    granularidad = request.GET.get('granularidad', 'mes')
     fecha_inicio, fecha_fin = get_periodo_fechas(periodo)
     
     if tipo == 'gastos_categoria':
         datos = get_gastos_por_categoria(request.user, fecha_inicio, fecha_fin)
     elif tipo == 'ingresos_egresos':
-        datos = get_ingresos_vs_egresos(request.user, fecha_inicio, fecha_fin)
+        datos = get_ingresos_vs_egresos(request.user, fecha_inicio, fecha_fin, granularidad)
     elif tipo == 'subcuentas':
         datos = get_estadisticas_subcuentas(request.user)
     elif tipo == 'flujo_mensual':
-        datos = get_flujo_mensual(request.user, fecha_inicio, fecha_fin)
+        datos = get_flujo_mensual(request.user, fecha_inicio, fecha_fin, granularidad)
+    elif tipo == 'serie':
+        datos = RollupService.serie(request.user, fecha_inicio, fecha_fin, granularidad)
     else:
         datos = {}
     
@@ -268,17 +397,33 @@ def calcular_estadisticas_generales(usuario, fecha_inicio, fecha_fin):
     
     # Transacciones del período
     transacciones_periodo = Movimiento.objects.filter(
-        id_cuenta__id_usuario=usuario,
+        id_usuario=usuario,
         fecha_movimiento__range=[fecha_inicio, fecha_fin]
     )
     
-    ingresos_periodo = transacciones_periodo.filter(
-        tipo='ingreso'
-    ).aggregate(total=Sum('monto'))['total'] or 0
-    
-    gastos_periodo = transacciones_periodo.filter(
-        tipo='egreso'
-    ).aggregate(total=Sum('monto'))['total'] or 0
+    # Si el período cubre meses completos se leen los resúmenes mensuales
+    rango_mensual = ResumenMensualService.meses_completos(fecha_inicio, fecha_fin)
+    if rango_mensual:
+        totales = ResumenMensualService.totales(usuario, *rango_mensual)
+        ingresos_periodo = totales['ingreso']['total']
+        gastos_periodo = totales['egreso']['total']
+        total_transacciones = totales['ingreso']['cantidad'] + totales['egreso']['cantidad']
+        promedio_transaccion = (ingresos_periodo + gastos_periodo) / total_transacciones if total_transacciones else 0
+    else:
+        ingresos_periodo = transacciones_periodo.filter(
+            tipo='ingreso'
+        ).aggregate(total=Sum('monto'))['total'] or 0
+        
+        gastos_periodo = transacciones_periodo.filter(
+            tipo='egreso'
+        ).aggregate(total=Sum('monto'))['total'] or 0
+        
+        total_transacciones = transacciones_periodo.count()
+        
+        # Promedio de transacciones
+        promedio_transaccion = transacciones_periodo.aggregate(
+            promedio=Avg('monto')
+        )['promedio'] or 0
     
     # Número de cuentas y subcuentas (incluir independientes)
     num_cuentas = cuentas.count()
@@ -287,11 +432,6 @@ def calcular_estadisticas_generales(usuario, fecha_inicio, fecha_fin):
         activa=True
     ).count()
     
-    # Promedio de transacciones
-    promedio_transaccion = transacciones_periodo.aggregate(
-        promedio=Avg('monto')
-    )['promedio'] or 0
-    
     # Top gastos
     top_gastos = transacciones_periodo.filter(tipo='egreso').order_by('-monto')[:5]
     
@@ -303,12 +443,8 @@ def calcular_estadisticas_generales(usuario, fecha_inicio, fecha_fin):
     
     # Metas de ahorro con progreso
     from gestion_financiera_basica.models import MetaAhorro
-    metas_progreso = MetaAhorro.objects.filter(id_usuario=usuario)[:3]
-    for meta in metas_progreso:
-        if meta.monto_objetivo > 0:
-            meta.porcentaje_progreso = (float(meta.monto_ahorrado()) / float(meta.monto_objetivo)) * 100
-        else:
-            meta.porcentaje_progreso = 0
+    # porcentaje_progreso lee MetaAhorro.monto_ahorrado: sin consultas por meta
+    metas_progreso = list(MetaAhorro.objects.filter(id_usuario=usuario)[:3])
     
     return {
         'balance_total': float(balance_total),
@@ -319,7 +455,7 @@ def calcular_estadisticas_generales(usuario, fecha_inicio, fecha_fin):
         'num_cuentas': num_cuentas,
         'num_subcuentas': num_subcuentas,
         'promedio_transaccion': float(promedio_transaccion),
-        'total_transacciones': transacciones_periodo.count(),
+        'total_transacciones': total_transacciones,
         'top_gastos': top_gastos,
         'subcuentas_info': subcuentas_info,
         'metas_progreso': metas_progreso,
@@ -329,7 +465,7 @@ def get_gastos_por_categoria(usuario, fecha_inicio, fecha_fin):
     """Obtiene gastos agrupados por categoría de movimientos"""
     # Obtener gastos agrupados por nombre (categoría)
     gastos_por_categoria = Movimiento.objects.filter(
-        id_cuenta__id_usuario=usuario,
+        id_usuario=usuario,
         tipo='egreso',
         fecha_movimiento__range=[fecha_inicio, fecha_fin]
     ).values('nombre').annotate(
@@ -354,47 +490,15 @@ def get_gastos_por_categoria(usuario, fecha_inicio, fecha_fin):
         'values': values,
     }
 
-def get_ingresos_vs_egresos(usuario, fecha_inicio, fecha_fin):
-    """Obtiene comparación de ingresos vs egresos por mes"""
-    from datetime import datetime, timedelta
-    import calendar
-    
-    # Obtener datos mes por mes en el rango
-    fecha_actual = fecha_inicio.replace(day=1)
-    labels = []
-    ingresos = []
-    gastos = []
-    
-    while fecha_actual <= fecha_fin:
-        # Último día del mes
-        ultimo_dia = calendar.monthrange(fecha_actual.year, fecha_actual.month)[1]
-        fin_mes = fecha_actual.replace(day=ultimo_dia)
-        
-        # Transacciones del mes
-        transacciones_mes = Movimiento.objects.filter(
-            id_cuenta__id_usuario=usuario,
-            fecha_movimiento__range=[fecha_actual, fin_mes]
-        )
-        
-        ingresos_mes = transacciones_mes.filter(tipo='ingreso').aggregate(
-            total=Sum('monto'))['total'] or 0
-        gastos_mes = transacciones_mes.filter(tipo='egreso').aggregate(
-            total=Sum('monto'))['total'] or 0
-        
-        labels.append(fecha_actual.strftime('%b %Y'))
-        ingresos.append(float(ingresos_mes))
-        gastos.append(float(gastos_mes))
-        
-        # Siguiente mes
-        if fecha_actual.month == 12:
-            fecha_actual = fecha_actual.replace(year=fecha_actual.year + 1, month=1)
-        else:
-            fecha_actual = fecha_actual.replace(month=fecha_actual.month + 1)
+def get_ingresos_vs_egresos(usuario, fecha_inicio, fecha_fin, granularidad='mes', serie=None):
+    """Obtiene comparación de ingresos vs egresos por periodo (mes por defecto)"""
+    if serie is None:
+        serie = RollupService.serie(usuario, fecha_inicio, fecha_fin, granularidad)
     
     return {
-        'labels': labels,
-        'ingresos': ingresos,
-        'gastos': gastos,
+        'labels': serie['labels'],
+        'ingresos': serie['ingresos'],
+        'gastos': serie['egresos'],
     }
 
 def get_estadisticas_subcuentas(usuario):
@@ -463,42 +567,13 @@ def get_estadisticas_subcuentas(usuario):
         'tipos_subcuentas': tipos_subcuentas,
     }
 
-def get_flujo_mensual(usuario, fecha_inicio, fecha_fin):
-    """Obtiene flujo de efectivo mensual"""
-    from datetime import datetime, timedelta
-    import calendar
+def get_flujo_mensual(usuario, fecha_inicio, fecha_fin, granularidad='mes', serie=None):
+    """Obtiene flujo de efectivo neto por periodo (mes por defecto)"""
+    if serie is None:
+        serie = RollupService.serie(usuario, fecha_inicio, fecha_fin, granularidad)
     
-    labels = []
-    values = []
-    
-    fecha_actual = fecha_inicio.replace(day=1)
-    
-    while fecha_actual <= fecha_fin:
-        # Último día del mes
-        ultimo_dia = calendar.monthrange(fecha_actual.year, fecha_actual.month)[1]
-        fin_mes = fecha_actual.replace(day=ultimo_dia)
-        
-        # Transacciones del mes
-        transacciones_mes = Movimiento.objects.filter(
-            id_cuenta__id_usuario=usuario,
-            fecha_movimiento__range=[fecha_actual, fin_mes]
-        )
-        
-        ingresos_mes = transacciones_mes.filter(tipo='ingreso').aggregate(
-            total=Sum('monto'))['total'] or 0
-        gastos_mes = transacciones_mes.filter(tipo='egreso').aggregate(
-            total=Sum('monto'))['total'] or 0
-        
-        flujo_neto = float(ingresos_mes - gastos_mes)
-        
-        labels.append(fecha_actual.strftime('%b %Y'))
-        values.append(flujo_neto)
-        
-        # Siguiente mes
-        if fecha_actual.month == 12:
-            fecha_actual = fecha_actual.replace(year=fecha_actual.year + 1, month=1)
-        else:
-            fecha_actual = fecha_actual.replace(month=fecha_actual.month + 1)
+    labels = serie['labels']
+    values = serie['neto']
     
     # Si no hay datos, mostrar al menos el mes actual
     if not labels:
@@ -512,11 +587,13 @@ def get_flujo_mensual(usuario, fecha_inicio, fecha_fin):
 
 def get_balance_general(usuario, fecha_inicio, fecha_fin):
     """Obtiene balance general del período"""
-    cuentas = Cuenta.objects.filter(id_usuario=usuario)
+    # Cuentas y subcuentas en dos consultas, agrupadas en memoria
+    cartera = CarteraSubcuentasService.cartera(usuario)
     
     balance_data = []
-    for cuenta in cuentas:
-        subcuentas = SubCuenta.objects.filter(id_cuenta=cuenta, activa=True)
+    for grupo in cartera['cuentas_con_subcuentas']:
+        cuenta = grupo['cuenta']
+        subcuentas = grupo['subcuentas']
         total_subcuentas = sum([sc.saldo for sc in subcuentas])
         
         balance_data.append({
@@ -1088,104 +1165,48 @@ def exportar_pdf(reporte, datos):
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
-def exportar_excel(reporte, datos):
+def exportar_reporte_excel(reporte, datos):
     """Exporta reporte a Excel con formato ultra profesional y limpio"""
-    from openpyxl import Workbook
-    from django.http import HttpResponse
-    from datetime import datetime
-    
-    # Crear workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Resumen Financiero"
-    
-    # Estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    
-    # Título
-    ws['A1'] = f"Reporte Financiero - {reporte.tipo_reporte.replace('_', ' ').title()}"
-    ws['A1'].font = Font(bold=True, size=16)
-    ws.merge_cells('A1:E1')
-    
-    # Fecha del reporte
-    ws['A2'] = f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws['A3'] = f"Período: {reporte.fecha_inicio.strftime('%d/%m/%Y')} - {reporte.fecha_fin.strftime('%d/%m/%Y')}"
-    
-    # Estadísticas generales
     stats = calcular_estadisticas_generales(reporte.id_usuario, reporte.fecha_inicio, reporte.fecha_fin)
     
-    ws['A5'] = "RESUMEN GENERAL"
-    ws['A5'].font = header_font
-    ws['A5'].fill = header_fill
-    ws.merge_cells('A5:B5')
-    
-    row = 6
-    resumen_data = [
-        ["Balance Total:", f"${stats['balance_total']:,.2f}"],
-        ["Total Ingresos:", f"${stats['total_ingresos']:,.2f}"],
-        ["Total Gastos:", f"${stats['total_egresos']:,.2f}"],
-        ["Ahorro Neto:", f"${stats['ahorro_neto']:,.2f}"],
-        ["Total Transacciones:", stats['total_transacciones']],
-    ]
-    
-    for data in resumen_data:
-        ws[f'A{row}'] = data[0]
-        ws[f'B{row}'] = data[1]
-        ws[f'A{row}'].font = Font(bold=True)
-        row += 1
-    
-    # Transacciones detalladas
-    ws['A' + str(row + 2)] = "TRANSACCIONES DETALLADAS"
-    ws['A' + str(row + 2)].font = header_font
-    ws['A' + str(row + 2)].fill = header_fill
-    ws.merge_cells(f'A{row + 2}:E{row + 2}')
-    
-    # Headers de transacciones
-    row += 4
-    headers = ['Fecha', 'Descripción', 'Tipo', 'Monto', 'Cuenta']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-    
-    # Datos de transacciones
-    transacciones = Movimiento.objects.filter(
-        id_cuenta__id_usuario=reporte.id_usuario,
-        fecha_movimiento__range=[reporte.fecha_inicio, reporte.fecha_fin]
-    ).order_by('-fecha_movimiento')
-    
-    for transaccion in transacciones:
-        row += 1
-        ws[f'A{row}'] = transaccion.fecha_movimiento.strftime('%d/%m/%Y')
-        ws[f'B{row}'] = transaccion.nombre
-        ws[f'C{row}'] = transaccion.tipo.title()
-        monto = transaccion.monto if transaccion.tipo == 'ingreso' else -transaccion.monto
-        ws[f'D{row}'] = f"${monto:,.2f}"
-        ws[f'E{row}'] = transaccion.id_cuenta.nombre
-    
-    # Ajustar ancho de columnas
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Preparar respuesta
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return respuesta_excel(
+        f"reporte_financiero_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+        titulo=f"Reporte Financiero - {reporte.tipo_reporte.replace('_', ' ').title()}",
+        encabezado=[
+            f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+            f"Período: {reporte.fecha_inicio.strftime('%d/%m/%Y')} - {reporte.fecha_fin.strftime('%d/%m/%Y')}",
+        ],
+        resumen=[
+            ("Balance Total:", f"${stats['balance_total']:,.2f}"),
+            ("Total Ingresos:", f"${stats['total_ingresos']:,.2f}"),
+            ("Total Gastos:", f"${stats['total_egresos']:,.2f}"),
+            ("Ahorro Neto:", f"${stats['ahorro_neto']:,.2f}"),
+            ("Total Transacciones:", stats['total_transacciones']),
+        ],
+        filas=ExportacionExcelService.movimientos(reporte.id_usuario, reporte.fecha_inicio, reporte.fecha_fin),
+        columnas=['fecha', 'descripcion', 'tipo', 'monto', 'cuenta'],
+        hoja="Resumen Financiero",
+        monto_con_signo=True,
+    )
+
+def respuesta_excel(filename, **libro):
+    """
+    Escribe el libro (ver ExportacionExcelService.escribir) en un archivo temporal y lo
+    envía en bloques con FileResponse; el archivo se elimina al cerrar la respuesta
+    """
+    archivo = tempfile.TemporaryFile()
+    try:
+        ExportacionExcelService.escribir(archivo, **libro)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=filename,
+        content_type=ExportacionExcelService.CONTENT_TYPE,
     )
-    filename = f"reporte_financiero_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
 
 def exportar_csv(reporte, datos):
     """Exporta reporte a CSV"""
@@ -1200,7 +1221,7 @@ def exportar_csv(reporte, datos):
     writer = csv.writer(response)
     
     # Escribir encabezado
-    writer.writerow(['Reporte:', reporte.nombre])
+    writer.writerow(['Reporte:', reporte.titulo])
     writer.writerow(['Tipo:', reporte.get_tipo_reporte_display()])
     writer.writerow(['Fecha creación:', reporte.fecha_creacion.strftime('%Y-%m-%d %H:%M')])
     writer.writerow(['Período:', f"{reporte.fecha_inicio} - {reporte.fecha_fin}"])
@@ -1300,7 +1321,7 @@ def exportar_pdf_simple(request):
     
     # Transacciones recientes
     transacciones = Movimiento.objects.filter(
-        id_cuenta__id_usuario=request.user,
+        id_usuario=request.user,
         fecha_movimiento__range=[fecha_inicio, fecha_fin]
     ).order_by('-fecha_movimiento')[:10]
     
@@ -1384,110 +1405,54 @@ def obtener_fechas_periodo(periodo):
 @fast_access_pin_verified
 def exportar_excel(request):
     """Exportar datos financieros a Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    from django.http import HttpResponse
-    from datetime import datetime
-    
     # Obtener fechas del filtro
     periodo = request.GET.get('periodo', 'mes_actual')
     fecha_inicio, fecha_fin = obtener_fechas_periodo(periodo)
     
-    # Crear workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reporte Financiero"
-    
-    # Estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    
-    # Header del reporte
-    ws['A1'] = "REPORTE FINANCIERO - FINGEST"
-    ws['A1'].font = Font(bold=True, size=16)
-    ws.merge_cells('A1:D1')
-    
-    ws['A2'] = f"Período: {fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}"
-    ws['A2'].font = Font(bold=True)
-    ws.merge_cells('A2:D2')
-    
-    ws['A3'] = f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws.merge_cells('A3:D3')
-    
     # Estadísticas generales
     stats = calcular_estadisticas_generales(request.user, fecha_inicio, fecha_fin)
     
-    row = 5
-    ws[f'A{row}'] = "RESUMEN GENERAL"
-    ws[f'A{row}'].font = header_font
-    ws[f'A{row}'].fill = header_fill
-    ws.merge_cells(f'A{row}:B{row}')
-    
-    row += 1
-    ws[f'A{row}'] = "Balance Total"
-    ws[f'B{row}'] = f"${stats['balance_total']:,.2f}"
-    
-    row += 1
-    ws[f'A{row}'] = "Ingresos del Período"
-    ws[f'B{row}'] = f"${stats['total_ingresos']:,.2f}"
-    
-    row += 1
-    ws[f'A{row}'] = "Gastos del Período"
-    ws[f'B{row}'] = f"${stats['total_egresos']:,.2f}"
-    
-    row += 1
-    ws[f'A{row}'] = "Ahorro Neto"
-    ws[f'B{row}'] = f"${stats['ahorro_neto']:,.2f}"
-    
-    # Transacciones
-    row += 3
-    ws[f'A{row}'] = "TRANSACCIONES DETALLADAS"
-    ws[f'A{row}'].font = header_font
-    ws[f'A{row}'].fill = header_fill
-    ws.merge_cells(f'A{row}:E{row}')
-    
-    row += 1
-    headers = ['Fecha', 'Descripción', 'Tipo', 'Cuenta', 'Monto']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=row, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-    
-    # Obtener transacciones
-    transacciones = Movimiento.objects.filter(
-        id_cuenta__id_usuario=request.user,
-        fecha_movimiento__range=[fecha_inicio, fecha_fin]
-    ).order_by('-fecha_movimiento')
-    
-    for transaccion in transacciones:
-        row += 1
-        ws[f'A{row}'] = transaccion.fecha_movimiento.strftime('%d/%m/%Y')
-        ws[f'B{row}'] = transaccion.nombre
-        ws[f'C{row}'] = transaccion.tipo.title()
-        ws[f'D{row}'] = transaccion.id_cuenta.nombre
-        ws[f'E{row}'] = f"${transaccion.monto:,.2f}"
-    
-    # Ajustar ancho de columnas
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Preparar respuesta
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return respuesta_excel(
+        f"reporte_financiero_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+        titulo="REPORTE FINANCIERO - FINGEST",
+        encabezado=[
+            f"Período: {fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}",
+            f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+        ],
+        resumen=[
+            ("Balance Total", f"${stats['balance_total']:,.2f}"),
+            ("Ingresos del Período", f"${stats['total_ingresos']:,.2f}"),
+            ("Gastos del Período", f"${stats['total_egresos']:,.2f}"),
+            ("Ahorro Neto", f"${stats['ahorro_neto']:,.2f}"),
+        ],
+        filas=ExportacionExcelService.movimientos(request.user, fecha_inicio, fecha_fin),
+        columnas=['fecha', 'descripcion', 'tipo', 'cuenta', 'monto'],
     )
-    filename = f"reporte_financiero_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+
+@login_required
+@fast_access_pin_verified
+def exportar_historial_csv(request):
+    """
+    Exportar el historial completo a CSV en streaming
+
+    Parámetros GET:
+        fuente: movimientos (por defecto), transferencias_subcuentas o transferencias_principal
+        columnas: claves separadas por coma (por defecto todas)
+        desde / hasta: fechas YYYY-MM-DD inclusivas (opcionales)
+    """
+    fuente = request.GET.get('fuente', 'movimientos')
+    columnas = [columna.strip() for columna in request.GET.get('columnas', '').split(',') if columna.strip()]
+    desde = request.GET.get('desde') or None
+    hasta = request.GET.get('hasta') or None
+    
+    try:
+        lineas = ExportacionCSVService.lineas(fuente, request.user, columnas, desde, hasta)
+    except ExportacionCSVError as e:
+        return HttpResponseBadRequest(str(e))
+    
+    response = StreamingHttpResponse(lineas, content_type='text/csv; charset=utf-8')
+    filename = f"FinGest_{fuente}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
     return response
 
 @login_required
@@ -1564,7 +1529,7 @@ def exportar_pdf_simple(request):
     
     # Transacciones recientes
     transacciones = Movimiento.objects.filter(
-        id_cuenta__id_usuario=request.user,
+        id_usuario=request.user,
         fecha_movimiento__range=[fecha_inicio, fecha_fin]
     ).order_by('-fecha_movimiento')[:10]
     
@@ -1615,11 +1580,13 @@ def procesar_datos_para_template(tipo_reporte, datos):
     
     if tipo_reporte == 'gastos_categoria' and 'labels' in datos:
         # Crear lista de diccionarios para gastos por categoría
-        total = sum(datos.get('data', []))
+        # (get_gastos_por_categoria guarda los montos en 'values'; reportes antiguos en 'data')
+        montos = datos.get('data', datos.get('values', []))
+        total = sum(montos)
         resultado = []
         
         for i, label in enumerate(datos['labels']):
-            monto = datos['data'][i] if i < len(datos['data']) else 0
+            monto = montos[i] if i < len(montos) else 0
             cantidad = datos.get('counts', [])[i] if i < len(datos.get('counts', [])) else 0
             porcentaje = (monto / total * 100) if total > 0 else 0
             
@@ -1680,11 +1647,15 @@ def procesar_datos_para_template(tipo_reporte, datos):
     
     elif tipo_reporte == 'flujo_efectivo' and 'labels' in datos:
         resultado = []
+        lista_ingresos = datos.get('ingresos', [])
+        lista_egresos = datos.get('egresos', [])
+        # get_flujo_mensual guarda sólo el neto de cada periodo en 'values'
+        netos = datos.get('values', [])
         
         for i, periodo in enumerate(datos['labels']):
-            ingresos = datos['ingresos'][i] if i < len(datos['ingresos']) else 0
-            egresos = datos['egresos'][i] if i < len(datos['egresos']) else 0
-            balance = ingresos - egresos
+            ingresos = lista_ingresos[i] if i < len(lista_ingresos) else 0
+            egresos = lista_egresos[i] if i < len(lista_egresos) else 0
+            balance = netos[i] if i < len(netos) else ingresos - egresos
             
             resultado.append({
                 'periodo': periodo,
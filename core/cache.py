@@ -0,0 +1,15 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_compartida(alias='default'):
+    """
+    Indica si el backend de caché lo comparten todos los procesos del sitio.
+
+    LocMemCache vive en la memoria de cada proceso: con varios workers una invalidación
+    sólo llega al proceso que la hizo y los demás siguen sirviendo su copia. Las cachés
+    que deben estar siempre al día (contadores, versiones de datos, sesión del usuario)
+    sólo se usan con un backend compartido; si no, se consulta la base directamente.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+import select
+import time
+
+class WorkerColaCommand(BaseCommand):
+    """
+    Base de los workers de colas guardadas en tablas (procesar_notificaciones, procesar_reportes).
+
+    Procesa lotes mientras la cola tenga trabajo y, cuando se vacía, espera un aviso por
+    LISTEN en el canal CANAL (PostgreSQL) o, en otras bases, hasta el próximo sondeo.
+    Cada MANTENIMIENTO_CADA segundos, y al iniciar, ejecuta mantenimiento().
+
+    Las subclases definen CANAL y LOTE, e implementan procesar_lote(options), que
+    devuelve la cantidad de trabajos tratados, e inicio(options), el mensaje de arranque.
+    """
+
+    # Canal de LISTEN/NOTIFY con el que se despierta al worker
+    CANAL = None
+    # Trabajos reclamados por lote por defecto
+    LOTE = 50
+    # Segundos entre ejecuciones de mantenimiento()
+    MANTENIMIENTO_CADA = 3600
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=self.LOTE, help='Trabajos reclamados por lote')
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos de espera entre sondeos cuando la cola está vacía',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Vaciar la cola una vez y terminar (para cron o pruebas)',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a 0')
+
+        escuchando = self._escuchar()
+        self.stdout.write(self.inicio(options) + (' (LISTEN activo)' if escuchando else ''))
+
+        ultimo_mantenimiento = None
+        try:
+            while True:
+                if ultimo_mantenimiento is None or time.monotonic() - ultimo_mantenimiento >= self.MANTENIMIENTO_CADA:
+                    self.mantenimiento(options)
+                    ultimo_mantenimiento = time.monotonic()
+
+                # Lote completo: probablemente quedan más, seguir sin esperar
+                if self.procesar_lote(options) >= options['lote']:
+                    continue
+
+                if options['una_vez']:
+                    break
+                self._esperar(options['intervalo'], escuchando)
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido')
+
+    def inicio(self, options):
+        raise NotImplementedError
+
+    def procesar_lote(self, options):
+        raise NotImplementedError
+
+    def mantenimiento(self, options):
+        """Tareas periódicas del worker (purgas, limpieza); por defecto ninguna"""
+
+    def _escuchar(self):
+        """En PostgreSQL se suscribe al canal para despertar apenas se confirme un trabajo"""
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.CANAL}')
+        return True
+
+    def _esperar(self, segundos, escuchando):
+        if not escuchando:
+            time.sleep(segundos)
+            return
+        conexion = connection.connection
+        if not conexion.notifies and select.select([conexion], [], [], segundos)[0]:
+            conexion.poll()
+        conexion.notifies.clear()
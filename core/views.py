@@ -1,9 +1,8 @@
-from django.db.models import Sum
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
+from django.utils import timezone
 from gestion_financiera_basica.models import Movimiento
-from usuarios.models import Usuario
-from cuentas.models import Cuenta
+from gestion_financiera_basica.services import CacheFinancieraUsuario, ResumenFinancieroService
 from core.decorators import fast_access_pin_verified
 from django.core.mail import send_mail
 from django.contrib import messages
@@ -19,6 +18,14 @@ def Inicio(request):
             return redirect('usuarios:acceso_rapido')
         return redirect('core:dashboard')
 
+def cifras_dashboard(user_id):
+    """Totales (una consulta con agregación condicional) y gastos por categoría (una consulta agrupada)"""
+    resumen = ResumenFinancieroService.obtener(user_id)
+    gastos_por_categoria = []
+    if resumen['egresos']['total'] > 0:
+        gastos_por_categoria = ResumenFinancieroService.gastos_por_categoria(user_id, resumen['egresos']['total'])
+    return resumen, gastos_por_categoria
+
 @login_required
 @fast_access_pin_verified
 def dashboard(request):
@@ -28,29 +35,19 @@ def dashboard(request):
         
     user_id = request.user.id
 
-    simbolo_moneda = Usuario.objects.filter(id=user_id).values('id_moneda__simbolo').all()
-    simbolo_moneda = simbolo_moneda.first()
-    simbolo_moneda = simbolo_moneda["id_moneda__simbolo"]
-    movimientos = Movimiento.objects.filter(id_usuario_id=user_id)
-
-    # Calcular ingresos de movimientos
-    total_ingresos = Movimiento.objects.filter(id_cuenta__id_usuario=user_id , tipo="ingreso").aggregate(total=Sum('monto'))['total']
-    cantidad_registros_ingresos = Movimiento.objects.filter(id_usuario__id=user_id , tipo="ingreso").count()
-
-    if(not total_ingresos):
-        total_ingresos = 0
-
-    # Calcular egresos de movimientos
-    total_egresos = Movimiento.objects.filter(id_cuenta__id_usuario=user_id , tipo="egreso").aggregate(total=Sum('monto'))['total']
+    # La moneda ya viene cargada con request.user (ver usuarios.backends.EmailBackend)
+    simbolo_moneda = request.user.id_moneda.simbolo
+    # Movimientos recientes: índice (id_usuario, fecha_movimiento)
+    movimientos = Movimiento.objects.filter(id_usuario_id=user_id).select_related('id_cuenta').defer('busqueda').order_by('-fecha_movimiento')[:6]
 
-    if(not total_egresos):
-        total_egresos = 0
-
-    # Calcular saldo inicial de todas las cuentas del usuario
-    saldo_inicial_cuentas = Cuenta.objects.filter(id_usuario=user_id).aggregate(total=Sum('saldo_cuenta'))['total']
-    
-    if(not saldo_inicial_cuentas):
-        saldo_inicial_cuentas = 0
+    # Cifras en caché hasta el próximo cambio de datos del usuario (o hasta el día siguiente)
+    resumen, gastos_por_categoria = CacheFinancieraUsuario.obtener(
+        user_id, 'dashboard', lambda: cifras_dashboard(user_id), timezone.localdate()
+    )
+    total_ingresos = resumen['ingresos']['total']
+    cantidad_registros_ingresos = resumen['ingresos']['cantidad']
+    total_egresos = resumen['egresos']['total']
+    saldo_inicial_cuentas = resumen['saldo_inicial']
 
     if(total_ingresos == 0):
         porcentaje_de_ingresos_para_egresos = 0
@@ -68,36 +65,8 @@ def dashboard(request):
         salud_financiera_score = max(0, 100 - int(porcentaje_de_recursos_para_egresos))  # Score dinámico
     
     # Balance actual (dinero que realmente tienes disponible ahora) = saldo inicial + ingresos - egresos
-    total_balance = float(saldo_inicial_cuentas) + float(total_ingresos) - float(total_egresos)
+    total_balance = float(resumen['saldo_actual'])
 
-    # Datos para gráfico de gastos por categoría
-    gastos_por_categoria = []
-    if total_egresos > 0:
-        # Obtener gastos agrupados por categoría
-        gastos_por_cat = Movimiento.objects.filter(
-            id_cuenta__id_usuario=user_id, 
-            tipo="egreso"
-        ).values('categoria').annotate(total=Sum('monto')).order_by('-total')
-        
-        # Convertir a lista para el gráfico con nombres y emojis
-        for gasto in gastos_por_cat:
-            categoria_key = gasto['categoria'] or 'otros'
-            monto = float(gasto['total'])
-            porcentaje = (monto / float(total_egresos)) * 100
-            
-            # Buscar el nombre con emoji para la categoría
-            nombre_categoria = 'Otros'
-            for cat_key, cat_display in Movimiento.CATEGORIAS_GASTOS:
-                if cat_key == categoria_key:
-                    nombre_categoria = cat_display
-                    break
-            
-            gastos_por_categoria.append({
-                'categoria': nombre_categoria,
-                'monto': monto,
-                'porcentaje': round(porcentaje, 1)
-            })
-    
     tab = request.GET.get("tab", "overview")
 
     return render(request , 'core/dashboard.html' , {
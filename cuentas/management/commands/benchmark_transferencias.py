@@ -0,0 +1,183 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from decimal import Decimal
+from threading import Barrier, Lock, Thread
+from usuarios.models import Usuario
+from cuentas.models import Moneda, Cuenta, SubCuenta, TransferenciaSubCuenta
+from cuentas.services import TransferenciaService, TransferenciaError
+import random
+import time
+import uuid
+
+class Command(BaseCommand):
+    help = 'Prueba de estrés concurrente de transferencias entre subcuentas (detecta actualizaciones perdidas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Número de hilos concurrentes')
+        parser.add_argument('--transferencias', type=int, default=200, help='Transferencias por hilo')
+        parser.add_argument('--subcuentas', type=int, default=4, help='Subcuentas que compiten entre sí')
+        parser.add_argument('--saldo-inicial', type=Decimal, default=Decimal('1000.00'), help='Saldo inicial de cada subcuenta')
+        parser.add_argument(
+            '--legado',
+            action='store_true',
+            help='Usar el patrón anterior (leer, modificar y save()) para comparar',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            raise CommandError('La prueba de concurrencia requiere una base de datos con bloqueo por fila (PostgreSQL)')
+        if options['subcuentas'] < 2:
+            raise CommandError('Se necesitan al menos 2 subcuentas')
+
+        usuario, cuenta, subcuentas = self._preparar(options)
+        ids = [subcuenta.id for subcuenta in subcuentas]
+        saldo_total_inicial = options['saldo_inicial'] * len(ids)
+
+        contadores = {'ok': 0, 'rechazadas': 0, 'errores': 0}
+        contadores_lock = Lock()
+        barrera = Barrier(options['hilos'])
+
+        def trabajador(semilla):
+            aleatorio = random.Random(semilla)
+            locales = {'ok': 0, 'rechazadas': 0, 'errores': 0}
+            try:
+                barrera.wait()
+                for _ in range(options['transferencias']):
+                    origen_id, destino_id = aleatorio.sample(ids, 2)
+                    monto = Decimal(aleatorio.randint(1, 5000)) / 100
+                    try:
+                        if options['legado']:
+                            self._transferir_legado(usuario, origen_id, destino_id, monto)
+                        else:
+                            TransferenciaService.ejecutar(
+                                usuario,
+                                SubCuenta(pk=origen_id, nombre=str(origen_id)),
+                                SubCuenta(pk=destino_id, nombre=str(destino_id)),
+                                monto,
+                            )
+                        locales['ok'] += 1
+                    except TransferenciaError:
+                        locales['rechazadas'] += 1
+                    except Exception as e:
+                        locales['errores'] += 1
+                        self.stderr.write(f'   ⚠️  {e}')
+            finally:
+                connection.close()
+                with contadores_lock:
+                    for clave, valor in locales.items():
+                        contadores[clave] += valor
+
+        hilos = [Thread(target=trabajador, args=(semilla,)) for semilla in range(options['hilos'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        try:
+            problemas = self._verificar(usuario, ids, options['saldo_inicial'], saldo_total_inicial)
+        finally:
+            self._limpiar(usuario, cuenta)
+
+        modo = 'legado (save)' if options['legado'] else 'servicio (select_for_update + F())'
+        self.stdout.write(f'📊 Modo: {modo}')
+        self.stdout.write(
+            f"   Hilos: {options['hilos']} | Transferencias: {contadores['ok']} ok, "
+            f"{contadores['rechazadas']} rechazadas por saldo, {contadores['errores']} errores"
+        )
+        self.stdout.write(f"   Duración: {duracion:.2f}s | {contadores['ok'] / duracion:.1f} transferencias/s")
+
+        if problemas:
+            for problema in problemas:
+                self.stdout.write(f'   ❌ {problema}')
+            raise CommandError(f'{len(problemas)} inconsistencias detectadas (actualizaciones perdidas)')
+        self.stdout.write(self.style.SUCCESS('✅ Sin actualizaciones perdidas: saldos consistentes con el historial'))
+
+    def _preparar(self, options):
+        """Crea un usuario temporal con una cuenta y N subcuentas"""
+        moneda = Moneda.objects.first()
+        if moneda is None:
+            raise CommandError('No hay monedas registradas')
+
+        sufijo = uuid.uuid4().hex[:8]
+        usuario = Usuario.objects.create_user(
+            f'benchmark-{sufijo}@fingest.local',
+            uuid.uuid4().hex,
+            nombres='Benchmark',
+            apellido_paterno='Transferencias',
+            apellido_materno=sufijo,
+            documento_identidad=sufijo,
+            telefono=0,
+            id_moneda=moneda,
+            is_active=False,
+        )
+        cuenta = Cuenta.objects.create(
+            nombre='Benchmark',
+            descripcion='Cuenta temporal de benchmark',
+            saldo_cuenta=options['saldo_inicial'] * options['subcuentas'],
+            id_usuario=usuario,
+        )
+        subcuentas = SubCuenta.objects.bulk_create([
+            SubCuenta(
+                nombre=f'Benchmark {i + 1}',
+                saldo=options['saldo_inicial'],
+                id_cuenta=cuenta,
+                propietario=usuario,
+            )
+            for i in range(options['subcuentas'])
+        ])
+        return usuario, cuenta, subcuentas
+
+    @staticmethod
+    def _transferir_legado(usuario, origen_id, destino_id, monto):
+        """Patrón anterior de las vistas: lee el saldo, lo modifica en Python y guarda la fila completa"""
+        origen = SubCuenta.objects.get(pk=origen_id)
+        destino = SubCuenta.objects.get(pk=destino_id)
+        if origen.saldo < monto:
+            raise TransferenciaError('Saldo insuficiente')
+        with transaction.atomic():
+            origen.saldo -= monto
+            destino.saldo += monto
+            TransferenciaSubCuenta.objects.create(
+                subcuenta_origen=origen,
+                subcuenta_destino=destino,
+                id_usuario=usuario,
+                monto=monto,
+            )
+            origen.save()
+            destino.save()
+
+    @staticmethod
+    def _verificar(usuario, ids, saldo_inicial, saldo_total_inicial):
+        """Compara cada saldo con saldo_inicial + recibido - enviado según el historial"""
+        problemas = []
+        saldos = dict(SubCuenta.objects.filter(pk__in=ids).values_list('id', 'saldo'))
+        transferencias = TransferenciaSubCuenta.objects.filter(id_usuario=usuario)
+        enviado = dict(
+            transferencias.values('subcuenta_origen').annotate(total=Sum('monto')).values_list('subcuenta_origen', 'total')
+        )
+        recibido = dict(
+            transferencias.values('subcuenta_destino').annotate(total=Sum('monto')).values_list('subcuenta_destino', 'total')
+        )
+
+        for subcuenta_id in ids:
+            esperado = saldo_inicial + recibido.get(subcuenta_id, 0) - enviado.get(subcuenta_id, 0)
+            if saldos[subcuenta_id] != esperado:
+                problemas.append(f'Subcuenta {subcuenta_id}: saldo={saldos[subcuenta_id]} esperado={esperado}')
+            if saldos[subcuenta_id] < 0:
+                problemas.append(f'Subcuenta {subcuenta_id}: saldo negativo ({saldos[subcuenta_id]})')
+
+        saldo_total = sum(saldos.values())
+        if saldo_total != saldo_total_inicial:
+            problemas.append(f'Saldo total no se conserva: {saldo_total} (inicial {saldo_total_inicial})')
+        return problemas
+
+    @staticmethod
+    def _limpiar(usuario, cuenta):
+        """Elimina los datos temporales del benchmark"""
+        TransferenciaSubCuenta.objects.filter(id_usuario=usuario).delete()
+        SubCuenta.objects.filter(id_cuenta=cuenta).delete()
+        cuenta.delete()
+        usuario.delete()
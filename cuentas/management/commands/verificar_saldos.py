@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import Usuario
+from cuentas.services import SaldoService
+
+class Command(BaseCommand):
+    help = 'Verifica que Cuenta.saldo_actual coincida con saldo_cuenta + ingresos - egresos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reparar',
+            action='store_true',
+            help='Corregir las cuentas con desvío',
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Correo o id del usuario a verificar (por defecto, todos)',
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            filtro = {'pk': options['usuario']} if options['usuario'].isdigit() else {'correo': options['usuario']}
+            try:
+                usuario = Usuario.objects.get(**filtro)
+            except Usuario.DoesNotExist:
+                raise CommandError(f"Usuario no encontrado: {options['usuario']}")
+
+        desvios = SaldoService.verificar(usuario=usuario, reparar=options['reparar'])
+
+        if not desvios:
+            self.stdout.write(self.style.SUCCESS('✅ Todos los saldos coinciden con sus movimientos'))
+            return
+
+        for desvio in desvios:
+            self.stdout.write(
+                f"   ⚠️  Cuenta {desvio['cuenta_id']} ({desvio['nombre']}): "
+                f"saldo_actual={desvio['saldo_actual']} esperado={desvio['saldo_esperado']} "
+                f"diferencia={desvio['diferencia']}"
+            )
+
+        if options['reparar']:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(desvios)} cuentas corregidas'))
+        else:
+            raise CommandError(f'{len(desvios)} cuentas con desvío (usa --reparar para corregirlas)')
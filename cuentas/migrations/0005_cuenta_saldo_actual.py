@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def calcular_saldo_actual(apps, schema_editor):
+    """Inicializa saldo_actual = saldo_cuenta + ingresos - egresos"""
+    Cuenta = apps.get_model('cuentas', 'Cuenta')
+
+    cuentas = Cuenta.objects.annotate(
+        total_ingresos=Sum('movimiento__monto', filter=Q(movimiento__tipo='ingreso')),
+        total_egresos=Sum('movimiento__monto', filter=Q(movimiento__tipo='egreso')),
+    )
+    for cuenta in cuentas.iterator():
+        saldo = cuenta.saldo_cuenta + (cuenta.total_ingresos or Decimal('0')) - (cuenta.total_egresos or Decimal('0'))
+        Cuenta.objects.filter(pk=cuenta.pk).update(saldo_actual=saldo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0004_improve_subcuentas_independence'),
+        ('gestion_financiera_basica', '0004_resumenmensualmovimiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuenta',
+            name='saldo_actual',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.RunPython(calcular_saldo_actual, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
+from decimal import Decimal
 
 class Moneda(models.Model):
     codigo = models.CharField(max_length=5)
@@ -14,11 +16,42 @@ class Cuenta(models.Model):
     nombre = models.CharField(max_length=50)
     descripcion = models.CharField(max_length=300)
     saldo_cuenta = models.DecimalField(max_digits=15, decimal_places=2)
+    # Saldo materializado = saldo_cuenta + ingresos - egresos. Sólo se modifica con
+    # incrementos F() desde cuentas.services.SaldoService
+    saldo_actual = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     id_usuario = models.ForeignKey("usuarios.Usuario", on_delete=models.CASCADE)
 
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # Una cuenta nueva aún no tiene movimientos
+            self.saldo_actual = self.saldo_cuenta
+            return super().save(*args, **kwargs)
+
+        # Nunca sobrescribir saldo_actual con el valor en memoria: otro request
+        # pudo haberlo incrementado. Si cambia el saldo inicial, se ajusta la diferencia.
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+        update_fields = [campo for campo in update_fields if campo != 'saldo_actual']
+
+        with transaction.atomic():
+            saldo_anterior = Cuenta.objects.select_for_update().filter(
+                pk=self.pk
+            ).values_list('saldo_cuenta', flat=True).first()
+            if saldo_anterior is None:
+                return super().save(*args, **kwargs)
+
+            super().save(*args, update_fields=update_fields, **kwargs)
+
+            if 'saldo_cuenta' in update_fields:
+                diferencia = Decimal(str(self.saldo_cuenta)) - saldo_anterior
+                if diferencia:
+                    Cuenta.objects.filter(pk=self.pk).update(saldo_actual=F('saldo_actual') + diferencia)
+                    self.refresh_from_db(fields=['saldo_actual'])
+
     def saldo_total_subcuentas(self):
         """Calcula el saldo total de todas las subcuentas"""
         total = self.subcuentas.aggregate(models.Sum('saldo'))['saldo__sum']
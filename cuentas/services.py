@@ -0,0 +1,368 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Cuenta, SubCuenta, TransferenciaSubCuenta, TransferenciaCuentaPrincipal
+from gestion_financiera_basica.services import CacheFinancieraUsuario
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SaldoService:
+    """Mantenimiento del saldo materializado (Cuenta.saldo_actual)"""
+
+    @staticmethod
+    def efecto(tipo, monto):
+        """Efecto de un movimiento sobre el saldo: suma si es ingreso, resta si es egreso"""
+        monto = Decimal(str(monto))
+        return monto if tipo == 'ingreso' else -monto
+
+    @staticmethod
+    def aplicar(cuenta_id, tipo, monto, revertir=False):
+        """
+        Aplica (o revierte) un movimiento sobre el saldo de una cuenta con un
+        único UPDATE ... SET saldo_actual = saldo_actual + x
+
+        Debe llamarse dentro de la misma transacción que escribe el movimiento.
+        """
+        efecto = SaldoService.efecto(tipo, monto)
+        if revertir:
+            efecto = -efecto
+        if efecto:
+            Cuenta.objects.filter(pk=cuenta_id).update(saldo_actual=F('saldo_actual') + efecto)
+
+    @staticmethod
+    def saldo_usuario(usuario):
+        """Saldo actual total (suma de saldo_actual) de las cuentas de un usuario"""
+        return Cuenta.objects.filter(id_usuario=usuario).aggregate(
+            total=Sum('saldo_actual')
+        )['total'] or Decimal('0')
+
+    @staticmethod
+    def saldos_esperados(usuario=None):
+        """
+        Cuentas anotadas con el saldo recalculado desde los movimientos
+        (saldo_esperado = saldo_cuenta + ingresos - egresos)
+        """
+        cero = Value(Decimal('0'), output_field=DecimalField(max_digits=15, decimal_places=2))
+        cuentas = Cuenta.objects.all()
+        if usuario is not None:
+            cuentas = cuentas.filter(id_usuario=usuario)
+
+        return cuentas.annotate(
+            total_ingresos=Coalesce(Sum('movimiento__monto', filter=Q(movimiento__tipo='ingreso')), cero),
+            total_egresos=Coalesce(Sum('movimiento__monto', filter=Q(movimiento__tipo='egreso')), cero),
+        ).annotate(
+            saldo_esperado=F('saldo_cuenta') + F('total_ingresos') - F('total_egresos'),
+        )
+
+    @staticmethod
+    def verificar(usuario=None, reparar=False):
+        """
+        Detecta cuentas cuyo saldo_actual no coincide con sus movimientos
+
+        Args:
+            usuario: Limitar la verificación a un usuario (opcional)
+            reparar: Si es True, corrige el saldo_actual de las cuentas con desvío
+
+        Returns:
+            list: dicts con cuenta_id, usuario_id, saldo_actual, saldo_esperado y diferencia
+        """
+        desvios = []
+        for cuenta in SaldoService.saldos_esperados(usuario).exclude(
+            saldo_actual=F('saldo_esperado')
+        ).order_by('id'):
+            desvios.append({
+                'cuenta_id': cuenta.id,
+                'usuario_id': cuenta.id_usuario_id,
+                'nombre': cuenta.nombre,
+                'saldo_actual': cuenta.saldo_actual,
+                'saldo_esperado': cuenta.saldo_esperado,
+                'diferencia': cuenta.saldo_actual - cuenta.saldo_esperado,
+            })
+
+        if reparar:
+            for desvio in desvios:
+                # Se corrige con la diferencia (y no con el valor absoluto) para no
+                # pisar movimientos registrados mientras se verificaba
+                with transaction.atomic():
+                    Cuenta.objects.filter(pk=desvio['cuenta_id']).update(
+                        saldo_actual=F('saldo_actual') - desvio['diferencia']
+                    )
+                    CacheFinancieraUsuario.invalidar_al_confirmar(desvio['usuario_id'])
+                logger.warning(
+                    f"Saldo de cuenta {desvio['cuenta_id']} corregido: "
+                    f"{desvio['saldo_actual']} -> {desvio['saldo_esperado']}"
+                )
+
+        return desvios
+
+
+class CarteraSubcuentasService:
+    """
+    Cifras de las subcuentas de un usuario con consultas de conjunto, sin bucles
+    de consultas por cuenta
+    """
+
+    @staticmethod
+    def anotar_saldos(cuentas):
+        """
+        Anota total_subcuentas_anotado y disponible_anotado en un QuerySet de Cuenta
+        (una consulta agrupada), los mismos valores que Cuenta.saldo_total_subcuentas()
+        y Cuenta.saldo_disponible() sin una consulta por cuenta. Los nombres son
+        distintos a los de los métodos para no ocultarlos.
+        """
+        cero = Value(Decimal('0'), output_field=DecimalField(max_digits=15, decimal_places=2))
+        return cuentas.annotate(
+            total_subcuentas_anotado=Coalesce(Sum('subcuentas__saldo'), cero),
+        ).annotate(
+            disponible_anotado=F('saldo_cuenta') - F('total_subcuentas_anotado'),
+        )
+
+    @staticmethod
+    def subcuentas_usuario(usuario):
+        """Subcuentas vinculadas a las cuentas del usuario y sus subcuentas independientes"""
+        return SubCuenta.objects.filter(
+            Q(id_cuenta__id_usuario=usuario) | Q(propietario=usuario, id_cuenta__isnull=True)
+        )
+
+    @staticmethod
+    def cartera(usuario):
+        """
+        Cuentas con sus subcuentas, subcuentas independientes, cantidades y saldos
+
+        Dos consultas: las cuentas anotadas con anotar_saldos y la lista de todas las
+        subcuentas del usuario, que se agrupa en memoria.
+
+        Returns:
+            dict: cuentas (lista anotada), cuentas_con_subcuentas, subcuentas_independientes_activas,
+                  subcuentas_independientes_inactivas, total_subcuentas, total_subcuentas_vinculadas,
+                  total_subcuentas_independientes, total_subcuentas_inactivas, total_saldo_subcuentas,
+                  total_saldo_subcuentas_vinculadas y total_saldo_subcuentas_independientes
+        """
+        cuentas = list(CarteraSubcuentasService.anotar_saldos(
+            Cuenta.objects.filter(id_usuario=usuario)
+        ).order_by('id'))
+
+        grupos = {cuenta.id: {'subcuentas': [], 'subcuentas_inactivas': []} for cuenta in cuentas}
+        independientes = {'subcuentas': [], 'subcuentas_inactivas': []}
+        for subcuenta in CarteraSubcuentasService.subcuentas_usuario(usuario):
+            grupo = grupos.get(subcuenta.id_cuenta_id, independientes)
+            grupo['subcuentas' if subcuenta.activa else 'subcuentas_inactivas'].append(subcuenta)
+
+        vinculadas = sum(len(grupo['subcuentas']) for grupo in grupos.values())
+        vinculadas_inactivas = sum(len(grupo['subcuentas_inactivas']) for grupo in grupos.values())
+        saldo_vinculadas = sum((cuenta.total_subcuentas_anotado for cuenta in cuentas), Decimal('0'))
+        saldo_independientes = sum(
+            (subcuenta.saldo for subcuenta in independientes['subcuentas'] + independientes['subcuentas_inactivas']),
+            Decimal('0'),
+        )
+
+        return {
+            'cuentas': cuentas,
+            'cuentas_con_subcuentas': [
+                {
+                    'cuenta': cuenta,
+                    'subcuentas': grupos[cuenta.id]['subcuentas'],
+                    'subcuentas_inactivas': grupos[cuenta.id]['subcuentas_inactivas'],
+                    'saldo_disponible': cuenta.disponible_anotado,
+                }
+                for cuenta in cuentas
+            ],
+            'subcuentas_independientes_activas': independientes['subcuentas'],
+            'subcuentas_independientes_inactivas': independientes['subcuentas_inactivas'],
+            'total_subcuentas': vinculadas + len(independientes['subcuentas']),
+            'total_subcuentas_vinculadas': vinculadas,
+            'total_subcuentas_independientes': len(independientes['subcuentas']),
+            'total_subcuentas_inactivas': vinculadas_inactivas + len(independientes['subcuentas_inactivas']),
+            'total_saldo_subcuentas': saldo_vinculadas + saldo_independientes,
+            'total_saldo_subcuentas_vinculadas': saldo_vinculadas,
+            'total_saldo_subcuentas_independientes': saldo_independientes,
+        }
+
+
+class TransferenciaError(Exception):
+    """Error de negocio al ejecutar una transferencia (saldo insuficiente, permisos, etc.)"""
+
+
+# Una orden de transferencia. origen/destino son instancias de SubCuenta o Cuenta;
+# origen=None representa un ingreso externo (p. ej. venta de una subcuenta de negocio).
+# registrar=False ejecuta el movimiento de saldos sin crear el registro de historial.
+Orden = namedtuple('Orden', ['origen', 'destino', 'monto', 'descripcion', 'registrar'], defaults=['', True])
+
+
+class TransferenciaService:
+    """
+    Motor de transferencias entre subcuentas y cuentas principales.
+
+    Bloquea todas las filas implicadas con SELECT ... FOR UPDATE en orden
+    determinista (cuentas y luego subcuentas, por id) para evitar interbloqueos,
+    y actualiza sólo las columnas de saldo con expresiones F().
+    """
+
+    @staticmethod
+    def ejecutar(usuario, origen, destino, monto, descripcion='', registrar=True):
+        """Ejecuta una única transferencia. Ver ejecutar_lote."""
+        return TransferenciaService.ejecutar_lote(
+            usuario, [Orden(origen, destino, monto, descripcion, registrar)]
+        )
+
+    @staticmethod
+    def ejecutar_lote(usuario, ordenes):
+        """
+        Ejecuta un lote de transferencias en una sola transacción (todas o ninguna)
+
+        Args:
+            usuario: Usuario que ordena las transferencias (debe ser dueño de todo)
+            ordenes: Lista de Orden
+
+        Returns:
+            dict: 'transferencias' (registros creados), 'subcuentas' {id: saldo}
+            y 'cuentas' {id: saldo_cuenta} con los saldos resultantes
+
+        Raises:
+            TransferenciaError: Si alguna orden no es válida; no se aplica ninguna
+        """
+        ids_cuentas = set()
+        ids_subcuentas = set()
+        for orden in ordenes:
+            for extremo in (orden.origen, orden.destino):
+                if isinstance(extremo, SubCuenta):
+                    ids_subcuentas.add(extremo.pk)
+                elif isinstance(extremo, Cuenta):
+                    ids_cuentas.add(extremo.pk)
+
+        with transaction.atomic():
+            # Bloqueo en orden determinista: primero cuentas, luego subcuentas, por id
+            cuentas = {
+                cuenta['id']: cuenta
+                for cuenta in Cuenta.objects.select_for_update().filter(
+                    pk__in=ids_cuentas
+                ).order_by('pk').values('id', 'id_usuario_id')
+            }
+            subcuentas = {
+                subcuenta['id']: subcuenta
+                for subcuenta in SubCuenta.objects.select_for_update(of=('self',)).filter(
+                    pk__in=ids_subcuentas
+                ).order_by('pk').values('id', 'propietario_id', 'id_cuenta__id_usuario_id')
+            }
+
+            for cuenta_id in ids_cuentas:
+                cuenta = cuentas.get(cuenta_id)
+                if not cuenta or cuenta['id_usuario_id'] != usuario.pk:
+                    raise TransferenciaError('No tienes permisos sobre esta cuenta')
+            for subcuenta_id in ids_subcuentas:
+                subcuenta = subcuentas.get(subcuenta_id)
+                if not subcuenta or usuario.pk not in (
+                    subcuenta['propietario_id'], subcuenta['id_cuenta__id_usuario_id']
+                ):
+                    raise TransferenciaError('No tienes permisos sobre esta subcuenta')
+
+            transferencias_subcuentas = []
+            transferencias_principal = []
+            for orden in ordenes:
+                registro = TransferenciaService._aplicar(usuario, orden)
+                if isinstance(registro, TransferenciaSubCuenta):
+                    transferencias_subcuentas.append(registro)
+                elif isinstance(registro, TransferenciaCuentaPrincipal):
+                    transferencias_principal.append(registro)
+
+            transferencias = (
+                TransferenciaSubCuenta.objects.bulk_create(transferencias_subcuentas)
+                + TransferenciaCuentaPrincipal.objects.bulk_create(transferencias_principal)
+            )
+            # Los saldos se actualizan con UPDATE y los registros con bulk_create: sin
+            # señales, así que la caché de agregados del usuario se invalida aquí
+            CacheFinancieraUsuario.invalidar_al_confirmar(usuario.pk)
+
+            return {
+                'transferencias': transferencias,
+                'subcuentas': dict(
+                    SubCuenta.objects.filter(pk__in=ids_subcuentas).values_list('id', 'saldo')
+                ),
+                'cuentas': dict(
+                    Cuenta.objects.filter(pk__in=ids_cuentas).values_list('id', 'saldo_cuenta')
+                ),
+            }
+
+    @staticmethod
+    def _aplicar(usuario, orden):
+        """Aplica una orden (con las filas ya bloqueadas) y devuelve su registro sin guardar"""
+        origen, destino = orden.origen, orden.destino
+        monto = Decimal(str(orden.monto))
+
+        if monto <= 0:
+            raise TransferenciaError('El monto debe ser mayor a 0')
+        if destino is None:
+            raise TransferenciaError('La transferencia necesita un destino')
+        if type(origen) is type(destino) and origen.pk == destino.pk:
+            raise TransferenciaError('No puedes transferir a la misma subcuenta')
+        if isinstance(origen, Cuenta) and isinstance(destino, Cuenta):
+            raise TransferenciaError('Las transferencias entre cuentas principales no están soportadas')
+
+        # Débito del origen
+        if isinstance(origen, SubCuenta):
+            actualizadas = SubCuenta.objects.filter(pk=origen.pk, saldo__gte=monto).update(
+                saldo=F('saldo') - monto
+            )
+            if not actualizadas:
+                raise TransferenciaError(f'Saldo insuficiente en la subcuenta "{origen.nombre}"')
+        elif isinstance(origen, Cuenta):
+            disponible = TransferenciaService.saldo_disponible(origen.pk)
+            if disponible < monto:
+                raise TransferenciaError(
+                    f'Saldo insuficiente en la cuenta principal. Disponible: ${disponible:.2f}'
+                )
+            Cuenta.objects.filter(pk=origen.pk).update(
+                saldo_cuenta=F('saldo_cuenta') - monto,
+                saldo_actual=F('saldo_actual') - monto,
+            )
+
+        # Crédito del destino
+        if isinstance(destino, SubCuenta):
+            SubCuenta.objects.filter(pk=destino.pk).update(saldo=F('saldo') + monto)
+        else:
+            Cuenta.objects.filter(pk=destino.pk).update(
+                saldo_cuenta=F('saldo_cuenta') + monto,
+                saldo_actual=F('saldo_actual') + monto,
+            )
+
+        if not orden.registrar or origen is None:
+            return None
+
+        if isinstance(origen, SubCuenta) and isinstance(destino, SubCuenta):
+            return TransferenciaSubCuenta(
+                subcuenta_origen=origen,
+                subcuenta_destino=destino,
+                monto=monto,
+                descripcion=orden.descripcion or f'Transferencia de {origen.nombre} a {destino.nombre}',
+                id_usuario=usuario,
+            )
+        if isinstance(origen, SubCuenta):
+            return TransferenciaCuentaPrincipal(
+                subcuenta=origen,
+                cuenta_destino=destino,
+                monto=monto,
+                tipo='deposito',
+                descripcion=orden.descripcion or f'Transferencia desde {origen.nombre}',
+                id_usuario=usuario,
+            )
+        return TransferenciaCuentaPrincipal(
+            subcuenta=destino,
+            cuenta_destino=origen,
+            monto=monto,
+            tipo='retiro',
+            descripcion=orden.descripcion or f'Transferencia hacia {destino.nombre}',
+            id_usuario=usuario,
+        )
+
+    @staticmethod
+    def saldo_disponible(cuenta_id):
+        """Saldo disponible de una cuenta (saldo_cuenta - saldo en sus subcuentas), leído en la transacción"""
+        return CarteraSubcuentasService.anotar_saldos(
+            Cuenta.objects.filter(pk=cuenta_id)
+        ).values_list('disponible_anotado', flat=True).first()
@@ -12,8 +12,11 @@ from PIL import Image
 import io
 from decimal import Decimal
 from usuarios.models import Usuario
+from usuarios.services import ImagenPerfilService, ImagenPerfilError
 from .models import Cuenta, SubCuenta, TransferenciaSubCuenta, TransferenciaCuentaPrincipal
+from .services import CarteraSubcuentasService, SaldoService, TransferenciaService, TransferenciaError
 from gestion_financiera_basica.models import Movimiento
+from gestion_financiera_basica.services import CacheFinancieraUsuario, ResumenFinancieroService
 from .forms import SubCuentaForm, TransferenciaSubCuentaForm, DepositoSubCuentaForm, RetiroSubCuentaForm, TransferenciaCuentaPrincipalForm
 from core.decorators import fast_access_pin_verified
 from alertas_notificaciones.models import Notificacion, TipoNotificacion
@@ -47,14 +50,10 @@ def profile(request):
             imagen_perfil = request.FILES.get("imagen_perfil")
             if imagen_perfil:
                 try:
-                    # Validar que sea una imagen
-                    imagen_bytes = imagen_perfil.read()
-                    Image.open(io.BytesIO(imagen_bytes))  # Validar formato
-                    
-                    usuario.imagen_perfil = imagen_bytes
-                    usuario.save()
+                    # Validar la imagen y generar sus miniaturas una sola vez
+                    ImagenPerfilService.guardar(usuario, imagen_perfil.read())
                     messages.success(request, "✅ Foto de perfil actualizada correctamente.")
-                except Exception as e:
+                except ImagenPerfilError as e:
                     messages.error(request, "❌ Error al procesar la imagen. Asegúrate de subir un archivo de imagen válido.")
             else:
                 messages.error(request, "❌ No se seleccionó ninguna imagen.")
@@ -188,27 +187,14 @@ def profile(request):
         usuario.pais = "Peru"
         usuario.save()
     
-    formato_imagen = None
-    imagen_base64 = None
-    if(usuario.imagen_perfil):
-        try:
-            imagen_bytes = usuario.imagen_perfil
-            imagen_base64 = base64.b64encode(imagen_bytes).decode('utf-8')
-            formato_imagen = Image.open(io.BytesIO(imagen_bytes)).format
-        except Exception as e:
-            # Si hay error al procesar la imagen, limpiarla
-            print(f"Error procesando imagen de perfil para usuario {usuario.id}: {e}")
-            usuario.imagen_perfil = None
-            usuario.save()
-            imagen_base64 = None
-            formato_imagen = None
+    # Sólo los metadatos: la imagen se sirve desde usuarios:imagen_perfil
+    imagen = ImagenPerfilService.metadatos(usuario.id)
 
     tab = request.GET.get("tab", "general")
     return render(request, "cuentas/profile_modern.html", {
         "tab": tab , 
         "usuario": usuario,
-        "imagen_base64": imagen_base64,
-        "formato_imagen": formato_imagen,
+        "imagen_version": imagen['hash'][:12] if imagen else None,
     })
 
 @login_required
@@ -223,51 +209,15 @@ def settings(request):
 @fast_access_pin_verified
 def subcuentas_dashboard(request):
     """Vista principal del dashboard de subcuentas"""
-    # Obtener todas las cuentas del usuario
-    cuentas = Cuenta.objects.filter(id_usuario=request.user)
-    
-    # Obtener estadísticas generales (incluir subcuentas independientes)
-    total_subcuentas_vinculadas = SubCuenta.objects.filter(id_cuenta__id_usuario=request.user, activa=True).count()
-    total_subcuentas_independientes = SubCuenta.objects.filter(propietario=request.user, id_cuenta__isnull=True, activa=True).count()
-    total_subcuentas = total_subcuentas_vinculadas + total_subcuentas_independientes
-    
-    total_subcuentas_inactivas_vinculadas = SubCuenta.objects.filter(id_cuenta__id_usuario=request.user, activa=False).count()
-    total_subcuentas_inactivas_independientes = SubCuenta.objects.filter(propietario=request.user, id_cuenta__isnull=True, activa=False).count()
-    total_subcuentas_inactivas = total_subcuentas_inactivas_vinculadas + total_subcuentas_inactivas_independientes
-    
-    # Saldo total en subcuentas vinculadas
-    total_saldo_subcuentas_vinculadas = sum([cuenta.saldo_total_subcuentas() for cuenta in cuentas])
-    
-    # Saldo total en subcuentas independientes
-    subcuentas_independientes = SubCuenta.objects.filter(propietario=request.user, id_cuenta__isnull=True)
-    total_saldo_subcuentas_independientes = sum([subcuenta.saldo for subcuenta in subcuentas_independientes])
-    
-    total_saldo_subcuentas = total_saldo_subcuentas_vinculadas + total_saldo_subcuentas_independientes
-    
-    # Obtener subcuentas por cuenta (vinculadas)
-    cuentas_con_subcuentas = []
-    for cuenta in cuentas:
-        subcuentas_activas = SubCuenta.objects.filter(id_cuenta=cuenta, activa=True)
-        subcuentas_inactivas = SubCuenta.objects.filter(id_cuenta=cuenta, activa=False)
-        
-        cuentas_con_subcuentas.append({
-            'cuenta': cuenta,
-            'subcuentas': subcuentas_activas,
-            'subcuentas_inactivas': subcuentas_inactivas,
-            'saldo_disponible': cuenta.saldo_disponible()
-        })
-    
-    # Obtener subcuentas independientes
-    subcuentas_independientes_activas = SubCuenta.objects.filter(
-        propietario=request.user, 
-        id_cuenta__isnull=True, 
-        activa=True
-    )
-    subcuentas_independientes_inactivas = SubCuenta.objects.filter(
-        propietario=request.user, 
-        id_cuenta__isnull=True, 
-        activa=False
-    )
+    def calcular_cartera():
+        # Cuentas anotadas + lista de subcuentas: dos consultas para todo el dashboard
+        cartera = CarteraSubcuentasService.cartera(request.user)
+        # Balance total real: la misma foto de cifras que usa el dashboard principal
+        cartera['total_balance'] = float(ResumenFinancieroService.obtener(request.user)['saldo_actual'])
+        return cartera
+
+    # En caché hasta el próximo cambio de datos del usuario
+    cartera = CacheFinancieraUsuario.obtener(request.user, 'subcuentas', calcular_cartera)
     
     # Obtener transferencias recientes (incluir todos los tipos)
     transferencias_recientes = TransferenciaSubCuenta.objects.filter(
@@ -275,29 +225,12 @@ def subcuentas_dashboard(request):
     )[:10]
     
     # Obtener cuenta principal para el modal
-    cuenta_principal = cuentas.first() if cuentas.exists() else None
-    
-    # Calcular el balance total real (igual al dashboard principal)
-    user_id = request.user.id
-    total_ingresos = Movimiento.objects.filter(id_cuenta__id_usuario=user_id, tipo="ingreso").aggregate(total=Sum('monto'))['total'] or 0
-    total_egresos = Movimiento.objects.filter(id_cuenta__id_usuario=user_id, tipo="egreso").aggregate(total=Sum('monto'))['total'] or 0
-    saldo_inicial_cuentas = Cuenta.objects.filter(id_usuario=user_id).aggregate(total=Sum('saldo_cuenta'))['total'] or 0
-    total_balance = float(saldo_inicial_cuentas) + float(total_ingresos) - float(total_egresos)
+    cuenta_principal = cartera['cuentas'][0] if cartera['cuentas'] else None
     
     return render(request, 'cuentas/subcuentas_dashboard_new.html', {
-        'cuentas_con_subcuentas': cuentas_con_subcuentas,
-        'subcuentas_independientes_activas': subcuentas_independientes_activas,
-        'subcuentas_independientes_inactivas': subcuentas_independientes_inactivas,
-        'total_subcuentas': total_subcuentas,
-        'total_subcuentas_vinculadas': total_subcuentas_vinculadas,
-        'total_subcuentas_independientes': total_subcuentas_independientes,
-        'total_subcuentas_inactivas': total_subcuentas_inactivas,
-        'total_saldo_subcuentas': total_saldo_subcuentas,
-        'total_saldo_subcuentas_vinculadas': total_saldo_subcuentas_vinculadas,
-        'total_saldo_subcuentas_independientes': total_saldo_subcuentas_independientes,
+        **cartera,
         'transferencias_recientes': transferencias_recientes,
         'cuenta_principal': cuenta_principal,
-        'total_balance': total_balance,
     })
 
 
@@ -399,14 +332,18 @@ def eliminar_subcuenta(request, subcuenta_id):
         if subcuenta.saldo > 0:
             # Solo transferir si es una subcuenta vinculada (personal)
             if subcuenta.id_cuenta:
-                with transaction.atomic():
-                    subcuenta.id_cuenta.saldo_cuenta += subcuenta.saldo
-                    subcuenta.id_cuenta.save()
-                    subcuenta.saldo = 0
-                    subcuenta.activa = False
-                    subcuenta.save()
+                saldo = subcuenta.saldo
+                try:
+                    with transaction.atomic():
+                        TransferenciaService.ejecutar(
+                            request.user, subcuenta, subcuenta.id_cuenta, saldo, registrar=False
+                        )
+                        SubCuenta.objects.filter(pk=subcuenta.pk).update(activa=False)
+                except TransferenciaError as e:
+                    messages.error(request, str(e))
+                    return redirect('cuentas:subcuentas_dashboard')
                     
-                messages.success(request, f'SubCuenta "{subcuenta.nombre}" eliminada y su saldo (${subcuenta.saldo:.2f}) transferido a la cuenta principal.')
+                messages.success(request, f'SubCuenta "{subcuenta.nombre}" eliminada y su saldo (${saldo:.2f}) transferido a la cuenta principal.')
             else:
                 # Para subcuentas independientes, solo desactivar (no transferir)
                 subcuenta.activa = False
@@ -437,24 +374,21 @@ def transferir_subcuentas(request):
     if request.method == 'POST':
         form = TransferenciaSubCuentaForm(request.POST, user=request.user)
         if form.is_valid():
-            with transaction.atomic():
-                transferencia = form.save(commit=False)
-                transferencia.id_usuario = request.user
-                
-                # Realizar la transferencia
-                origen = transferencia.subcuenta_origen
-                destino = transferencia.subcuenta_destino
-                monto = transferencia.monto
-                
-                origen.saldo -= monto
-                destino.saldo += monto
-                
-                origen.save()
-                destino.save()
-                transferencia.save()
-                
-            messages.success(request, f'Transferencia de ${monto:.2f} realizada exitosamente de "{origen.nombre}" a "{destino.nombre}".')
-            return redirect('cuentas:subcuentas_dashboard')
+            transferencia = form.save(commit=False)
+            origen = transferencia.subcuenta_origen
+            destino = transferencia.subcuenta_destino
+            monto = transferencia.monto
+            
+            # Realizar la transferencia (filas bloqueadas, saldos actualizados con F())
+            try:
+                TransferenciaService.ejecutar(
+                    request.user, origen, destino, monto, transferencia.descripcion
+                )
+            except TransferenciaError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f'Transferencia de ${monto:.2f} realizada exitosamente de "{origen.nombre}" a "{destino.nombre}".')
+                return redirect('cuentas:subcuentas_dashboard')
     else:
         form = TransferenciaSubCuentaForm(user=request.user)
     
@@ -475,25 +409,25 @@ def transferir_subcuentas(request):
 def depositar_subcuenta(request, subcuenta_id):
     """Vista para depositar dinero de la cuenta principal a una subcuenta"""
     subcuenta = get_object_or_404(SubCuenta, id=subcuenta_id, id_cuenta__id_usuario=request.user)
-    cuenta = subcuenta.id_cuenta
+    # Saldo disponible anotado: la plantilla lo muestra varias veces sin repetir el agregado
+    cuenta = CarteraSubcuentasService.anotar_saldos(Cuenta.objects.filter(pk=subcuenta.id_cuenta_id)).get()
     
     if request.method == 'POST':
         form = DepositoSubCuentaForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                monto = form.cleaned_data['monto']
-                descripcion = form.cleaned_data['descripcion']
-                
-                # Verificar que hay saldo suficiente
-                if cuenta.saldo_disponible() >= monto:
-                    # Realizar el depósito
-                    subcuenta.saldo += monto
-                    subcuenta.save()
-                    
-                    messages.success(request, f'Depósito de ${monto:.2f} realizado exitosamente a "{subcuenta.nombre}".')
-                    return redirect('cuentas:subcuentas_dashboard')
-                else:
-                    messages.error(request, 'No hay saldo suficiente en la cuenta principal.')
+            monto = form.cleaned_data['monto']
+            descripcion = form.cleaned_data['descripcion']
+            
+            # Realizar el depósito (el disponible se valida con la cuenta bloqueada)
+            try:
+                TransferenciaService.ejecutar(
+                    request.user, cuenta, subcuenta, monto, descripcion, registrar=False
+                )
+            except TransferenciaError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f'Depósito de ${monto:.2f} realizado exitosamente a "{subcuenta.nombre}".')
+                return redirect('cuentas:subcuentas_dashboard')
     else:
         form = DepositoSubCuentaForm()
     
@@ -514,19 +448,19 @@ def retirar_subcuenta(request, subcuenta_id):
     if request.method == 'POST':
         form = RetiroSubCuentaForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                monto = form.cleaned_data['monto']
-                descripcion = form.cleaned_data['descripcion']
-                
-                # Realizar el retiro
-                subcuenta.saldo -= monto
-                cuenta.saldo_cuenta += monto
-                
-                subcuenta.save()
-                cuenta.save()
-                
-            messages.success(request, f'Retiro de ${monto:.2f} realizado exitosamente desde "{subcuenta.nombre}".')
-            return redirect('cuentas:subcuentas_dashboard')
+            monto = form.cleaned_data['monto']
+            descripcion = form.cleaned_data['descripcion']
+            
+            # Realizar el retiro
+            try:
+                TransferenciaService.ejecutar(
+                    request.user, subcuenta, cuenta, monto, descripcion, registrar=False
+                )
+            except TransferenciaError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f'Retiro de ${monto:.2f} realizado exitosamente desde "{subcuenta.nombre}".')
+                return redirect('cuentas:subcuentas_dashboard')
     else:
         form = RetiroSubCuentaForm()
     
@@ -669,40 +603,33 @@ def transferir_a_cuenta_principal(request, subcuenta_id):
     if request.method == 'POST':
         form = TransferenciaCuentaPrincipalForm(request.POST, subcuenta=subcuenta)
         if form.is_valid():
-            with transaction.atomic():
-                transferencia = form.save(commit=False)
-                transferencia.subcuenta = subcuenta
-                transferencia.cuenta_destino = cuenta_principal
-                transferencia.id_usuario = request.user
-                
-                monto = transferencia.monto
-                
-                # Realizar la transferencia
-                if transferencia.tipo == 'deposito':
-                    # Transferir de subcuenta a cuenta principal
-                    subcuenta.saldo -= monto
-                    cuenta_principal.saldo_cuenta += monto
-                    mensaje = f'Transferencia de ${monto:.2f} realizada exitosamente desde "{subcuenta.nombre}" a tu cuenta principal.'
-                else:
-                    # Transferir de cuenta principal a subcuenta
-                    if cuenta_principal.saldo_disponible() >= monto:
-                        cuenta_principal.saldo_cuenta -= monto
-                        subcuenta.saldo += monto
-                        mensaje = f'Transferencia de ${monto:.2f} realizada exitosamente desde tu cuenta principal a "{subcuenta.nombre}".'
-                    else:
-                        messages.error(request, 'No hay saldo suficiente en la cuenta principal.')
-                        return render(request, 'cuentas/transferir_cuenta_principal.html', {
-                            'form': form,
-                            'subcuenta': subcuenta,
-                            'cuenta_principal': cuenta_principal
-                        })
-                
-                subcuenta.save()
-                cuenta_principal.save()
-                transferencia.save()
-                
-                messages.success(request, mensaje)
-                return redirect('cuentas:subcuentas_dashboard')
+            transferencia = form.save(commit=False)
+            monto = transferencia.monto
+            
+            # Realizar la transferencia
+            if transferencia.tipo == 'deposito':
+                # Transferir de subcuenta a cuenta principal
+                origen, destino = subcuenta, cuenta_principal
+                mensaje = f'Transferencia de ${monto:.2f} realizada exitosamente desde "{subcuenta.nombre}" a tu cuenta principal.'
+            else:
+                # Transferir de cuenta principal a subcuenta
+                origen, destino = cuenta_principal, subcuenta
+                mensaje = f'Transferencia de ${monto:.2f} realizada exitosamente desde tu cuenta principal a "{subcuenta.nombre}".'
+            
+            try:
+                TransferenciaService.ejecutar(
+                    request.user, origen, destino, monto, transferencia.descripcion
+                )
+            except TransferenciaError as e:
+                messages.error(request, str(e))
+                return render(request, 'cuentas/transferir_cuenta_principal.html', {
+                    'form': form,
+                    'subcuenta': subcuenta,
+                    'cuenta_principal': cuenta_principal
+                })
+            
+            messages.success(request, mensaje)
+            return redirect('cuentas:subcuentas_dashboard')
     else:
         form = TransferenciaCuentaPrincipalForm(subcuenta=subcuenta)
     
@@ -865,32 +792,19 @@ def transferir_a_cuenta_principal_ajax(request):
                 (subcuenta.id_cuenta and subcuenta.id_cuenta.id_usuario == request.user)):
             return JsonResponse({'success': False, 'error': 'No tienes permisos sobre esta subcuenta'})
         
-        # Verificar saldo suficiente
-        if subcuenta.saldo < monto:
-            return JsonResponse({'success': False, 'error': 'Saldo insuficiente en la subcuenta'})
-        
         # Obtener cuenta principal
         cuenta_principal = request.user.cuenta_set.first()
         if not cuenta_principal:
             return JsonResponse({'success': False, 'error': 'No tienes una cuenta principal'})
         
-        # Realizar la transferencia
+        # Realizar la transferencia (el saldo se valida con la fila bloqueada)
         with transaction.atomic():
-            subcuenta.saldo -= monto
-            cuenta_principal.saldo_cuenta += monto
-            
-            # Crear registro de transferencia
-            transferencia = TransferenciaCuentaPrincipal.objects.create(
-                subcuenta=subcuenta,
-                cuenta_destino=cuenta_principal,
-                id_usuario=request.user,
-                monto=monto,
-                tipo='deposito',
-                descripcion=descripcion or f'Transferencia desde {subcuenta.nombre}'
-            )
-            
-            subcuenta.save()
-            cuenta_principal.save()
+            try:
+                resultado = TransferenciaService.ejecutar(
+                    request.user, subcuenta, cuenta_principal, monto, descripcion
+                )
+            except TransferenciaError as e:
+                return JsonResponse({'success': False, 'error': str(e)})
             
             # Crear notificación persistente
             crear_notificacion_movimiento(
@@ -903,8 +817,8 @@ def transferir_a_cuenta_principal_ajax(request):
                     'subcuenta_id': subcuenta.id,
                     'subcuenta_nombre': subcuenta.nombre,
                     'monto': float(monto),
-                    'saldo_subcuenta_restante': float(subcuenta.saldo),
-                    'saldo_principal_resultante': float(cuenta_principal.saldo_cuenta)
+                    'saldo_subcuenta_restante': float(resultado['subcuentas'][subcuenta.id]),
+                    'saldo_principal_resultante': float(resultado['cuentas'][cuenta_principal.id])
                 }
             )
         
@@ -951,9 +865,8 @@ def depositar_subcuenta_ajax(request):
             if es_subcuenta_negocio:
                 # Para subcuentas de negocio (independientes), simplemente agregar el dinero
                 print(f"DEBUG: Agregando dinero a subcuenta de negocio independiente")
-                subcuenta.saldo += monto
-                subcuenta.save()
-                print(f"DEBUG: Nuevo saldo subcuenta de negocio: {subcuenta.saldo}")
+                resultado = TransferenciaService.ejecutar(request.user, None, subcuenta, monto, descripcion)
+                print(f"DEBUG: Nuevo saldo subcuenta de negocio: {resultado['subcuentas'][subcuenta.id]}")
                 
                 # Crear notificación persistente
                 crear_notificacion_movimiento(
@@ -966,7 +879,7 @@ def depositar_subcuenta_ajax(request):
                         'subcuenta_id': subcuenta.id,
                         'subcuenta_nombre': subcuenta.nombre,
                         'monto': float(monto),
-                        'saldo_resultante': float(subcuenta.saldo)
+                        'saldo_resultante': float(resultado['subcuentas'][subcuenta.id])
                     }
                 )
                 
@@ -976,18 +889,15 @@ def depositar_subcuenta_ajax(request):
                     return JsonResponse({'success': False, 'error': 'Error en la configuración de la subcuenta'})
                 
                 cuenta_principal = subcuenta.id_cuenta
-                saldo_disponible = cuenta_principal.saldo_disponible()
-                print(f"DEBUG: Cuenta principal saldo_cuenta={cuenta_principal.saldo_cuenta}, saldo_disponible={saldo_disponible}")
-                
-                if saldo_disponible < monto:
-                    return JsonResponse({'success': False, 'error': f'Saldo insuficiente en la cuenta principal. Disponible: ${saldo_disponible:.2f}'})
                 
-                # Realizar la transferencia interna
-                cuenta_principal.saldo_cuenta -= monto
-                subcuenta.saldo += monto
-                cuenta_principal.save()
-                subcuenta.save()
-                print(f"DEBUG: Transferencia completada. Nuevo saldo subcuenta: {subcuenta.saldo}")
+                # Realizar la transferencia interna (el disponible se valida con la cuenta bloqueada)
+                try:
+                    resultado = TransferenciaService.ejecutar(
+                        request.user, cuenta_principal, subcuenta, monto, descripcion, registrar=False
+                    )
+                except TransferenciaError as e:
+                    return JsonResponse({'success': False, 'error': str(e)})
+                print(f"DEBUG: Transferencia completada. Nuevo saldo subcuenta: {resultado['subcuentas'][subcuenta.id]}")
                 
                 # Crear notificación persistente
                 crear_notificacion_movimiento(
@@ -1000,8 +910,8 @@ def depositar_subcuenta_ajax(request):
                         'subcuenta_id': subcuenta.id,
                         'subcuenta_nombre': subcuenta.nombre,
                         'monto': float(monto),
-                        'saldo_subcuenta': float(subcuenta.saldo),
-                        'saldo_principal_restante': float(cuenta_principal.saldo_cuenta)
+                        'saldo_subcuenta': float(resultado['subcuentas'][subcuenta.id]),
+                        'saldo_principal_restante': float(resultado['cuentas'][cuenta_principal.id])
                     }
                 )
         
@@ -1047,26 +957,14 @@ def transferir_subcuentas_ajax(request):
                 (subcuenta_destino.id_cuenta and subcuenta_destino.id_cuenta.id_usuario == usuario))):
             return JsonResponse({'success': False, 'error': 'No tienes permisos sobre estas subcuentas'})
         
-        # Verificar saldo suficiente
-        if subcuenta_origen.saldo < monto:
-            return JsonResponse({'success': False, 'error': 'Saldo insuficiente en la subcuenta origen'})
-        
-        # Realizar la transferencia
+        # Realizar la transferencia (el saldo se valida con las filas bloqueadas)
         with transaction.atomic():
-            subcuenta_origen.saldo -= monto
-            subcuenta_destino.saldo += monto
-            
-            # Crear registro de transferencia
-            transferencia = TransferenciaSubCuenta.objects.create(
-                subcuenta_origen=subcuenta_origen,
-                subcuenta_destino=subcuenta_destino,
-                id_usuario=usuario,
-                monto=monto,
-                descripcion=descripcion or f'Transferencia de {subcuenta_origen.nombre} a {subcuenta_destino.nombre}'
-            )
-            
-            subcuenta_origen.save()
-            subcuenta_destino.save()
+            try:
+                resultado = TransferenciaService.ejecutar(
+                    usuario, subcuenta_origen, subcuenta_destino, monto, descripcion
+                )
+            except TransferenciaError as e:
+                return JsonResponse({'success': False, 'error': str(e)})
             
             # Crear notificación persistente
             crear_notificacion_movimiento(
@@ -1081,8 +979,8 @@ def transferir_subcuentas_ajax(request):
                     'subcuenta_destino_id': subcuenta_destino.id,
                     'subcuenta_destino_nombre': subcuenta_destino.nombre,
                     'monto': float(monto),
-                    'saldo_origen_restante': float(subcuenta_origen.saldo),
-                    'saldo_destino_resultante': float(subcuenta_destino.saldo)
+                    'saldo_origen_restante': float(resultado['subcuentas'][subcuenta_origen.id]),
+                    'saldo_destino_resultante': float(resultado['subcuentas'][subcuenta_destino.id])
                 }
             )
         
@@ -0,0 +1,151 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from usuarios.models import Usuario
+from cuentas.models import Moneda, Cuenta
+from gestion_financiera_basica.models import Movimiento
+from gestion_financiera_basica.services import BusquedaMovimientos, PaginacionMovimientos
+import random
+import time
+import uuid
+
+NOMBRES = [
+    'Supermercado', 'Almuerzo', 'Cena', 'Taxi', 'Gasolina', 'Farmacia', 'Cine', 'Netflix', 'Spotify',
+    'Alquiler', 'Luz', 'Agua', 'Internet', 'Gimnasio', 'Panadería', 'Cafetería', 'Restaurante', 'Peaje',
+    'Sueldo', 'Freelance', 'Regalo', 'Librería', 'Ferretería', 'Veterinaria', 'Seguro', 'Colegio',
+]
+DESCRIPCIONES = [
+    'compras de la semana', 'comida con amigos', 'viaje al trabajo', 'pago mensual', 'medicinas',
+    'entradas para el estreno', 'servicio del hogar', 'recarga de combustible', 'mantenimiento del auto',
+    'pago del proyecto', 'cumpleaños de mamá', 'útiles escolares', 'consulta médica', 'cuota anual',
+]
+
+class Command(BaseCommand):
+    help = (
+        'Compara la búsqueda de transacciones anterior (icontains en nombre, descripción y cuenta) con '
+        'BusquedaMovimientos (tsvector + GIN, pg_trgm si está instalada) a medida que crece el historial'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanos',
+            default='1000,10000,100000',
+            help='Tamaños del historial del usuario medido, separados por comas (crecientes)',
+        )
+        parser.add_argument('--usuarios', type=int, default=20, help='Usuarios adicionales con el mismo historial')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Repeticiones de cada búsqueda')
+        parser.add_argument(
+            '--terminos',
+            default='comida,supermercado,farma,pago mensual,veterinaria,xyzzy',
+            help='Búsquedas a medir, separadas por comas',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('La búsqueda de texto completo requiere PostgreSQL')
+        try:
+            tamanos = [int(tamano) for tamano in options['tamanos'].split(',')]
+        except ValueError:
+            raise CommandError('--tamanos debe ser una lista de enteros separados por comas')
+        if not tamanos or tamanos != sorted(tamanos) or tamanos[0] < 1 or options['repeticiones'] < 1:
+            raise CommandError('--tamanos debe ser creciente y mayor a 0, y --repeticiones mayor a 0')
+        terminos = [termino.strip() for termino in options['terminos'].split(',') if termino.strip()]
+
+        self.stdout.write(
+            f"🔎 pg_trgm {'instalada' if BusquedaMovimientos.trigramas_disponibles() else 'no instalada (sin tolerancia a errores de tipeo)'}"
+        )
+
+        # Todo ocurre en una transacción que se revierte al final: no quedan datos de prueba
+        with transaction.atomic():
+            usuarios, cuentas = self._preparar(options['usuarios'] + 1)
+            usuario = usuarios[0]
+            aleatorio = random.Random(42)
+            sembrados = 0
+            for tamano in tamanos:
+                self._sembrar(cuentas, sembrados, tamano, aleatorio)
+                sembrados = tamano
+                with connection.cursor() as cursor:
+                    for modelo in (Cuenta, Movimiento):
+                        cursor.execute(f'ANALYZE {modelo._meta.db_table}')
+
+                self.stdout.write(f'📊 Historial de {tamano} movimientos por usuario ({len(usuarios)} usuarios)')
+                for termino in terminos:
+                    anterior, filas_anterior = self._medir(lambda: self._buscar_legado(usuario, termino), options['repeticiones'])
+                    nueva, filas_nueva = self._medir(
+                        lambda: PaginacionMovimientos.pagina(usuario, busqueda=termino, orden='relevance')[0],
+                        options['repeticiones'],
+                    )
+                    self.stdout.write(
+                        f'   "{termino}": anterior {anterior:.1f} ms ({filas_anterior} filas) | '
+                        f'tsvector {nueva:.1f} ms (página de {filas_nueva}, por relevancia)'
+                    )
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _medir(buscar, repeticiones):
+        """Mediana en milisegundos y cantidad de filas devueltas"""
+        duraciones = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            filas = len(buscar())
+            duraciones.append((time.perf_counter() - inicio) * 1000)
+        return sorted(duraciones)[len(duraciones) // 2], filas
+
+    @staticmethod
+    def _buscar_legado(usuario, termino):
+        """Búsqueda anterior de la vista transactions: tres icontains y todo el resultado ordenado"""
+        return list(Movimiento.objects.filter(id_cuenta__id_usuario=usuario).filter(
+            Q(nombre__icontains=termino) |
+            Q(descripcion__icontains=termino) |
+            Q(id_cuenta__nombre__icontains=termino)
+        ).order_by('-fecha_movimiento'))
+
+    def _preparar(self, cantidad):
+        """Usuarios temporales con una cuenta cada uno"""
+        moneda = Moneda.objects.first()
+        if moneda is None:
+            raise CommandError('No hay monedas registradas')
+
+        sufijo = uuid.uuid4().hex[:8]
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(
+                correo=f'benchmark-{sufijo}-{i}@fingest.local',
+                password='!',
+                nombres='Benchmark',
+                apellido_paterno='Busqueda',
+                apellido_materno=sufijo,
+                documento_identidad=sufijo,
+                telefono=0,
+                id_moneda=moneda,
+                is_active=False,
+            )
+            for i in range(cantidad)
+        ])
+        cuentas = Cuenta.objects.bulk_create([
+            Cuenta(nombre='Cuenta sueldo', descripcion='Cuenta temporal de benchmark', saldo_cuenta=0, id_usuario=usuario)
+            for usuario in usuarios
+        ])
+        return usuarios, cuentas
+
+    @staticmethod
+    def _sembrar(cuentas, desde, hasta, aleatorio):
+        """Agrega a cada cuenta los movimientos [desde, hasta) con nombres y descripciones al azar"""
+        fin = timezone.now()
+        for inicio_lote in range(desde, hasta, 500):
+            Movimiento.objects.bulk_create([
+                Movimiento(
+                    nombre=f'{aleatorio.choice(NOMBRES)} {i % 97}',
+                    descripcion=aleatorio.choice(DESCRIPCIONES) if i % 4 else None,
+                    tipo='ingreso' if i % 5 == 0 else 'egreso',
+                    monto=Decimal(i % 3000) + Decimal('0.50'),
+                    fecha_movimiento=fin - timedelta(hours=i),
+                    id_cuenta=cuenta,
+                    id_usuario_id=cuenta.id_usuario_id,
+                )
+                for i in range(inicio_lote, min(inicio_lote + 500, hasta))
+                for cuenta in cuentas
+            ], batch_size=5000)
@@ -0,0 +1,175 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from usuarios.models import Usuario
+from cuentas.models import Moneda, Cuenta
+from gestion_financiera_basica.models import Movimiento
+from gestion_financiera_basica.services import PaginacionMovimientos
+from analisis_reportes.services import RollupService
+import json
+import uuid
+
+class Command(BaseCommand):
+    help = (
+        'Siembra un historial grande de movimientos y verifica con EXPLAIN ANALYZE que las consultas '
+        'del dashboard, transacciones y reportes usan índices sobre Movimiento (sin Seq Scan)'
+    )
+
+    TABLA = Movimiento._meta.db_table
+    NODOS_CON_INDICE = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50, help='Usuarios sembrados (el primero es el medido)')
+        parser.add_argument('--movimientos', type=int, default=4000, help='Movimientos por usuario')
+        parser.add_argument('--dias', type=int, default=730, help='Días de historial que cubren los movimientos')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('La verificación de planes con EXPLAIN requiere PostgreSQL')
+        if options['usuarios'] < 1 or options['movimientos'] < 1 or options['dias'] < 30:
+            raise CommandError('--usuarios y --movimientos deben ser mayores a 0 y --dias al menos 30')
+
+        # Todo ocurre en una transacción que se revierte al final: no quedan datos de prueba
+        with transaction.atomic():
+            usuario = self._preparar(options)
+            # Estadísticas al día de las tablas sembradas, como las tendría la base en producción
+            with connection.cursor() as cursor:
+                for modelo in (Usuario, Cuenta, Movimiento):
+                    cursor.execute(f'ANALYZE {modelo._meta.db_table}')
+            total = options['usuarios'] * options['movimientos']
+            self.stdout.write(f"📊 {total} movimientos de {options['usuarios']} usuarios en {options['dias']} días")
+
+            problemas = []
+            for seccion, nombre, consulta in self._consultas(usuario):
+                with CaptureQueriesContext(connection) as capturadas:
+                    consulta()
+                for sql in (q['sql'] for q in capturadas.captured_queries if f'"{self.TABLA}"' in q['sql']):
+                    escaneos, duracion = self._explicar(sql)
+                    detalle = ', '.join(f'{nodo} ({indice})' if indice else nodo for nodo, indice in escaneos)
+                    correcto = all(nodo in self.NODOS_CON_INDICE for nodo, _ in escaneos)
+                    self.stdout.write(f"   {'✅' if correcto else '❌'} {seccion} / {nombre}: {detalle} en {duracion:.2f} ms")
+                    if not correcto:
+                        problemas.append(f'{seccion} / {nombre}: {detalle}')
+
+            transaction.set_rollback(True)
+
+        if problemas:
+            raise CommandError(f'{len(problemas)} consultas recorren la tabla de movimientos sin índice')
+        self.stdout.write(self.style.SUCCESS('✅ Todas las consultas frecuentes usan índices sobre Movimiento'))
+
+    def _explicar(self, sql):
+        """Ejecuta EXPLAIN ANALYZE y devuelve los escaneos sobre Movimiento (nodo, índice) y el tiempo"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+            resultado = cursor.fetchone()[0]
+        if isinstance(resultado, str):
+            resultado = json.loads(resultado)
+
+        escaneos = []
+        pendientes = [resultado[0]['Plan']]
+        while pendientes:
+            nodo = pendientes.pop()
+            pendientes.extend(nodo.get('Plans', []))
+            if nodo.get('Relation Name') != self.TABLA:
+                continue
+            indice = nodo.get('Index Name')
+            if nodo['Node Type'] == 'Bitmap Heap Scan':
+                indice = ', '.join(hijo.get('Index Name', '') for hijo in nodo.get('Plans', []))
+            escaneos.append((nodo['Node Type'], indice))
+        return escaneos, resultado[0]['Execution Time']
+
+    def _consultas(self, usuario):
+        """Consultas frecuentes de las vistas, con los mismos filtros (sección, nombre, función)"""
+        from analisis_reportes.views import calcular_estadisticas_generales, get_gastos_por_categoria
+
+        ahora = timezone.now()
+        # Período que no cubre meses completos: los reportes no pueden usar los resúmenes mensuales
+        inicio_periodo = ahora - timedelta(days=45)
+        primer_dia_mes = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        movimientos = Movimiento.objects.filter(id_usuario=usuario)
+        cursor_profundo = self._cursor_profundo(usuario, 'highest')
+
+        return [
+            ('Dashboard', 'movimientos recientes', lambda: list(
+                movimientos.select_related('id_cuenta').order_by('-fecha_movimiento')[:6]
+            )),
+            *[
+                ('Transacciones', f'página {orden}', lambda orden=orden: PaginacionMovimientos.pagina(usuario, orden=orden))
+                for orden in PaginacionMovimientos.ORDENES
+            ],
+            ('Transacciones', 'página 100', lambda: PaginacionMovimientos.pagina(
+                usuario, orden='highest', cursor=cursor_profundo
+            )),
+            ('Transacciones', 'página de egresos', lambda: PaginacionMovimientos.pagina(usuario, filtro='expenses')),
+            ('Transacciones', 'categorías del mes', lambda: list(
+                movimientos.filter(fecha_movimiento__gte=primer_dia_mes).values('nombre').annotate(
+                    cantidad=Count('nombre'), total_monto=Sum('monto')
+                ).order_by('-cantidad')[:5]
+            )),
+            ('Transacciones', 'totales de la semana', lambda: [
+                movimientos.filter(fecha_movimiento__gte=ahora - timedelta(days=7), tipo=tipo).aggregate(total=Sum('monto'))
+                for tipo in ('ingreso', 'egreso')
+            ]),
+            ('Reportes', 'estadísticas generales', lambda: calcular_estadisticas_generales(usuario, inicio_periodo, ahora)),
+            ('Reportes', 'gastos por categoría', lambda: get_gastos_por_categoria(usuario, inicio_periodo, ahora)),
+            ('Reportes', 'serie mensual', lambda: RollupService.serie(usuario, inicio_periodo, ahora, 'mes')),
+        ]
+
+    @staticmethod
+    def _cursor_profundo(usuario, orden, paginas=100):
+        """Cursor de la página N, obtenido recorriendo las anteriores"""
+        cursor = None
+        for _ in range(paginas):
+            _, siguiente = PaginacionMovimientos.pagina(usuario, orden=orden, cursor=cursor)
+            if siguiente is None:
+                break
+            cursor = siguiente
+        return cursor
+
+    def _preparar(self, options):
+        """Usuarios temporales con una cuenta cada uno y N movimientos por usuario"""
+        moneda = Moneda.objects.first()
+        if moneda is None:
+            raise CommandError('No hay monedas registradas')
+
+        sufijo = uuid.uuid4().hex[:8]
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(
+                correo=f'benchmark-{sufijo}-{i}@fingest.local',
+                password='!',
+                nombres='Benchmark',
+                apellido_paterno='Indices',
+                apellido_materno=sufijo,
+                documento_identidad=sufijo,
+                telefono=0,
+                id_moneda=moneda,
+                is_active=False,
+            )
+            for i in range(options['usuarios'])
+        ])
+        cuentas = Cuenta.objects.bulk_create([
+            Cuenta(nombre='Benchmark', descripcion='Cuenta temporal de benchmark', saldo_cuenta=0, id_usuario=usuario)
+            for usuario in usuarios
+        ])
+
+        fin = timezone.now()
+        paso = timedelta(days=options['dias']) / options['movimientos']
+        # Los usuarios se intercalan para que sus filas queden repartidas por toda la tabla
+        for desde in range(0, options['movimientos'], 500):
+            Movimiento.objects.bulk_create([
+                Movimiento(
+                    nombre=f'Movimiento {i % 20}',
+                    tipo='ingreso' if i % 3 == 0 else 'egreso',
+                    monto=Decimal(i % 5000) + Decimal('0.99'),
+                    fecha_movimiento=fin - paso * i,
+                    id_cuenta=cuenta,
+                    id_usuario_id=cuenta.id_usuario_id,
+                )
+                for i in range(desde, min(desde + 500, options['movimientos']))
+                for cuenta in cuentas
+            ], batch_size=5000)
+        return usuarios[0]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import Usuario
+from gestion_financiera_basica.services import ResumenMensualService
+import time
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero la tabla de resúmenes mensuales de movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='Correo o id del usuario a reconstruir (por defecto, todos)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tamaño de lote para la inserción masiva',
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            filtro = {'pk': options['usuario']} if options['usuario'].isdigit() else {'correo': options['usuario']}
+            try:
+                usuario = Usuario.objects.get(**filtro)
+            except Usuario.DoesNotExist:
+                raise CommandError(f"Usuario no encontrado: {options['usuario']}")
+
+        inicio = time.perf_counter()
+        filas = ResumenMensualService.reconstruir(usuario=usuario, batch_size=options['batch_size'])
+        duracion = time.perf_counter() - inicio
+
+        alcance = f'usuario {usuario.correo}' if usuario else 'todos los usuarios'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Resúmenes reconstruidos para {alcance}: {filas} filas en {duracion:.2f}s'
+            )
+        )
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from gestion_financiera_basica.services import VencimientoMetasService
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Avisa a todos los usuarios de sus metas de ahorro próximas a vencer. Es idempotente por meta '
+        'y por día: se puede ejecutar desde cron o dejar corriendo con --programar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=VencimientoMetasService.DIAS_ANTICIPACION,
+            help='Días de anticipación con los que se avisa el vencimiento',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=VencimientoMetasService.TAMANO_LOTE,
+            help='Notificaciones insertadas por lote',
+        )
+        parser.add_argument(
+            '--fecha',
+            help='Fecha de referencia AAAA-MM-DD (por defecto, hoy)',
+        )
+        parser.add_argument(
+            '--programar',
+            metavar='HH:MM',
+            help='No terminar: ejecutar todos los días a esta hora local (planificador integrado)',
+        )
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--dias no puede ser negativo y --batch-size debe ser mayor a 0')
+
+        fecha = None
+        if options['fecha']:
+            try:
+                fecha = date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('--fecha debe tener el formato AAAA-MM-DD')
+
+        if not options['programar']:
+            self._ejecutar(fecha, options)
+            return
+
+        if fecha:
+            raise CommandError('--fecha y --programar no se pueden combinar')
+        try:
+            hora = datetime.strptime(options['programar'], '%H:%M').time()
+        except ValueError:
+            raise CommandError('--programar debe tener el formato HH:MM')
+
+        self.stdout.write(f"⏰ Verificación de metas programada todos los días a las {hora.strftime('%H:%M')}")
+        try:
+            while True:
+                time.sleep(self._segundos_hasta(hora))
+                # Conexiones que el servidor pudo cerrar durante la espera
+                close_old_connections()
+                try:
+                    self._ejecutar(None, options)
+                except Exception as e:
+                    # Un error no detiene el planificador: la ejecución de mañana lo reintenta
+                    self.stderr.write(f'❌ Error verificando metas: {e}')
+        except KeyboardInterrupt:
+            self.stdout.write('Planificador detenido')
+
+    def _ejecutar(self, fecha, options):
+        resultado = VencimientoMetasService.notificar(
+            hoy=fecha,
+            dias=options['dias'],
+            tamano_lote=options['batch_size'],
+        )
+        duracion = resultado['segundos']
+        velocidad = resultado['metas'] / duracion if duracion else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {resultado['metas']} metas por vencer en {duracion:.2f}s ({velocidad:.0f} filas/s): "
+                f"{resultado['creadas']} avisos creados, {resultado['duplicadas']} ya enviados hoy, "
+                f"{resultado['deshabilitadas']} deshabilitados"
+            )
+        )
+
+    @staticmethod
+    def _segundos_hasta(hora):
+        """Segundos hasta la próxima ocurrencia de `hora` en la zona horaria local"""
+        ahora = timezone.localtime()
+        siguiente = ahora.replace(hour=hora.hour, minute=hora.minute, second=0, microsecond=0)
+        if siguiente <= ahora:
+            siguiente += timedelta(days=1)
+        return (siguiente - ahora).total_seconds()
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Construye los resúmenes iniciales a partir de los movimientos existentes"""
+    Movimiento = apps.get_model('gestion_financiera_basica', 'Movimiento')
+    ResumenMensualMovimiento = apps.get_model('gestion_financiera_basica', 'ResumenMensualMovimiento')
+
+    filas = Movimiento.objects.annotate(
+        mes_resumen=TruncMonth('fecha_movimiento', output_field=DateField()),
+        categoria_resumen=Coalesce('categoria', Value('')),
+    ).values(
+        'id_usuario_id', 'id_cuenta_id', 'mes_resumen', 'tipo', 'categoria_resumen'
+    ).annotate(
+        total=Sum('monto'),
+        cantidad=Count('id'),
+        monto_minimo=Min('monto'),
+        monto_maximo=Max('monto'),
+    ).order_by()
+
+    ResumenMensualMovimiento.objects.bulk_create([
+        ResumenMensualMovimiento(
+            id_usuario_id=fila['id_usuario_id'],
+            id_cuenta_id=fila['id_cuenta_id'],
+            mes=fila['mes_resumen'],
+            tipo=fila['tipo'],
+            categoria=fila['categoria_resumen'],
+            total=fila['total'],
+            cantidad=fila['cantidad'],
+            monto_minimo=fila['monto_minimo'],
+            monto_maximo=fila['monto_maximo'],
+        )
+        for fila in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0004_improve_subcuentas_independence'),
+        ('gestion_financiera_basica', '0003_movimiento_categoria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualMovimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes resumido')),
+                ('tipo', models.CharField(choices=[('ingreso', 'Ingreso'), ('egreso', 'Egreso')], max_length=25)),
+                ('categoria', models.CharField(blank=True, default='', help_text='Vacío si el movimiento no tiene categoría', max_length=25)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('monto_minimo', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('monto_maximo', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('id_cuenta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cuentas.cuenta')),
+                ('id_usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['id_usuario', 'tipo', 'mes'], name='gestion_fin_id_usua_d59ca0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('id_usuario', 'id_cuenta', 'mes', 'tipo', 'categoria'), name='resumen_mensual_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:13
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def alinear_usuario(apps, schema_editor):
+    """Las consultas pasan a filtrar por Movimiento.id_usuario: debe coincidir con el dueño de la cuenta"""
+    Movimiento = apps.get_model('gestion_financiera_basica', 'Movimiento')
+    Cuenta = apps.get_model('cuentas', 'Cuenta')
+
+    Movimiento.objects.exclude(id_usuario=F('id_cuenta__id_usuario')).update(
+        id_usuario=Subquery(Cuenta.objects.filter(pk=OuterRef('id_cuenta')).values('id_usuario')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0005_cuenta_saldo_actual'),
+        ('gestion_financiera_basica', '0004_resumenmensualmovimiento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(alinear_usuario, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['id_usuario', 'fecha_movimiento'], name='gestion_fin_id_usua_6af382_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['id_usuario', 'tipo', 'fecha_movimiento'], include=('monto',), name='movimiento_usuario_tipo_fecha'),
+        ),
+    ]
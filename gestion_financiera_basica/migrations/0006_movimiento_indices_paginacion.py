@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0005_cuenta_saldo_actual'),
+        ('gestion_financiera_basica', '0005_movimiento_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movimiento',
+            name='gestion_fin_id_usua_6af382_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['id_usuario', 'fecha_movimiento', 'id'], name='gestion_fin_id_usua_5d7773_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['id_usuario', 'monto', 'id'], name='gestion_fin_id_usua_630765_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    """
+    Índice de trigramas sobre nombre para la búsqueda tolerante a errores.
+
+    pg_trgm es un módulo contrib de PostgreSQL: si el servidor no lo trae, la búsqueda
+    funciona sólo con el tsvector (BusquedaMovimientos lo detecta al consultar).
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS movimiento_nombre_trgm '
+        'ON gestion_financiera_basica_movimiento USING gin (nombre gin_trgm_ops)'
+    )
+
+
+def eliminar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS movimiento_nombre_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0005_cuenta_saldo_actual'),
+        ('gestion_financiera_basica', '0006_movimiento_indices_paginacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimiento',
+            name='busqueda',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('nombre', config='spanish', weight='A'), '||', django.contrib.postgres.search.SearchVector('descripcion', config='spanish', weight='B'), django.contrib.postgres.search.SearchConfig('spanish')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busqueda'], name='movimiento_busqueda'),
+        ),
+        migrations.RunPython(crear_indice_trigramas, eliminar_indice_trigramas),
+    ]
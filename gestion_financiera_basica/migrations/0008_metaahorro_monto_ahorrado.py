@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_monto_ahorrado(apps, schema_editor):
+    """Inicializa monto_ahorrado con la suma de los aportes de cada meta en un solo UPDATE"""
+    MetaAhorro = apps.get_model('gestion_financiera_basica', 'MetaAhorro')
+    AporteMetaAhorro = apps.get_model('gestion_financiera_basica', 'AporteMetaAhorro')
+
+    total_aportes = AporteMetaAhorro.objects.filter(
+        id_meta_ahorro=OuterRef('pk')
+    ).order_by().values('id_meta_ahorro').annotate(total=Sum('monto')).values('total')
+    MetaAhorro.objects.update(monto_ahorrado=Coalesce(
+        Subquery(total_aportes, output_field=DecimalField(max_digits=15, decimal_places=2)),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_financiera_basica', '0007_movimiento_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metaahorro',
+            name='monto_ahorrado',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15),
+        ),
+        migrations.RunPython(calcular_monto_ahorrado, migrations.RunPython.noop),
+    ]
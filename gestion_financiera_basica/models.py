@@ -1,5 +1,9 @@
-from django.db import models
-from django.db.models import Sum
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 
 # Create your models here.
 
@@ -23,31 +27,38 @@ class MetaAhorro(models.Model):
     nombre = models.CharField(max_length=50)
     id_usuario = models.ForeignKey("usuarios.Usuario", on_delete=models.CASCADE)
     id_cuenta = models.ForeignKey("cuentas.Cuenta", on_delete=models.CASCADE)
+    # Suma materializada de los aportes. Sólo se modifica con incrementos F() desde
+    # AporteMetaAhorro.save y la señal post_delete de AporteMetaAhorro
+    monto_ahorrado = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False)
 
     def __str__(self):
         return self.nombre
 
-    def monto_ahorrado(self):
-        """Calcula el monto total ahorrado hasta la fecha"""
-        total = self.aportes.aggregate(Sum('monto'))['monto__sum']
-        return float(total) if total is not None else 0.0
-
     def porcentaje_progreso(self):
         """Calcula el porcentaje de progreso hacia la meta"""
         if self.monto_objetivo <= 0:
             return 0.0
-        monto_actual = self.monto_ahorrado()
+        monto_actual = float(self.monto_ahorrado)
         objetivo = float(self.monto_objetivo)
         return min((monto_actual / objetivo) * 100, 100.0)
 
     def falta_por_ahorrar(self):
         """Calcula cuánto falta para alcanzar la meta"""
-        falta = float(self.monto_objetivo) - self.monto_ahorrado()
+        falta = float(self.monto_objetivo) - float(self.monto_ahorrado)
         return max(falta, 0.0)
 
     def meta_alcanzada(self):
         """Verifica si la meta ya fue alcanzada"""
-        return self.monto_ahorrado() >= float(self.monto_objetivo)
+        return self.monto_ahorrado >= self.monto_objetivo
+
+    def save(self, *args, **kwargs):
+        """Nunca sobrescribe monto_ahorrado con el valor en memoria: un aporte pudo haberlo incrementado"""
+        if not self._state.adding:
+            update_fields = kwargs.pop('update_fields', None)
+            if update_fields is None:
+                update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs['update_fields'] = [campo for campo in update_fields if campo != 'monto_ahorrado']
+        super().save(*args, **kwargs)
 
 
 class MoldeAhorro(models.Model):
@@ -73,6 +84,29 @@ class AporteMetaAhorro(models.Model):
     class Meta:
         ordering = ['-fecha_aporte']
 
+    def save(self, *args, **kwargs):
+        """
+        Guarda el aporte y actualiza MetaAhorro.monto_ahorrado en la misma transacción
+        con un único UPDATE ... SET monto_ahorrado = monto_ahorrado + x
+        """
+        with transaction.atomic():
+            anterior = None
+            if self.pk and not self._state.adding:
+                anterior = AporteMetaAhorro.objects.filter(pk=self.pk).values('id_meta_ahorro_id', 'monto').first()
+
+            super().save(*args, **kwargs)
+
+            if anterior:
+                MetaAhorro.objects.filter(pk=anterior['id_meta_ahorro_id']).update(
+                    monto_ahorrado=F('monto_ahorrado') - anterior['monto']
+                )
+            MetaAhorro.objects.filter(pk=self.id_meta_ahorro_id).update(
+                monto_ahorrado=F('monto_ahorrado') + Decimal(str(self.monto))
+            )
+            # La meta en memoria (p. ej. la que usan las señales) ve el total nuevo
+            if AporteMetaAhorro.id_meta_ahorro.is_cached(self):
+                self.id_meta_ahorro.refresh_from_db(fields=['monto_ahorrado'])
+
 
 class Movimiento(models.Model):
     TIPOS_MOVIMIENTO = (
@@ -111,9 +145,50 @@ class Movimiento(models.Model):
     descripcion = models.CharField(max_length=300, blank=True, null=True)
     id_cuenta = models.ForeignKey("cuentas.Cuenta", on_delete=models.CASCADE)
     id_usuario = models.ForeignKey("usuarios.Usuario", on_delete=models.CASCADE)
+    # Vector de búsqueda que mantiene PostgreSQL (columna generada); ver BusquedaMovimientos
+    busqueda = models.GeneratedField(
+        expression=(
+            SearchVector('nombre', weight='A', config='spanish')
+            + SearchVector('descripcion', weight='B', config='spanish')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     def __str__(self):
         return f"{self.tipo} - {self.monto}"
+
+    class Meta:
+        # Las consultas filtran por id_usuario (el dueño de la cuenta) sin unir con Cuenta
+        indexes = [
+            # Con id al final sirven también a la paginación por cursor (PaginacionMovimientos)
+            models.Index(fields=['id_usuario', 'fecha_movimiento', 'id']),
+            models.Index(fields=['id_usuario', 'monto', 'id']),
+            # INCLUDE monto: los totales por tipo y período se resuelven sólo con el índice en PostgreSQL
+            models.Index(fields=['id_usuario', 'tipo', 'fecha_movimiento'], include=['monto'], name='movimiento_usuario_tipo_fecha'),
+            GinIndex(fields=['busqueda'], name='movimiento_busqueda'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda el movimiento y actualiza Cuenta.saldo_actual en la misma transacción.
+        Los valores previos quedan en self._valores_anteriores para las señales.
+        """
+        from cuentas.services import SaldoService
+
+        with transaction.atomic():
+            self._valores_anteriores = None
+            if self.pk and not self._state.adding:
+                self._valores_anteriores = Movimiento.objects.filter(pk=self.pk).values(
+                    'id_usuario_id', 'id_cuenta_id', 'tipo', 'categoria', 'fecha_movimiento', 'monto'
+                ).first()
+
+            super().save(*args, **kwargs)
+
+            anterior = self._valores_anteriores
+            if anterior:
+                SaldoService.aplicar(anterior['id_cuenta_id'], anterior['tipo'], anterior['monto'], revertir=True)
+            SaldoService.aplicar(self.id_cuenta_id, self.tipo, self.monto)
     
     def get_categoria_display_emoji(self):
         """Retorna la categoría con emoji"""
@@ -125,4 +200,34 @@ class Movimiento(models.Model):
             for cat_key, cat_display in self.CATEGORIAS_INGRESOS:
                 if cat_key == self.categoria:
                     return cat_display
-        return '📦 Otros'
\ No newline at end of file
+        return '📦 Otros'
+
+class ResumenMensualMovimiento(models.Model):
+    """
+    Resumen materializado de movimientos por usuario, cuenta, mes, tipo y categoría.
+    Se mantiene desde las señales de Movimiento y se puede reconstruir con
+    `python manage.py reconstruir_resumenes`.
+    """
+    id_usuario = models.ForeignKey("usuarios.Usuario", on_delete=models.CASCADE)
+    id_cuenta = models.ForeignKey("cuentas.Cuenta", on_delete=models.CASCADE)
+    mes = models.DateField(help_text="Primer día del mes resumido")
+    tipo = models.CharField(max_length=25, choices=Movimiento.TIPOS_MOVIMIENTO)
+    categoria = models.CharField(max_length=25, blank=True, default='', help_text="Vacío si el movimiento no tiene categoría")
+    total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    cantidad = models.PositiveIntegerField(default=0)
+    monto_minimo = models.DecimalField(max_digits=15, decimal_places=2)
+    monto_maximo = models.DecimalField(max_digits=15, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} {self.tipo}/{self.categoria or 'sin categoría'}: {self.total}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_usuario', 'id_cuenta', 'mes', 'tipo', 'categoria'],
+                name='resumen_mensual_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['id_usuario', 'tipo', 'mes']),
+        ]
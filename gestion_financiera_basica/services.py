@@ -0,0 +1,770 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (
+    BooleanField, Case, Count, DateField, DecimalField, ExpressionWrapper, F, FloatField, Max, Min,
+    OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, ExtractDay, Greatest, Least, TruncMonth
+from django.utils import timezone
+
+from alertas_notificaciones.models import Notificacion
+from alertas_notificaciones.services import NotificationService
+from core.cache import cache_compartida
+from cuentas.models import Cuenta
+from .models import MetaAhorro, Movimiento, ResumenMensualMovimiento
+import logging
+import re
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ResumenMensualService:
+    """Mantenimiento y lectura de la tabla ResumenMensualMovimiento"""
+
+    @staticmethod
+    def clave(movimiento):
+        """
+        Calcula la clave del resumen al que pertenece un movimiento
+
+        Args:
+            movimiento: Instancia de Movimiento o dict con los mismos campos (*_id incluidos)
+
+        Returns:
+            dict: id_usuario_id, id_cuenta_id, mes, tipo y categoria
+        """
+        if isinstance(movimiento, dict):
+            datos = movimiento
+        else:
+            datos = {
+                'id_usuario_id': movimiento.id_usuario_id,
+                'id_cuenta_id': movimiento.id_cuenta_id,
+                'tipo': movimiento.tipo,
+                'categoria': movimiento.categoria,
+                'fecha_movimiento': movimiento.fecha_movimiento,
+            }
+
+        fecha = datos['fecha_movimiento']
+        if timezone.is_aware(fecha):
+            fecha = timezone.localtime(fecha)
+
+        return {
+            'id_usuario_id': datos['id_usuario_id'],
+            'id_cuenta_id': datos['id_cuenta_id'],
+            'mes': fecha.date().replace(day=1),
+            'tipo': datos['tipo'],
+            'categoria': datos['categoria'] or '',
+        }
+
+    @staticmethod
+    def registrar(movimiento):
+        """Suma un movimiento recién creado a su resumen (sin recorrer el historial)"""
+        clave = ResumenMensualService.clave(movimiento)
+        monto = Decimal(movimiento.monto)
+
+        with transaction.atomic():
+            resumen, creado = ResumenMensualMovimiento.objects.get_or_create(
+                **clave,
+                defaults={
+                    'total': monto,
+                    'cantidad': 1,
+                    'monto_minimo': monto,
+                    'monto_maximo': monto,
+                }
+            )
+            if not creado:
+                valor = Value(monto, output_field=DecimalField(max_digits=15, decimal_places=2))
+                ResumenMensualMovimiento.objects.filter(pk=resumen.pk).update(
+                    total=F('total') + monto,
+                    cantidad=F('cantidad') + 1,
+                    monto_minimo=Least('monto_minimo', valor),
+                    monto_maximo=Greatest('monto_maximo', valor),
+                )
+
+    @staticmethod
+    def recalcular(clave):
+        """
+        Recalcula un único resumen a partir de los movimientos de ese mes.
+        Se usa en ediciones y eliminaciones, donde mínimo/máximo no se pueden
+        ajustar de forma incremental.
+        """
+        inicio = timezone.make_aware(datetime.combine(clave['mes'], datetime.min.time()))
+        if clave['mes'].month == 12:
+            siguiente = clave['mes'].replace(year=clave['mes'].year + 1, month=1)
+        else:
+            siguiente = clave['mes'].replace(month=clave['mes'].month + 1)
+        fin = timezone.make_aware(datetime.combine(siguiente, datetime.min.time()))
+
+        movimientos = Movimiento.objects.filter(
+            id_usuario_id=clave['id_usuario_id'],
+            id_cuenta_id=clave['id_cuenta_id'],
+            tipo=clave['tipo'],
+            fecha_movimiento__gte=inicio,
+            fecha_movimiento__lt=fin,
+        )
+        if clave['categoria']:
+            movimientos = movimientos.filter(categoria=clave['categoria'])
+        else:
+            movimientos = movimientos.filter(Q(categoria__isnull=True) | Q(categoria=''))
+
+        datos = movimientos.aggregate(
+            total=Sum('monto'),
+            cantidad=Count('id'),
+            monto_minimo=Min('monto'),
+            monto_maximo=Max('monto'),
+        )
+
+        with transaction.atomic():
+            if not datos['cantidad']:
+                ResumenMensualMovimiento.objects.filter(**clave).delete()
+            else:
+                ResumenMensualMovimiento.objects.update_or_create(**clave, defaults=datos)
+
+    @staticmethod
+    def reconstruir(usuario=None, batch_size=1000):
+        """
+        Reconstruye los resúmenes desde cero con una sola consulta agrupada
+
+        Args:
+            usuario: Si se indica, sólo reconstruye los resúmenes de ese usuario
+            batch_size: Tamaño de lote para bulk_create
+
+        Returns:
+            int: Número de filas de resumen creadas
+        """
+        movimientos = Movimiento.objects.all()
+        resumenes = ResumenMensualMovimiento.objects.all()
+        if usuario is not None:
+            movimientos = movimientos.filter(id_usuario=usuario)
+            resumenes = resumenes.filter(id_usuario=usuario)
+
+        filas = movimientos.annotate(
+            mes_resumen=TruncMonth('fecha_movimiento', output_field=DateField()),
+            categoria_resumen=Coalesce('categoria', Value('')),
+        ).values(
+            'id_usuario_id', 'id_cuenta_id', 'mes_resumen', 'tipo', 'categoria_resumen'
+        ).annotate(
+            total=Sum('monto'),
+            cantidad=Count('id'),
+            monto_minimo=Min('monto'),
+            monto_maximo=Max('monto'),
+        ).order_by()
+
+        nuevos = [
+            ResumenMensualMovimiento(
+                id_usuario_id=fila['id_usuario_id'],
+                id_cuenta_id=fila['id_cuenta_id'],
+                mes=fila['mes_resumen'],
+                tipo=fila['tipo'],
+                categoria=fila['categoria_resumen'],
+                total=fila['total'],
+                cantidad=fila['cantidad'],
+                monto_minimo=fila['monto_minimo'],
+                monto_maximo=fila['monto_maximo'],
+            )
+            for fila in filas.iterator()
+        ]
+
+        with transaction.atomic():
+            resumenes.delete()
+            ResumenMensualMovimiento.objects.bulk_create(nuevos, batch_size=batch_size)
+            # Sin señales (bulk_create): invalidar la caché de agregados de los afectados
+            usuarios = {nuevo.id_usuario_id for nuevo in nuevos}
+            if usuario is not None:
+                usuarios.add(getattr(usuario, 'pk', usuario))
+            CacheFinancieraUsuario.invalidar_al_confirmar(*usuarios)
+
+        logger.info(f"Resúmenes mensuales reconstruidos: {len(nuevos)} filas")
+        return len(nuevos)
+
+    @staticmethod
+    def meses_completos(fecha_inicio, fecha_fin):
+        """
+        Si el rango cubre meses completos devuelve (mes_desde, mes_hasta) para
+        leer los resúmenes; en otro caso devuelve None
+        """
+        if isinstance(fecha_inicio, datetime):
+            fecha_inicio = fecha_inicio.date()
+        if isinstance(fecha_fin, datetime):
+            fecha_fin = fecha_fin.date()
+
+        if fecha_inicio.day != 1 or (fecha_fin + timedelta(days=1)).day != 1:
+            return None
+        return fecha_inicio, fecha_fin.replace(day=1)
+
+    @staticmethod
+    def totales(usuario, mes_desde=None, mes_hasta=None):
+        """
+        Totales e importes por tipo leídos desde los resúmenes
+
+        Args:
+            usuario: Usuario (o id) propietario
+            mes_desde: Primer mes incluido (fecha con día 1), opcional
+            mes_hasta: Último mes incluido (fecha con día 1), opcional
+
+        Returns:
+            dict: {'ingreso': {'total', 'cantidad'}, 'egreso': {'total', 'cantidad'}}
+        """
+        resumenes = ResumenMensualMovimiento.objects.filter(id_usuario=usuario)
+        if mes_desde:
+            resumenes = resumenes.filter(mes__gte=mes_desde)
+        if mes_hasta:
+            resumenes = resumenes.filter(mes__lte=mes_hasta)
+
+        resultado = {
+            tipo: {'total': Decimal('0'), 'cantidad': 0}
+            for tipo, _ in Movimiento.TIPOS_MOVIMIENTO
+        }
+        for fila in resumenes.values('tipo').annotate(total=Sum('total'), cantidad=Sum('cantidad')).order_by():
+            resultado[fila['tipo']] = {
+                'total': fila['total'] or Decimal('0'),
+                'cantidad': fila['cantidad'] or 0,
+            }
+        return resultado
+
+    @staticmethod
+    def por_categoria(usuario, tipo, mes_desde=None, mes_hasta=None):
+        """Totales por categoría de un tipo de movimiento, de mayor a menor"""
+        resumenes = ResumenMensualMovimiento.objects.filter(id_usuario=usuario, tipo=tipo)
+        if mes_desde:
+            resumenes = resumenes.filter(mes__gte=mes_desde)
+        if mes_hasta:
+            resumenes = resumenes.filter(mes__lte=mes_hasta)
+
+        return resumenes.values('categoria').annotate(
+            total=Sum('total'),
+            cantidad=Sum('cantidad'),
+        ).order_by('-total')
+
+
+# Marca de ausencia en la caché (None puede ser un valor calculado válido)
+_SIN_VALOR = object()
+
+
+class CacheFinancieraUsuario:
+    """
+    Caché de los agregados por usuario (dashboard, transacciones, subcuentas, reportes)
+    direccionada por una versión de los datos del usuario.
+
+    Cada escritura de Movimiento, Cuenta, SubCuenta, transferencia, MetaAhorro o
+    AporteMetaAhorro cambia la versión al confirmar la transacción (ver signals.py y
+    TransferenciaService), así una entrada en caché nunca describe datos anteriores al
+    último cambio. Las entradas de versiones viejas no se borran: expiran por TTL
+    (FINANZAS_CACHE_TIMEOUT).
+
+    Requiere una caché compartida entre procesos (core.cache.cache_compartida): con
+    LocMemCache el cambio de versión sólo llegaría al proceso que escribió, así que
+    obtener() calcula siempre y no hay versión (version() devuelve None).
+    """
+
+    PREFIJO = 'finanzas'
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'FINANZAS_CACHE_TIMEOUT', 300)
+
+    @staticmethod
+    def clave_version(usuario_id):
+        return f'{CacheFinancieraUsuario.PREFIJO}:version:{usuario_id}'
+
+    @staticmethod
+    def version(usuario_id):
+        """
+        Versión actual de los datos del usuario (se crea si no existe o fue desalojada),
+        o None si la caché no es compartida y por lo tanto la versión no es confiable
+        """
+        if not cache_compartida():
+            return None
+        clave = CacheFinancieraUsuario.clave_version(usuario_id)
+        version = cache.get(clave)
+        if version is None:
+            # Valor aleatorio y no un contador: si la clave se desaloja, la versión
+            # nueva nunca coincide con la de entradas anteriores todavía en caché
+            cache.add(clave, uuid.uuid4().hex, None)
+            version = cache.get(clave)
+        return version
+
+    @staticmethod
+    def obtener(usuario, nombre, calcular, *partes):
+        """
+        Valor en caché del cálculo `nombre` para la versión actual de los datos del
+        usuario, o el resultado de calcular() si no está
+
+        Args:
+            usuario: Usuario (o id)
+            nombre: Identificador del cálculo (p. ej. 'dashboard')
+            calcular: Función sin argumentos que produce el valor
+            *partes: Parámetros que también determinan el valor (fechas, filtros)
+        """
+        usuario_id = getattr(usuario, 'pk', usuario)
+        version = CacheFinancieraUsuario.version(usuario_id)
+        if version is None:
+            return calcular()
+        clave = ':'.join(str(parte) for parte in (
+            CacheFinancieraUsuario.PREFIJO, usuario_id, version, nombre, *partes
+        ))
+
+        valor = cache.get(clave, _SIN_VALOR)
+        if valor is _SIN_VALOR:
+            valor = calcular()
+            cache.set(clave, valor, CacheFinancieraUsuario.timeout())
+        return valor
+
+    @staticmethod
+    def invalidar(*usuario_ids):
+        """Cambia la versión de los usuarios indicados (sus entradas dejan de leerse)"""
+        if not cache_compartida():
+            return
+        cache.set_many({
+            CacheFinancieraUsuario.clave_version(usuario_id): uuid.uuid4().hex
+            for usuario_id in set(usuario_ids) if usuario_id
+        }, None)
+
+    @staticmethod
+    def invalidar_al_confirmar(*usuario_ids):
+        """
+        Invalida cuando se confirme la transacción en curso (o en el acto si no hay una):
+        antes del commit otra petición todavía vería los datos anteriores y los
+        guardaría con la versión nueva
+        """
+        transaction.on_commit(lambda: CacheFinancieraUsuario.invalidar(*usuario_ids))
+
+
+class ResumenFinancieroService:
+    """
+    Foto de las cifras financieras de un usuario (dashboard, transacciones, subcuentas):
+    todos los totales salen de una sola consulta con agregación condicional
+    """
+
+    NOMBRES_CATEGORIAS = dict(Movimiento.CATEGORIAS_GASTOS)
+
+    @staticmethod
+    def obtener(usuario, ahora=None):
+        """
+        Totales históricos y del mes, y saldos de cuentas
+
+        La consulta parte de la fila del usuario: los resúmenes mensuales se unen y se
+        agregan con filtros por tipo y mes; los saldos de cuentas son subconsultas
+        escalares de la misma sentencia. Los totales de los últimos 7 días dependen de la
+        hora y no sólo de los datos, así que van aparte (ver semana()) y no se guardan en caché.
+
+        Args:
+            usuario: Usuario (o id)
+            ahora: Momento de referencia (por defecto timezone.now())
+
+        Returns:
+            dict: ingresos/egresos (total, cantidad, mes, cantidad_mes) y
+                  saldo_inicial y saldo_actual
+        """
+        from usuarios.models import Usuario
+
+        ahora = ahora or timezone.now()
+        mes_actual = timezone.localtime(ahora).date().replace(day=1)
+        usuario_id = getattr(usuario, 'pk', usuario)
+        cero = Value(Decimal('0'), output_field=DecimalField(max_digits=17, decimal_places=2))
+
+        def suma(campo, **filtros):
+            return Coalesce(Sum(campo, filter=Q(**filtros)), cero)
+
+        def cantidad(campo, **filtros):
+            return Coalesce(Sum(campo, filter=Q(**filtros)), 0)
+
+        def escalar(consulta, expresion):
+            # Agregado de una tabla relacionada, correlacionado con la fila del usuario
+            return Coalesce(
+                Subquery(consulta.values('id_usuario').annotate(valor=expresion).values('valor')),
+                cero,
+            )
+
+        cuentas = Cuenta.objects.filter(id_usuario=OuterRef('pk')).order_by()
+        resumen = 'resumenmensualmovimiento'
+
+        fila = Usuario.objects.filter(pk=usuario_id).annotate(
+            ingresos_total=suma(f'{resumen}__total', **{f'{resumen}__tipo': 'ingreso'}),
+            ingresos_cantidad=cantidad(f'{resumen}__cantidad', **{f'{resumen}__tipo': 'ingreso'}),
+            egresos_total=suma(f'{resumen}__total', **{f'{resumen}__tipo': 'egreso'}),
+            egresos_cantidad=cantidad(f'{resumen}__cantidad', **{f'{resumen}__tipo': 'egreso'}),
+            ingresos_mes=suma(f'{resumen}__total', **{f'{resumen}__tipo': 'ingreso', f'{resumen}__mes': mes_actual}),
+            ingresos_cantidad_mes=cantidad(f'{resumen}__cantidad', **{f'{resumen}__tipo': 'ingreso', f'{resumen}__mes': mes_actual}),
+            egresos_mes=suma(f'{resumen}__total', **{f'{resumen}__tipo': 'egreso', f'{resumen}__mes': mes_actual}),
+            egresos_cantidad_mes=cantidad(f'{resumen}__cantidad', **{f'{resumen}__tipo': 'egreso', f'{resumen}__mes': mes_actual}),
+            saldo_inicial=escalar(cuentas, Sum('saldo_cuenta')),
+            saldo_actual=escalar(cuentas, Sum('saldo_actual')),
+        ).values(
+            'ingresos_total', 'ingresos_cantidad', 'egresos_total', 'egresos_cantidad',
+            'ingresos_mes', 'ingresos_cantidad_mes', 'egresos_mes', 'egresos_cantidad_mes',
+            'saldo_inicial', 'saldo_actual',
+        ).first() or {}
+
+        return {
+            'ingresos': {
+                'total': fila.get('ingresos_total', Decimal('0')),
+                'cantidad': fila.get('ingresos_cantidad', 0),
+                'mes': fila.get('ingresos_mes', Decimal('0')),
+                'cantidad_mes': fila.get('ingresos_cantidad_mes', 0),
+            },
+            'egresos': {
+                'total': fila.get('egresos_total', Decimal('0')),
+                'cantidad': fila.get('egresos_cantidad', 0),
+                'mes': fila.get('egresos_mes', Decimal('0')),
+                'cantidad_mes': fila.get('egresos_cantidad_mes', 0),
+            },
+            'saldo_inicial': fila.get('saldo_inicial', Decimal('0')),
+            'saldo_actual': fila.get('saldo_actual', Decimal('0')),
+        }
+
+    @staticmethod
+    def semana(usuario, ahora=None):
+        """
+        Ingresos y egresos de los últimos 7 días hasta `ahora` (índice id_usuario, fecha_movimiento)
+
+        Returns:
+            dict: 'ingresos' y 'egresos'
+        """
+        ahora = ahora or timezone.now()
+        cero = Value(Decimal('0'), output_field=DecimalField(max_digits=17, decimal_places=2))
+        return Movimiento.objects.filter(
+            id_usuario=getattr(usuario, 'pk', usuario),
+            fecha_movimiento__gte=ahora - timedelta(days=7),
+        ).aggregate(
+            ingresos=Coalesce(Sum('monto', filter=Q(tipo='ingreso')), cero),
+            egresos=Coalesce(Sum('monto', filter=Q(tipo='egreso')), cero),
+        )
+
+    @staticmethod
+    def gastos_por_categoria(usuario, total_egresos=None):
+        """
+        Egresos históricos agrupados por categoría (una consulta agrupada), con el
+        nombre para mostrar y el porcentaje sobre total_egresos
+
+        Returns:
+            list: [{'categoria', 'monto', 'porcentaje'}] de mayor a menor
+        """
+        filas = list(ResumenMensualService.por_categoria(usuario, 'egreso'))
+        if total_egresos is None:
+            total_egresos = sum(fila['total'] for fila in filas)
+        total_egresos = float(total_egresos or 0)
+
+        nombres = ResumenFinancieroService.NOMBRES_CATEGORIAS
+        return [
+            {
+                'categoria': nombres.get(fila['categoria'] or 'otros', 'Otros'),
+                'monto': float(fila['total']),
+                'porcentaje': round(float(fila['total']) / total_egresos * 100, 1) if total_egresos else 0,
+            }
+            for fila in filas
+        ]
+
+
+class MetasAhorroService:
+    """Progreso de metas de ahorro calculado en la base de datos desde MetaAhorro.monto_ahorrado"""
+
+    @staticmethod
+    def anotar_progreso(metas):
+        """
+        Anota en un QuerySet de MetaAhorro, sin unir con los aportes:
+        progreso_porcentaje (0-100), monto_faltante (>= 0) y alcanzada.
+        Permite filtrar y ordenar por progreso en SQL (p. ej. metas sin completar).
+        """
+        cero = Value(Decimal('0'), output_field=DecimalField(max_digits=15, decimal_places=2))
+        return metas.annotate(
+            progreso_porcentaje=Case(
+                When(monto_objetivo__lte=0, then=Value(0.0)),
+                default=Least(
+                    Cast(F('monto_ahorrado'), FloatField()) * 100 / Cast(F('monto_objetivo'), FloatField()),
+                    Value(100.0),
+                ),
+                output_field=FloatField(),
+            ),
+            monto_faltante=Greatest(F('monto_objetivo') - F('monto_ahorrado'), cero),
+            alcanzada=ExpressionWrapper(Q(monto_ahorrado__gte=F('monto_objetivo')), output_field=BooleanField()),
+        )
+
+
+class VencimientoMetasService:
+    """
+    Avisos de metas de ahorro próximas a vencer para todos los usuarios (proceso nocturno).
+
+    Una sola consulta anotada recorre las metas que vencen en los próximos días y no están
+    alcanzadas; las notificaciones se crean por lotes con NotificationService.crear_lote.
+    La clave de idempotencia incluye la fecha: cada meta genera a lo sumo un aviso por día.
+    """
+
+    TIPO_NOTIFICACION = 'meta_por_vencer'
+    DIAS_ANTICIPACION = 7
+    TAMANO_LOTE = 1000
+
+    @staticmethod
+    def metas_por_vencer(hoy, dias=DIAS_ANTICIPACION):
+        """Metas no alcanzadas con fecha_limite en [hoy, hoy + dias], con días restantes y progreso anotados"""
+        metas = MetaAhorro.objects.filter(
+            fecha_limite__gte=hoy,
+            fecha_limite__lte=hoy + timedelta(days=dias),
+            monto_ahorrado__lt=F('monto_objetivo'),
+        )
+        return MetasAhorroService.anotar_progreso(metas).annotate(
+            dias_restantes=ExtractDay(F('fecha_limite') - Value(hoy, output_field=DateField())),
+        ).order_by('id').values(
+            'id', 'nombre', 'fecha_limite', 'id_usuario_id',
+            'dias_restantes', 'progreso_porcentaje', 'monto_faltante',
+        )
+
+    @staticmethod
+    def notificacion(meta, hoy):
+        """Notificacion sin guardar para una fila de metas_por_vencer()"""
+        dias_restantes = meta['dias_restantes']
+        progreso = meta['progreso_porcentaje']
+
+        if dias_restantes <= 1:
+            titulo = "⏰ Meta por vencer hoy"
+            prioridad = 'urgente'
+        elif dias_restantes <= 3:
+            titulo = f"⏰ Meta por vencer en {dias_restantes} días"
+            prioridad = 'alta'
+        else:
+            titulo = f"📅 Meta por vencer en {dias_restantes} días"
+            prioridad = 'media'
+
+        mensaje = f"Tu meta '{meta['nombre']}' vence el {meta['fecha_limite'].strftime('%d/%m/%Y')}. "
+        mensaje += f"Progreso actual: {progreso:.1f}%. "
+        if progreso < 90:
+            mensaje += f"Te faltan ${meta['monto_faltante']:,.2f} para alcanzarla."
+        else:
+            mensaje += "¡Estás muy cerca de lograrla!"
+
+        tipo = VencimientoMetasService.TIPO_NOTIFICACION
+        return Notificacion(
+            usuario_id=meta['id_usuario_id'],
+            titulo=titulo,
+            mensaje=mensaje,
+            categoria="Metas",
+            modulo_origen='gestion_financiera_basica',
+            objeto_relacionado=str(meta['id']),
+            prioridad=prioridad,
+            clave_idempotencia=NotificationService.clave_idempotencia(tipo, 'meta', meta['id'], hoy.isoformat()),
+            datos_adicionales={
+                'meta_id': meta['id'],
+                'meta_nombre': meta['nombre'],
+                'dias_restantes': dias_restantes,
+                'progreso_porcentaje': progreso,
+                'monto_faltante': float(meta['monto_faltante']),
+            },
+        )
+
+    @staticmethod
+    def notificar(hoy=None, dias=DIAS_ANTICIPACION, tamano_lote=TAMANO_LOTE):
+        """
+        Genera los avisos del día para todas las metas por vencer
+
+        Returns:
+            dict: 'metas' recorridas, 'creadas', 'duplicadas' (ya avisadas hoy),
+            'deshabilitadas' (usuario sin el tipo activo) y 'segundos'
+        """
+        hoy = hoy or timezone.localdate()
+        inicio = time.perf_counter()
+        resultado = {'metas': 0, 'creadas': 0, 'duplicadas': 0, 'deshabilitadas': 0}
+
+        lote = []
+        metas = VencimientoMetasService.metas_por_vencer(hoy, dias).iterator(chunk_size=tamano_lote)
+        for meta in metas:
+            lote.append(VencimientoMetasService.notificacion(meta, hoy))
+            if len(lote) >= tamano_lote:
+                VencimientoMetasService._crear_lote(lote, resultado)
+                lote = []
+        VencimientoMetasService._crear_lote(lote, resultado)
+
+        resultado['segundos'] = time.perf_counter() - inicio
+        return resultado
+
+    @staticmethod
+    def _crear_lote(lote, resultado):
+        resultado['metas'] += len(lote)
+        creadas = NotificationService.crear_lote(VencimientoMetasService.TIPO_NOTIFICACION, lote)
+        for clave, cantidad in creadas.items():
+            resultado[clave] += cantidad
+
+
+class BusquedaMovimientos:
+    """
+    Búsqueda de texto en el historial de movimientos (PostgreSQL).
+
+    Movimiento.busqueda es un tsvector generado por la base (nombre con peso A y
+    descripción con peso B, diccionario 'spanish') con índice GIN. Si la extensión
+    pg_trgm está instalada se suma la similitud por trigramas del nombre (índice
+    movimiento_nombre_trgm), que tolera errores de tipeo. El nombre de la cuenta se
+    busca aparte, entre las pocas cuentas del usuario.
+    """
+
+    CONFIG = 'spanish'
+
+    _trigramas = None
+
+    @staticmethod
+    def trigramas_disponibles():
+        """Si pg_trgm está instalada en la base (se consulta una vez por proceso)"""
+        if BusquedaMovimientos._trigramas is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                BusquedaMovimientos._trigramas = cursor.fetchone() is not None
+        return BusquedaMovimientos._trigramas
+
+    @staticmethod
+    def consulta_texto(texto):
+        """tsquery en la que deben aparecer todas las palabras, también como prefijo (mientras se escribe)"""
+        palabras = re.findall(r'\w+', texto)
+        if not palabras:
+            return None
+        return SearchQuery(
+            ' & '.join(f'{palabra}:*' for palabra in palabras),
+            config=BusquedaMovimientos.CONFIG,
+            search_type='raw',
+        )
+
+    @staticmethod
+    def filtrar(movimientos, usuario, texto):
+        """
+        Filtra los movimientos por texto y los anota con 'rango' (mayor es más relevante)
+
+        Args:
+            movimientos: QuerySet de Movimiento ya limitado al usuario
+            usuario: Usuario (o su id), para buscar entre sus cuentas
+            texto: Texto ingresado por el usuario
+        """
+        consulta = BusquedaMovimientos.consulta_texto(texto)
+        if consulta is None:
+            # Sólo signos o símbolos: no hay palabras que indexar, se compara el texto tal cual
+            return movimientos.filter(
+                Q(nombre__icontains=texto) | Q(descripcion__icontains=texto)
+            ).annotate(rango=Value(0.0, output_field=FloatField()))
+
+        cuentas = Cuenta.objects.filter(id_usuario=usuario, nombre__icontains=texto.strip()).values('id')
+        condicion = Q(busqueda=consulta) | Q(id_cuenta__in=cuentas)
+        rango = SearchRank(F('busqueda'), consulta)
+        if BusquedaMovimientos.trigramas_disponibles():
+            condicion |= Q(nombre__trigram_word_similar=texto)
+            rango = rango + TrigramWordSimilarity(texto, 'nombre')
+        return movimientos.filter(condicion).annotate(rango=rango)
+
+
+class PaginacionError(Exception):
+    """Parámetros de paginación no válidos (cursor alterado o de otro orden)"""
+
+
+class PaginacionMovimientos:
+    """
+    Paginación por cursor (keyset) del historial de movimientos.
+
+    Cada página se pide con el último (valor, id) de la anterior en lugar de un
+    OFFSET, así una página profunda cuesta lo mismo que la primera. El id desempata
+    los movimientos con la misma fecha, el mismo monto o la misma relevancia.
+    """
+
+    TAMANO_PAGINA = 25
+    SAL_CURSOR = 'gestion_financiera_basica.movimientos'
+
+    # orden -> (campo, descendente); son los modos de la vista transactions
+    ORDENES = {
+        'newest': ('fecha_movimiento', True),
+        'oldest': ('fecha_movimiento', False),
+        'highest': ('monto', True),
+        'lowest': ('monto', False),
+        # Sólo con texto de búsqueda (BusquedaMovimientos); sin texto equivale a 'newest'
+        'relevance': ('rango', True),
+    }
+    FILTROS = {'income': 'ingreso', 'expenses': 'egreso'}
+
+    @staticmethod
+    def normalizar_orden(orden, busqueda=''):
+        """Orden efectivo: 'newest' si es desconocido o si se pide relevancia sin texto"""
+        if orden not in PaginacionMovimientos.ORDENES or (orden == 'relevance' and not busqueda):
+            return 'newest'
+        return orden
+
+    @staticmethod
+    def consulta(usuario, filtro='all', busqueda='', orden='newest'):
+        """Movimientos del usuario con el filtro, la búsqueda y el orden de la vista"""
+        orden = PaginacionMovimientos.normalizar_orden(orden, busqueda)
+        campo, descendente = PaginacionMovimientos.ORDENES[orden]
+        movimientos = Movimiento.objects.filter(id_usuario=usuario).select_related('id_cuenta').defer('busqueda')
+
+        if filtro in PaginacionMovimientos.FILTROS:
+            movimientos = movimientos.filter(tipo=PaginacionMovimientos.FILTROS[filtro])
+        if busqueda:
+            movimientos = BusquedaMovimientos.filtrar(movimientos, usuario, busqueda)
+
+        prefijo = '-' if descendente else ''
+        return movimientos.order_by(f'{prefijo}{campo}', f'{prefijo}id')
+
+    @staticmethod
+    def pagina(usuario, filtro='all', busqueda='', orden='newest', cursor=None, tamano=None):
+        """
+        Una página del historial
+
+        Args:
+            usuario: Usuario (o su id)
+            filtro: 'all', 'income' o 'expenses'
+            busqueda: Texto a buscar en nombre, descripción o cuenta
+            orden: 'newest', 'oldest', 'highest', 'lowest' o 'relevance' (ver normalizar_orden)
+            cursor: Cursor devuelto con la página anterior; None para la primera
+            tamano: Movimientos por página (TAMANO_PAGINA por defecto)
+
+        Returns:
+            tuple: (lista de movimientos, cursor de la página siguiente o None si no hay más)
+
+        Raises:
+            PaginacionError: Si el cursor no es válido
+        """
+        orden = PaginacionMovimientos.normalizar_orden(orden, busqueda)
+        tamano = tamano or PaginacionMovimientos.TAMANO_PAGINA
+        campo, descendente = PaginacionMovimientos.ORDENES[orden]
+        movimientos = PaginacionMovimientos.consulta(usuario, filtro, busqueda, orden)
+
+        if cursor:
+            valor, ultimo_id = PaginacionMovimientos._leer_cursor(cursor, orden)
+            comparacion = 'lt' if descendente else 'gt'
+            # (campo, id) después del cursor; la condición redundante campo <= / >= valor
+            # es la que PostgreSQL usa como límite del recorrido del índice
+            movimientos = movimientos.filter(
+                Q(**{f'{campo}__{comparacion}e': valor}),
+                Q(**{f'{campo}__{comparacion}': valor}) | Q(**{f'id__{comparacion}': ultimo_id}),
+            )
+
+        # Se pide uno más para saber si hay página siguiente sin contar
+        filas = list(movimientos[:tamano + 1])
+        if len(filas) <= tamano:
+            return filas, None
+        filas = filas[:tamano]
+        return filas, PaginacionMovimientos._crear_cursor(filas[-1], orden)
+
+    @staticmethod
+    def _crear_cursor(movimiento, orden):
+        campo, _ = PaginacionMovimientos.ORDENES[orden]
+        valor = getattr(movimiento, campo)
+        valor = valor.isoformat() if campo == 'fecha_movimiento' else str(valor)
+        return signing.dumps([orden, valor, movimiento.id], salt=PaginacionMovimientos.SAL_CURSOR, compress=True)
+
+    @staticmethod
+    def _leer_cursor(cursor, orden):
+        try:
+            orden_cursor, valor, ultimo_id = signing.loads(cursor, salt=PaginacionMovimientos.SAL_CURSOR)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise PaginacionError('Cursor de paginación no válido')
+        if orden_cursor != orden:
+            raise PaginacionError('El cursor pertenece a otro orden')
+
+        campo, _ = PaginacionMovimientos.ORDENES[orden]
+        try:
+            if campo == 'fecha_movimiento':
+                valor = datetime.fromisoformat(valor)
+            else:
+                valor = float(valor) if campo == 'rango' else Decimal(valor)
+        except (ValueError, ArithmeticError):
+            raise PaginacionError('Cursor de paginación no válido')
+        return valor, int(ultimo_id)
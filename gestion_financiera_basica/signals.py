@@ -1,43 +1,24 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
 from django.db import models
 from decimal import Decimal
 import logging
 
 from .models import MetaAhorro, AporteMetaAhorro, Movimiento
-from cuentas.models import Cuenta, SubCuenta
+from .services import CacheFinancieraUsuario, ResumenMensualService, VencimientoMetasService
+from cuentas.models import Cuenta, SubCuenta, TransferenciaSubCuenta, TransferenciaCuentaPrincipal
+from cuentas.services import SaldoService
 from alertas_notificaciones.services import NotificationService
-from alertas_notificaciones.signal_decorators import prevent_duplicate_signals
 
 logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=AporteMetaAhorro)
-@prevent_duplicate_signals('aporte_meta_ahorro', timeout=60)
 def notificar_nuevo_aporte(sender, instance, created, **kwargs):
     """Notifica cuando se realiza un nuevo aporte a una meta de ahorro"""
     if not created:
         return
         
-    # Verificar duplicados
-    from alertas_notificaciones.models import Notificacion
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    hace_5_min = timezone.now() - timedelta(minutes=5)
-    existe_notificacion = Notificacion.objects.filter(
-        usuario=instance.id_usuario,
-        tipo_notificacion__nombre__in=["aporte_realizado", "progreso_meta", "meta_alcanzada"],
-        datos_adicionales__meta_id=instance.id_meta_ahorro.id,
-        datos_adicionales__aporte_monto=float(instance.monto),
-        fecha_creacion__gte=hace_5_min
-    ).exists()
-    
-    if existe_notificacion:
-        print(f"⚠️ Ya existe notificación para este aporte, saltando...")
-        return
-        
     meta = instance.id_meta_ahorro
     usuario = instance.id_usuario
     
@@ -79,19 +60,20 @@ def notificar_nuevo_aporte(sender, instance, created, **kwargs):
         mensaje=mensaje,
         categoria=categoria,
         prioridad='media' if not meta.meta_alcanzada() else 'alta',
+        objeto_relacionado=str(instance.id),
+        clave_idempotencia=NotificationService.clave_idempotencia('aporte_meta_ahorro', 'aporte', instance.id),
         datos_adicionales={
             'meta_id': meta.id,
             'meta_nombre': meta.nombre,
             'aporte_monto': float(instance.monto),
             'progreso_porcentaje': progreso_anterior,
             'monto_objetivo': float(meta.monto_objetivo),
-            'monto_ahorrado': meta.monto_ahorrado()
+            'monto_ahorrado': float(meta.monto_ahorrado)
         }
     )
 
 
 @receiver(post_save, sender=Movimiento)
-@prevent_duplicate_signals('movimiento_financiero', timeout=60)
 def notificar_movimiento_financiero(sender, instance, created, **kwargs):
     """Notifica cuando se registra un nuevo movimiento financiero"""
     print(f"🔔 SEÑAL EJECUTADA: Movimiento {instance.tipo} - ${instance.monto} para usuario {instance.id_usuario.nombres}")
@@ -104,38 +86,6 @@ def notificar_movimiento_financiero(sender, instance, created, **kwargs):
     usuario = instance.id_usuario
     cuenta = instance.id_cuenta
     
-    # Verificar si ya existe una notificación para este movimiento (evitar duplicados)
-    from alertas_notificaciones.models import Notificacion
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    # Buscar notificaciones duplicadas en los últimos 5 minutos para el mismo movimiento
-    hace_5_min = timezone.now() - timedelta(minutes=5)
-    existe_notificacion = Notificacion.objects.filter(
-        usuario=usuario,
-        tipo_notificacion__nombre="movimiento_financiero",
-        datos_adicionales__movimiento_id=instance.id,
-        fecha_creacion__gte=hace_5_min
-    ).exists()
-    
-    if existe_notificacion:
-        print(f"⚠️ Ya existe notificación para movimiento ID {instance.id}, saltando...")
-        return
-    
-    # Verificar también por monto, fecha y tipo para evitar duplicados por problemas de timing
-    duplicado_por_contenido = Notificacion.objects.filter(
-        usuario=usuario,
-        tipo_notificacion__nombre="movimiento_financiero",
-        datos_adicionales__monto=float(instance.monto),
-        datos_adicionales__movimiento_tipo=instance.tipo,
-        datos_adicionales__cuenta_id=cuenta.id,
-        fecha_creacion__gte=hace_5_min
-    ).exists()
-    
-    if duplicado_por_contenido:
-        print(f"⚠️ Ya existe notificación similar para este tipo de movimiento, saltando...")
-        return
-    
     try:
         if instance.tipo == 'ingreso':
             titulo = f"💵 Nuevo ingreso registrado"
@@ -187,6 +137,8 @@ def notificar_movimiento_financiero(sender, instance, created, **kwargs):
             mensaje=mensaje,
             categoria="Transacciones",
             prioridad=prioridad,
+            objeto_relacionado=str(instance.id),
+            clave_idempotencia=NotificationService.clave_idempotencia('movimiento_financiero', 'movimiento', instance.id),
             datos_adicionales={
                 'movimiento_id': instance.id,
                 'movimiento_tipo': instance.tipo,
@@ -209,6 +161,39 @@ def notificar_movimiento_financiero(sender, instance, created, **kwargs):
         print(f"⚠️ Movimiento actualizado, no se creó notificación")
 
 
+@receiver(post_save, sender=Movimiento)
+def actualizar_resumen_mensual(sender, instance, created, **kwargs):
+    """Mantiene ResumenMensualMovimiento al crear o editar un movimiento"""
+    valores_anteriores = getattr(instance, '_valores_anteriores', None)
+    
+    if created or not valores_anteriores:
+        ResumenMensualService.registrar(instance)
+        return
+    
+    # Edición: recalcular el resumen anterior y, si cambió de grupo, el nuevo
+    anterior = ResumenMensualService.clave(valores_anteriores)
+    actual = ResumenMensualService.clave(instance)
+    ResumenMensualService.recalcular(anterior)
+    if actual != anterior:
+        ResumenMensualService.recalcular(actual)
+
+
+@receiver(post_delete, sender=Movimiento)
+def descontar_movimiento_eliminado(sender, instance, **kwargs):
+    """Revierte el saldo de la cuenta y mantiene ResumenMensualMovimiento al eliminar un movimiento"""
+    # post_delete se emite dentro de la transacción del borrado
+    SaldoService.aplicar(instance.id_cuenta_id, instance.tipo, instance.monto, revertir=True)
+    ResumenMensualService.recalcular(ResumenMensualService.clave(instance))
+
+
+@receiver(post_delete, sender=AporteMetaAhorro)
+def descontar_aporte_eliminado(sender, instance, **kwargs):
+    """Resta el aporte de MetaAhorro.monto_ahorrado (post_delete corre dentro de la transacción del borrado)"""
+    MetaAhorro.objects.filter(pk=instance.id_meta_ahorro_id).update(
+        monto_ahorrado=models.F('monto_ahorrado') - instance.monto
+    )
+
+
 @receiver(post_save, sender=Cuenta)
 def notificar_cambio_saldo_cuenta(sender, instance, created, **kwargs):
     """Notifica sobre cambios importantes en el saldo de una cuenta"""
@@ -257,29 +242,11 @@ def notificar_cambio_saldo_cuenta(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=MetaAhorro)
-@prevent_duplicate_signals('nueva_meta_ahorro', timeout=60)
 def notificar_nueva_meta_ahorro(sender, instance, created, **kwargs):
     """Notifica cuando se crea una nueva meta de ahorro"""
     if not created:
         return
         
-    # Verificar duplicados
-    from alertas_notificaciones.models import Notificacion
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    hace_5_min = timezone.now() - timedelta(minutes=5)
-    existe_notificacion = Notificacion.objects.filter(
-        usuario=instance.id_usuario,
-        tipo_notificacion__nombre="nueva_meta",
-        datos_adicionales__meta_id=instance.id,
-        fecha_creacion__gte=hace_5_min
-    ).exists()
-    
-    if existe_notificacion:
-        print(f"⚠️ Ya existe notificación para esta nueva meta, saltando...")
-        return
-        
     usuario = instance.id_usuario
     
     titulo = f"🎯 Nueva meta de ahorro creada"
@@ -293,6 +260,8 @@ def notificar_nueva_meta_ahorro(sender, instance, created, **kwargs):
         mensaje=mensaje,
         categoria="Metas",
         prioridad='media',
+        objeto_relacionado=str(instance.id),
+        clave_idempotencia=NotificationService.clave_idempotencia('nueva_meta', 'meta', instance.id),
         datos_adicionales={
             'meta_id': instance.id,
             'meta_nombre': instance.nombre,
@@ -303,64 +272,36 @@ def notificar_nueva_meta_ahorro(sender, instance, created, **kwargs):
     )
 
 
+@receiver(post_save, sender=Movimiento)
+@receiver(post_delete, sender=Movimiento)
+@receiver(post_save, sender=Cuenta)
+@receiver(post_delete, sender=Cuenta)
+@receiver(post_save, sender=MetaAhorro)
+@receiver(post_delete, sender=MetaAhorro)
+@receiver(post_save, sender=AporteMetaAhorro)
+@receiver(post_delete, sender=AporteMetaAhorro)
+@receiver(post_save, sender=TransferenciaSubCuenta)
+@receiver(post_delete, sender=TransferenciaSubCuenta)
+@receiver(post_save, sender=TransferenciaCuentaPrincipal)
+@receiver(post_delete, sender=TransferenciaCuentaPrincipal)
+def invalidar_cache_financiera(sender, instance, **kwargs):
+    """Los agregados en caché del usuario dejan de valer en cuanto se confirma el cambio"""
+    CacheFinancieraUsuario.invalidar_al_confirmar(instance.id_usuario_id)
+
+
+@receiver(post_save, sender=SubCuenta)
+@receiver(post_delete, sender=SubCuenta)
+def invalidar_cache_financiera_subcuenta(sender, instance, **kwargs):
+    """Las subcuentas vinculadas pertenecen al dueño de su cuenta principal"""
+    usuario_id = instance.propietario_id
+    if usuario_id is None and instance.id_cuenta_id:
+        usuario_id = Cuenta.objects.filter(pk=instance.id_cuenta_id).values_list('id_usuario', flat=True).first()
+    CacheFinancieraUsuario.invalidar_al_confirmar(usuario_id)
+
+
 def verificar_metas_vencidas():
     """
-    Función auxiliar para verificar metas que están próximas a vencer
-    Esta función debería ser llamada por un cron job o tarea programada
+    Avisa de las metas que vencen en los próximos 7 días.
+    Se ejecuta con `manage.py verificar_metas_vencidas` (cron o --programar)
     """
-    from datetime import datetime, timedelta
-    
-    # Buscar metas que vencen en los próximos 7 días
-    fecha_limite = timezone.now().date() + timedelta(days=7)
-    metas_por_vencer = MetaAhorro.objects.filter(
-        fecha_limite__lte=fecha_limite,
-        fecha_limite__gte=timezone.now().date()
-    ).exclude(
-        # Excluir metas ya alcanzadas
-        id__in=MetaAhorro.objects.filter(
-            aportes__isnull=False
-        ).annotate(
-            total_ahorrado=models.Sum('aportes__monto')
-        ).filter(
-            total_ahorrado__gte=models.F('monto_objetivo')
-        )
-    )
-    
-    for meta in metas_por_vencer:
-        dias_restantes = (meta.fecha_limite - timezone.now().date()).days
-        progreso = meta.porcentaje_progreso()
-        
-        if dias_restantes <= 1:
-            titulo = f"⏰ Meta por vencer hoy"
-            prioridad = 'urgente'
-        elif dias_restantes <= 3:
-            titulo = f"⏰ Meta por vencer en {dias_restantes} días"
-            prioridad = 'alta'
-        else:
-            titulo = f"📅 Meta por vencer en {dias_restantes} días"
-            prioridad = 'media'
-        
-        mensaje = f"Tu meta '{meta.nombre}' vence el {meta.fecha_limite.strftime('%d/%m/%Y')}. "
-        mensaje += f"Progreso actual: {progreso:.1f}%. "
-        
-        if progreso < 90:
-            falta = meta.falta_por_ahorrar()
-            mensaje += f"Te faltan ${falta:,.2f} para alcanzarla."
-        else:
-            mensaje += "¡Estás muy cerca de lograrla!"
-        
-        NotificationService.crear_notificacion(
-            usuario=meta.id_usuario,
-            tipo_notificacion="meta_por_vencer",
-            titulo=titulo,
-            mensaje=mensaje,
-            categoria="Metas",
-            prioridad=prioridad,
-            datos_adicionales={
-                'meta_id': meta.id,
-                'meta_nombre': meta.nombre,
-                'dias_restantes': dias_restantes,
-                'progreso_porcentaje': progreso,
-                'monto_faltante': meta.falta_por_ahorrar()
-            }
-        )
+    return VencimientoMetasService.notificar()
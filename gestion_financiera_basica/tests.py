@@ -1,3 +1,265 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+import tempfile
 
-# Create your tests here.
+from django.core import signing
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from cuentas.models import Cuenta, Moneda
+from usuarios.models import Usuario
+from .models import AporteMetaAhorro, MetaAhorro, Movimiento
+from .services import (
+    CacheFinancieraUsuario, MetasAhorroService, PaginacionError, PaginacionMovimientos, ResumenFinancieroService,
+)
+
+
+def crear_usuario(correo):
+    moneda, _ = Moneda.objects.get_or_create(codigo='PEN', defaults={'nombre': 'Sol', 'simbolo': 'S/'})
+    return Usuario.objects.create_user(
+        correo, 'clave-segura', nombres='Ana', apellido_paterno='Pérez', apellido_materno='Díaz',
+        documento_identidad='12345678', telefono=999999999, id_moneda=moneda,
+    )
+
+
+def crear_cuenta(usuario, saldo=0):
+    return Cuenta.objects.create(nombre='Principal', descripcion='Cuenta principal', saldo_cuenta=saldo, id_usuario=usuario)
+
+
+def crear_movimiento(cuenta, monto, tipo='egreso', fecha=None, nombre='Movimiento'):
+    return Movimiento.objects.create(
+        tipo=tipo, nombre=nombre, monto=monto, id_cuenta=cuenta, id_usuario=cuenta.id_usuario,
+        fecha_movimiento=fecha or timezone.now(),
+    )
+
+
+class PaginacionMovimientosTests(TestCase):
+    """Paginación por cursor del historial (user-017)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('paginacion@example.com')
+        cuenta = crear_cuenta(cls.usuario)
+        ahora = timezone.now()
+        # Fechas y montos repetidos: el id tiene que desempatar entre páginas
+        cls.movimientos = [
+            crear_movimiento(cuenta, Decimal(10 + i % 3), fecha=ahora - timedelta(days=i // 2))
+            for i in range(11)
+        ]
+        otro = crear_usuario('otro@example.com')
+        crear_movimiento(crear_cuenta(otro), Decimal('99'))
+
+    def recorrer(self, orden):
+        ids, cursor = [], None
+        while True:
+            filas, cursor = PaginacionMovimientos.pagina(self.usuario, orden=orden, cursor=cursor, tamano=4)
+            ids.extend(m.id for m in filas)
+            if cursor is None:
+                return ids
+
+    def test_las_paginas_cubren_todo_sin_repetir_en_cada_orden(self):
+        for orden in ('newest', 'oldest', 'highest', 'lowest'):
+            with self.subTest(orden=orden):
+                esperado = list(PaginacionMovimientos.consulta(self.usuario, orden=orden).values_list('id', flat=True))
+                self.assertEqual(self.recorrer(orden), esperado)
+                self.assertEqual(len(esperado), len(self.movimientos))
+
+    def test_ultima_pagina_sin_cursor(self):
+        filas, cursor = PaginacionMovimientos.pagina(self.usuario, tamano=len(self.movimientos))
+        self.assertEqual(len(filas), len(self.movimientos))
+        self.assertIsNone(cursor)
+
+    def test_cursor_alterado(self):
+        _, cursor = PaginacionMovimientos.pagina(self.usuario, tamano=4)
+        with self.assertRaises(PaginacionError):
+            PaginacionMovimientos.pagina(self.usuario, cursor=cursor[:-2] + 'xx')
+
+    def test_cursor_firmado_con_otra_sal(self):
+        falso = signing.dumps(['newest', timezone.now().isoformat(), 1], compress=True)
+        with self.assertRaises(PaginacionError):
+            PaginacionMovimientos.pagina(self.usuario, cursor=falso)
+
+    def test_cursor_de_otro_orden(self):
+        _, cursor = PaginacionMovimientos.pagina(self.usuario, orden='newest', tamano=4)
+        with self.assertRaises(PaginacionError):
+            PaginacionMovimientos.pagina(self.usuario, orden='highest', cursor=cursor)
+
+    def test_cursor_con_valor_invalido(self):
+        cursor = signing.dumps(['highest', 'no-es-un-monto', 1], salt=PaginacionMovimientos.SAL_CURSOR, compress=True)
+        with self.assertRaises(PaginacionError):
+            PaginacionMovimientos.pagina(self.usuario, orden='highest', cursor=cursor)
+
+
+class IndicesMovimientoTests(TestCase):
+    """Las consultas frecuentes filtran por Movimiento.id_usuario y usan sus índices (user-016)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('indices@example.com')
+        crear_movimiento(crear_cuenta(cls.usuario), Decimal('10'))
+
+    def assertSinSeqScan(self, queryset):
+        # Con tablas de prueba tan chicas el planificador prefiere recorrerlas enteras
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertNotIn(f'Seq Scan on {Movimiento._meta.db_table}', plan)
+
+    def test_pagina_del_historial(self):
+        for orden in ('newest', 'highest'):
+            with self.subTest(orden=orden):
+                self.assertSinSeqScan(PaginacionMovimientos.consulta(self.usuario, orden=orden)[:26])
+
+    def test_totales_por_tipo_y_periodo(self):
+        self.assertSinSeqScan(
+            Movimiento.objects.filter(
+                id_usuario=self.usuario,
+                tipo='egreso',
+                fecha_movimiento__gte=timezone.now() - timedelta(days=30),
+            ).values('tipo').annotate(total=Sum('monto'))
+        )
+
+
+class CacheFinancieraUsuarioTests(TestCase):
+    """Caché de agregados direccionada por la versión de datos del usuario (user-020)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('cache@example.com')
+        cls.cuenta = crear_cuenta(cls.usuario, 100)
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        compartida = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directorio.name,
+        }})
+        compartida.enable()
+        self.addCleanup(compartida.disable)
+        self.calculos = 0
+
+    def calcular(self):
+        self.calculos += 1
+        return ResumenFinancieroService.obtener(self.usuario)['egresos']['total']
+
+    def obtener(self):
+        return CacheFinancieraUsuario.obtener(self.usuario, 'prueba', self.calcular)
+
+    def test_reutiliza_el_valor_hasta_que_cambian_los_datos(self):
+        self.assertEqual(self.obtener(), Decimal('0'))
+        self.assertEqual(self.obtener(), Decimal('0'))
+        self.assertEqual(self.calculos, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_movimiento(self.cuenta, Decimal('25'))
+        self.assertEqual(self.obtener(), Decimal('25'))
+        self.assertEqual(self.calculos, 2)
+
+    def test_invalida_recien_al_confirmar(self):
+        self.obtener()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            crear_movimiento(self.cuenta, Decimal('25'))
+            # Antes del commit la versión no cambia: nadie guarda datos sin confirmar como nuevos
+            self.obtener()
+            self.assertEqual(self.calculos, 1)
+        self.assertTrue(callbacks)
+
+    def test_las_partes_separan_entradas(self):
+        CacheFinancieraUsuario.obtener(self.usuario, 'prueba', self.calcular, '2026-01-01')
+        CacheFinancieraUsuario.obtener(self.usuario, 'prueba', self.calcular, '2026-01-02')
+        self.assertEqual(self.calculos, 2)
+
+    def test_sin_cache_compartida_siempre_calcula(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertIsNone(CacheFinancieraUsuario.version(self.usuario.pk))
+            self.obtener()
+            self.obtener()
+        self.assertEqual(self.calculos, 2)
+
+
+class ResumenSemanaTests(TestCase):
+    """Los totales de los últimos 7 días se calculan en cada request (user-020)"""
+
+    def test_solo_cuenta_los_ultimos_siete_dias(self):
+        usuario = crear_usuario('semana@example.com')
+        cuenta = crear_cuenta(usuario)
+        ahora = timezone.now()
+        crear_movimiento(cuenta, Decimal('50'), tipo='ingreso', fecha=ahora - timedelta(days=2))
+        crear_movimiento(cuenta, Decimal('20'), fecha=ahora - timedelta(days=1))
+        crear_movimiento(cuenta, Decimal('30'), fecha=ahora - timedelta(days=9))
+
+        self.assertEqual(ResumenFinancieroService.semana(usuario, ahora), {'ingresos': Decimal('50'), 'egresos': Decimal('20')})
+        self.assertEqual(
+            ResumenFinancieroService.semana(usuario, ahora + timedelta(days=6)),
+            {'ingresos': Decimal('0'), 'egresos': Decimal('20')},
+        )
+
+
+class MontoAhorradoTests(TestCase):
+    """MetaAhorro.monto_ahorrado se mantiene con incrementos F() desde los aportes (user-022)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('metas@example.com')
+        cls.cuenta = crear_cuenta(cls.usuario, 1000)
+
+    def crear_meta(self, objetivo=Decimal('50'), nombre='Viaje'):
+        hoy = timezone.localdate()
+        return MetaAhorro.objects.create(
+            nombre=nombre, descripcion='Meta de prueba', monto_objetivo=objetivo,
+            fecha_inicio=hoy, fecha_limite=hoy + timedelta(days=90),
+            id_usuario=self.usuario, id_cuenta=self.cuenta,
+        )
+
+    def aportar(self, meta, monto):
+        return AporteMetaAhorro.objects.create(id_meta_ahorro=meta, monto=monto, id_usuario=self.usuario)
+
+    def monto_ahorrado(self, meta):
+        return MetaAhorro.objects.values_list('monto_ahorrado', flat=True).get(pk=meta.pk)
+
+    def test_los_aportes_suman(self):
+        meta = self.crear_meta()
+        self.aportar(meta, Decimal('15.50'))
+        self.aportar(meta, Decimal('4.50'))
+        self.assertEqual(self.monto_ahorrado(meta), Decimal('20.00'))
+
+    def test_editar_un_aporte_ajusta_la_diferencia(self):
+        meta = self.crear_meta()
+        aporte = self.aportar(meta, Decimal('10'))
+        aporte.monto = Decimal('35')
+        aporte.save()
+        self.assertEqual(self.monto_ahorrado(meta), Decimal('35'))
+
+    def test_mover_un_aporte_a_otra_meta(self):
+        origen, destino = self.crear_meta(), self.crear_meta(nombre='Auto')
+        aporte = self.aportar(origen, Decimal('10'))
+        aporte.id_meta_ahorro = destino
+        aporte.save()
+        self.assertEqual(self.monto_ahorrado(origen), Decimal('0'))
+        self.assertEqual(self.monto_ahorrado(destino), Decimal('10'))
+
+    def test_borrar_resta_el_aporte(self):
+        meta = self.crear_meta()
+        aporte = self.aportar(meta, Decimal('10'))
+        self.aportar(meta, Decimal('7'))
+        aporte.delete()
+        self.assertEqual(self.monto_ahorrado(meta), Decimal('7'))
+        # El borrado por QuerySet también pasa por post_delete
+        AporteMetaAhorro.objects.filter(id_meta_ahorro=meta).delete()
+        self.assertEqual(self.monto_ahorrado(meta), Decimal('0'))
+
+    def test_anotar_progreso(self):
+        parcial, superada = self.crear_meta(), self.crear_meta(nombre='Auto')
+        self.aportar(parcial, Decimal('40'))
+        self.aportar(superada, Decimal('80'))
+        metas = {m.pk: m for m in MetasAhorroService.anotar_progreso(MetaAhorro.objects.filter(id_usuario=self.usuario))}
+
+        self.assertAlmostEqual(metas[parcial.pk].progreso_porcentaje, 80.0)
+        self.assertEqual(metas[parcial.pk].monto_faltante, Decimal('10'))
+        self.assertFalse(metas[parcial.pk].alcanzada)
+        self.assertAlmostEqual(metas[superada.pk].progreso_porcentaje, 100.0)
+        self.assertEqual(metas[superada.pk].monto_faltante, Decimal('0'))
+        self.assertTrue(metas[superada.pk].alcanzada)
@@ -7,6 +7,7 @@ app_name = 'gestion_financiera_basica'
 
 urlpatterns = [
     path("transactions/", views.transactions, name="transactions"),
+    path("transactions/pagina/", views.transactions_pagina, name="transactions_pagina"),
     path("savings-goals/", views.savings_goals, name="savings_goals"),
     path('movimientos/agregar/', views.agregar_movimiento, name='agregar_movimiento'),
     path('metas/agregar/', views.agregar_meta_ahorro, name='agregar_meta_ahorro'),
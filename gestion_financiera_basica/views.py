@@ -2,9 +2,16 @@ from django.shortcuts import render, redirect, get_object_or_404
 from .forms import MovimientoForm, MetaAhorroForm, AporteMetaAhorroForm
 from cuentas.models import Cuenta
 from django.shortcuts import render
-from django.db.models import Sum, Q
+from django.db.models import Count, Sum, Q
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from urllib.parse import urlencode
 from cuentas.models import Cuenta
 from .models import Movimiento, MetaAhorro, AporteMetaAhorro
+from .services import (
+    CacheFinancieraUsuario, MetasAhorroService, PaginacionError, PaginacionMovimientos, ResumenFinancieroService,
+)
+from cuentas.services import SaldoService
 from django.contrib.auth.decorators import login_required
 from core.decorators import fast_access_pin_verified
 from alertas_notificaciones.services import NotificationService
@@ -138,7 +145,10 @@ def generar_consejos_dinamicos(goals, promedio_progreso, metas_completadas):
 @fast_access_pin_verified
 def savings_goals(request):
     # Obtener metas de ahorro reales del usuario
-    user_goals = MetaAhorro.objects.filter(id_usuario=request.user).order_by('-fecha_inicio')
+    # Progreso anotado en SQL desde el total almacenado: una sola consulta para todas las metas
+    user_goals = MetasAhorroService.anotar_progreso(
+        MetaAhorro.objects.filter(id_usuario=request.user)
+    ).order_by('-fecha_inicio')
     
     goals = []
     total_objetivo = 0
@@ -146,14 +156,13 @@ def savings_goals(request):
     metas_completadas = 0
     
     for meta in user_goals:
-        # Usar los métodos del modelo para calcular el progreso
-        monto_ahorrado = float(meta.monto_ahorrado())
+        monto_ahorrado = float(meta.monto_ahorrado)
         objetivo = float(meta.monto_objetivo)
-        porcentaje = meta.porcentaje_progreso()
+        porcentaje = meta.progreso_porcentaje
         
         total_objetivo += objetivo
         total_ahorrado += monto_ahorrado
-        if meta.meta_alcanzada():
+        if meta.alcanzada:
             metas_completadas += 1
         
         goals.append({
@@ -164,8 +173,8 @@ def savings_goals(request):
             'porcentaje_num': porcentaje,
             'fecha_limite': meta.fecha_limite.strftime("%B %d, %Y"),
             'descripcion': meta.descripcion,
-            'meta_alcanzada': meta.meta_alcanzada(),
-            'falta_por_ahorrar': float(meta.falta_por_ahorrar()),
+            'meta_alcanzada': meta.alcanzada,
+            'falta_por_ahorrar': float(meta.monto_faltante),
             'objetivo': objetivo,
             'monto_ahorrado': monto_ahorrado
         })
@@ -210,88 +219,60 @@ def transactions(request):
     user_id = request.user.id
     filter_type = request.GET.get("filter", "all")
     search_query = request.GET.get("search", "").strip()
-    sort_by = request.GET.get("sort", "newest")
-
-    # Obtener transacciones reales de la base de datos
-    transacciones = Movimiento.objects.filter(id_cuenta__id_usuario=user_id)
+    # Con texto de búsqueda, por defecto los resultados más relevantes primero
+    sort_by = request.GET.get("sort") or ("relevance" if search_query else "newest")
 
     # Calcular métricas del mes actual
     now = timezone.now()
     primer_dia_mes = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     ultimo_dia_mes = primer_dia_mes.replace(day=monthrange(now.year, now.month)[1], hour=23, minute=59, second=59)
     
-    # Transacciones del mes actual
-    transacciones_mes = Movimiento.objects.filter(
-        id_cuenta__id_usuario=user_id,
-        fecha_movimiento__range=[primer_dia_mes, ultimo_dia_mes]
+    def calcular_metricas():
+        # Métricas del mes e históricas en una sola consulta
+        resumen = ResumenFinancieroService.obtener(user_id, now)
+        # Categorías más frecuentes este mes
+        categorias = list(Movimiento.objects.filter(
+            id_usuario=user_id,
+            fecha_movimiento__range=[primer_dia_mes, ultimo_dia_mes]
+        ).values('nombre').annotate(
+            cantidad=Count('nombre'),
+            total_monto=Sum('monto')
+        ).order_by('-cantidad')[:5])
+        return resumen, categorias
+
+    # En caché hasta el próximo cambio de datos del usuario (o hasta el día siguiente)
+    resumen, categorias_frecuentes = CacheFinancieraUsuario.obtener(
+        user_id, 'transacciones', calcular_metricas, timezone.localdate(now)
     )
-    
-    # Métricas del mes
-    ingresos_mes = transacciones_mes.filter(tipo="ingreso").aggregate(total=Sum('monto'))['total'] or 0
-    gastos_mes = transacciones_mes.filter(tipo="egreso").aggregate(total=Sum('monto'))['total'] or 0
+    ingresos_mes = resumen['ingresos']['mes']
+    gastos_mes = resumen['egresos']['mes']
     balance_mes = ingresos_mes - gastos_mes
-    total_transacciones = transacciones_mes.count()
-    
-    # Métricas de la semana actual (últimos 7 días)
-    hace_7_dias = now - timedelta(days=7)
-    transacciones_semana = Movimiento.objects.filter(
-        id_cuenta__id_usuario=user_id,
-        fecha_movimiento__gte=hace_7_dias
-    )
-    ingresos_semana = transacciones_semana.filter(tipo="ingreso").aggregate(total=Sum('monto'))['total'] or 0
-    gastos_semana = transacciones_semana.filter(tipo="egreso").aggregate(total=Sum('monto'))['total'] or 0
-    
-    # Métricas generales (histórico)
-    ingresos_total = Movimiento.objects.filter(
-        id_cuenta__id_usuario=user_id, 
-        tipo="ingreso"
-    ).aggregate(total=Sum('monto'))['total'] or 0
-    
-    gastos_total = Movimiento.objects.filter(
-        id_cuenta__id_usuario=user_id, 
-        tipo="egreso"
-    ).aggregate(total=Sum('monto'))['total'] or 0
+    total_transacciones = resumen['ingresos']['cantidad_mes'] + resumen['egresos']['cantidad_mes']
+    # Últimos 7 días: dependen de la hora, se calculan en cada request
+    semana = ResumenFinancieroService.semana(user_id, now)
+    ingresos_semana = semana['ingresos']
+    gastos_semana = semana['egresos']
+    ingresos_total = resumen['ingresos']['total']
+    gastos_total = resumen['egresos']['total']
     
     # Transacciones más recientes (últimas 5)
     transacciones_recientes = Movimiento.objects.filter(
-        id_cuenta__id_usuario=user_id
+        id_usuario=user_id
     ).order_by('-fecha_movimiento')[:5]
     
-    # Categorías más frecuentes este mes
-    from django.db.models import Count
-    categorias_frecuentes = transacciones_mes.values('nombre').annotate(
-        cantidad=Count('nombre'),
-        total_monto=Sum('monto')
-    ).order_by('-cantidad')[:5]
-
-    # Aplicar filtros a la lista principal
-    if filter_type == "income":
-        transacciones = transacciones.filter(tipo="ingreso")
-    elif filter_type == "expenses":
-        transacciones = transacciones.filter(tipo="egreso")
-
-    # Aplicar búsqueda
-    if search_query:
-        transacciones = transacciones.filter(
-            Q(nombre__icontains=search_query) |
-            Q(descripcion__icontains=search_query) |
-            Q(id_cuenta__nombre__icontains=search_query)
+    # Sólo se renderiza una página (la primera o la de ?cursor=, sin JavaScript);
+    # las siguientes las pide el scroll infinito a transactions_pagina
+    try:
+        transacciones, siguiente_cursor = PaginacionMovimientos.pagina(
+            user_id, filter_type, search_query, sort_by, request.GET.get("cursor")
         )
-
-    # Aplicar ordenación
-    if sort_by == "newest":
-        transacciones = transacciones.order_by('-fecha_movimiento')
-    elif sort_by == "oldest":
-        transacciones = transacciones.order_by('fecha_movimiento')
-    elif sort_by == "highest":
-        transacciones = transacciones.order_by('-monto')
-    elif sort_by == "lowest":
-        transacciones = transacciones.order_by('monto')
-    else:
-        transacciones = transacciones.order_by('-fecha_movimiento')
+    except PaginacionError:
+        transacciones, siguiente_cursor = PaginacionMovimientos.pagina(user_id, filter_type, search_query, sort_by)
 
     return render(request, "gestion_financiera_basica/transactions.html", {
         "transactions": transacciones,
+        "siguiente_cursor": siguiente_cursor,
+        "parametros_pagina": urlencode({"filter": filter_type, "search": search_query, "sort": sort_by}),
         "filter_type": filter_type,
         "search_query": search_query,
         "sort_by": sort_by,
@@ -309,6 +290,43 @@ def transactions(request):
         "categorias_frecuentes": categorias_frecuentes,
         "nombre_mes": get_nombre_mes_espanol(now),
     })
+
+@login_required
+@fast_access_pin_verified
+def transactions_pagina(request):
+    """Página siguiente del historial en JSON para el scroll infinito de transactions"""
+    try:
+        transacciones, siguiente_cursor = PaginacionMovimientos.pagina(
+            request.user.id,
+            request.GET.get("filter", "all"),
+            request.GET.get("search", "").strip(),
+            request.GET.get("sort") or ("relevance" if request.GET.get("search", "").strip() else "newest"),
+            request.GET.get("cursor"),
+        )
+    except PaginacionError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return JsonResponse({
+        "success": True,
+        "html": render_to_string(
+            "gestion_financiera_basica/transacciones_filas.html",
+            {"transactions": transacciones},
+            request=request,
+        ),
+        "movimientos": [
+            {
+                "id": movimiento.id,
+                "nombre": movimiento.nombre,
+                "tipo": movimiento.tipo,
+                "categoria": movimiento.categoria,
+                "fecha_movimiento": movimiento.fecha_movimiento.isoformat(),
+                "cuenta": movimiento.id_cuenta.nombre,
+                "monto": str(movimiento.monto),
+            }
+            for movimiento in transacciones
+        ],
+        "siguiente_cursor": siguiente_cursor,
+    })
     
 @login_required
 @fast_access_pin_verified
@@ -339,24 +357,18 @@ def agregar_movimiento(request):
             # Los movimientos se registran independientemente para calcular el balance total
             
             # Verificación opcional: alertar si el balance resultante sería negativo
-            from django.db.models import Sum
-            total_ingresos = Movimiento.objects.filter(
-                id_cuenta=cuenta, tipo="ingreso"
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            total_egresos = Movimiento.objects.filter(
-                id_cuenta=cuenta, tipo="egreso"
-            ).aggregate(total=Sum('monto'))['total'] or 0
+            # (saldo_actual ya incluye saldo inicial + ingresos - egresos)
+            balance_actual = float(cuenta.saldo_actual)
             
             # Simular el nuevo balance después de este movimiento
             if tipo == 'egreso':
-                nuevo_balance = float(cuenta.saldo_cuenta) + float(total_ingresos) - (float(total_egresos) + float(monto))
+                nuevo_balance = balance_actual - float(monto)
             else:
-                nuevo_balance = float(cuenta.saldo_cuenta) + (float(total_ingresos) + float(monto)) - float(total_egresos)
+                nuevo_balance = balance_actual + float(monto)
             
             # Advertir si el balance sería negativo (opcional, no bloquear)
             if nuevo_balance < 0 and tipo == 'egreso':
-                form.add_error('monto', f'Advertencia: Este gasto resultaría en un balance negativo (${nuevo_balance:.2f}). Balance actual: ${float(cuenta.saldo_cuenta) + float(total_ingresos) - float(total_egresos):.2f}')
+                form.add_error('monto', f'Advertencia: Este gasto resultaría en un balance negativo (${nuevo_balance:.2f}). Balance actual: ${balance_actual:.2f}')
                 return render(request, 'gestion_financiera_basica/add_transaction.html', {'form': form})
 
             # Ahora guardar el movimiento
@@ -424,23 +436,7 @@ def aportar_meta_ahorro(request, meta_id):
         
         if form.is_valid():
             # Verificar que el usuario tenga suficiente balance
-            from django.db.models import Sum
-            user_id = request.user.id
-            
-            # Calcular balance total actual
-            total_ingresos = Movimiento.objects.filter(
-                id_cuenta__id_usuario=user_id, tipo="ingreso"
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            total_egresos = Movimiento.objects.filter(
-                id_cuenta__id_usuario=user_id, tipo="egreso"
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            saldo_inicial_cuentas = Cuenta.objects.filter(
-                id_usuario=user_id
-            ).aggregate(total=Sum('saldo_cuenta'))['total'] or 0
-            
-            balance_actual = float(saldo_inicial_cuentas) + float(total_ingresos) - float(total_egresos)
+            balance_actual = float(SaldoService.saldo_usuario(request.user))
             monto_aporte = float(form.cleaned_data['monto'])
             
             # Verificar si hay suficiente balance
@@ -1,5 +1,6 @@
 from django.contrib.auth.backends import BaseBackend
 from usuarios.models import Usuario
+from usuarios.services import UsuarioCacheService
 from django.contrib.auth.hashers import check_password
 
 class EmailBackend(BaseBackend):
@@ -14,8 +15,10 @@ class EmailBackend(BaseBackend):
         return None
 
     def get_user(self, user_id):
+        # Instantánea en caché con la moneda ya cargada (select_related) y
+        # las columnas poco usadas diferidas
         try:
-            return Usuario.objects.get(pk=user_id)
+            return UsuarioCacheService.obtener(user_id)
         except Usuario.DoesNotExist:
             return None
 
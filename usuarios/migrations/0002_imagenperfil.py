@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+import base64
+import binascii
+import hashlib
+from io import BytesIO
+
+
+# Copia congelada de ImagenPerfil.VARIANTES y de ImagenPerfilService.generar_variantes al
+# momento de esta migración: cambios posteriores en el servicio no deben alterarla
+VARIANTES = {
+    'original': 1024,
+    'mediana': 256,
+    'pequena': 160,
+}
+TAMANO_MAXIMO = 10 * 1024 * 1024
+
+
+def generar_variantes(datos):
+    """Variantes de la imagen (dict variante -> bytes) y su formato, o None si no es una imagen válida"""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    if len(datos) > TAMANO_MAXIMO:
+        return None
+    try:
+        imagen = Image.open(BytesIO(datos))
+        imagen.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+        formato = 'PNG'
+    else:
+        imagen = imagen.convert('RGB')
+        formato = 'JPEG'
+
+    variantes = {}
+    for variante, lado in VARIANTES.items():
+        copia = imagen.copy()
+        copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+        salida = BytesIO()
+        if formato == 'JPEG':
+            copia.save(salida, formato, quality=85, optimize=True)
+        else:
+            copia.save(salida, formato, optimize=True)
+        variantes[variante] = salida.getvalue()
+    return variantes, formato
+
+
+def mover_imagenes(apps, schema_editor):
+    """Copia las fotos de Usuario.imagen_perfil a ImagenPerfil generando sus miniaturas"""
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    ImagenPerfil = apps.get_model('usuarios', 'ImagenPerfil')
+
+    for usuario_id, datos in Usuario.objects.filter(
+        imagen_perfil__isnull=False
+    ).values_list('id', 'imagen_perfil').iterator(chunk_size=100):
+        datos = bytes(datos)
+        # El registro antiguo guardaba la imagen codificada en base64
+        candidatos = [datos]
+        try:
+            candidatos.append(base64.b64decode(datos, validate=True))
+        except (binascii.Error, ValueError):
+            pass
+
+        for candidato in candidatos:
+            resultado = generar_variantes(candidato)
+            if resultado is None:
+                continue
+            variantes, formato = resultado
+            ImagenPerfil.objects.create(
+                usuario_id=usuario_id,
+                formato=formato,
+                hash=hashlib.sha256(variantes['original']).hexdigest(),
+                **variantes,
+            )
+            break
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagenPerfil',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='imagen', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('original', models.BinaryField()),
+                ('mediana', models.BinaryField()),
+                ('pequena', models.BinaryField()),
+                ('formato', models.CharField(help_text='Formato de las variantes (JPEG o PNG)', max_length=10)),
+                ('hash', models.CharField(help_text='SHA-256 de la imagen original, usado como ETag', max_length=64)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(mover_imagenes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='usuario',
+            name='imagen_perfil',
+        ),
+    ]
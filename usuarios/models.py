@@ -27,7 +27,6 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     correo = models.EmailField(unique=True, max_length=100)
     telefono = models.BigIntegerField()
     pais = models.CharField(max_length=100, default="Peru", blank=True)
-    imagen_perfil = models.BinaryField(null=True, blank=True)
     pin_acceso_rapido = models.CharField(max_length=6, default='000000')  # PIN de 6 dígitos exactos
     email_verificado = models.BooleanField(default=False)
     onboarding_completed = models.BooleanField(default=False)  # Nuevo campo para tracking de onboarding
@@ -50,3 +49,31 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.nombres} {self.apellido_paterno}"
 
+
+
+class ImagenPerfil(models.Model):
+    """
+    Foto de perfil de un usuario y sus miniaturas, fuera de la tabla de usuarios
+    para que cargar request.user no arrastre los bytes de la imagen.
+    """
+    # Lado máximo (px) de cada variante; se generan una sola vez al subir la imagen
+    VARIANTES = {
+        'original': 1024,
+        'mediana': 256,
+        'pequena': 160,
+    }
+
+    usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True, related_name='imagen')
+    original = models.BinaryField()
+    mediana = models.BinaryField()
+    pequena = models.BinaryField()
+    formato = models.CharField(max_length=10, help_text="Formato de las variantes (JPEG o PNG)")
+    hash = models.CharField(max_length=64, help_text="SHA-256 de la imagen original, usado como ETag")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Imagen de perfil de {self.usuario_id}"
+
+    @property
+    def content_type(self):
+        return f"image/{self.formato.lower()}"
@@ -0,0 +1,178 @@
+from io import BytesIO
+from django.core.cache import cache
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from core.cache import cache_compartida
+from .models import ImagenPerfil, Usuario
+import hashlib
+
+
+class ImagenPerfilError(Exception):
+    """La imagen subida no es válida"""
+
+
+class ImagenPerfilService:
+    """Almacenamiento de fotos de perfil con miniaturas pregeneradas"""
+
+    # Tamaño máximo aceptado para la imagen subida
+    TAMANO_MAXIMO = 10 * 1024 * 1024
+
+    @staticmethod
+    def generar_variantes(datos):
+        """
+        Valida la imagen y genera todas sus variantes con Pillow
+
+        Returns:
+            tuple: (dict variante -> bytes, formato)
+
+        Raises:
+            ImagenPerfilError: Si los datos no son una imagen válida
+        """
+        if len(datos) > ImagenPerfilService.TAMANO_MAXIMO:
+            raise ImagenPerfilError('La imagen supera el tamaño máximo permitido (10 MB)')
+
+        try:
+            imagen = Image.open(BytesIO(datos))
+            imagen.load()
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+            raise ImagenPerfilError('El archivo no es una imagen válida') from e
+
+        # Respetar la orientación EXIF de las fotos de celular
+        imagen = ImageOps.exif_transpose(imagen)
+
+        # PNG si hay transparencia, JPEG en otro caso
+        if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+            imagen = imagen.convert('RGBA')
+            formato = 'PNG'
+        else:
+            imagen = imagen.convert('RGB')
+            formato = 'JPEG'
+
+        variantes = {}
+        for variante, lado in ImagenPerfil.VARIANTES.items():
+            copia = imagen.copy()
+            copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+            salida = BytesIO()
+            if formato == 'JPEG':
+                copia.save(salida, formato, quality=85, optimize=True)
+            else:
+                copia.save(salida, formato, optimize=True)
+            variantes[variante] = salida.getvalue()
+
+        return variantes, formato
+
+    @staticmethod
+    def guardar(usuario, datos):
+        """Guarda (o reemplaza) la foto de perfil de un usuario"""
+        variantes, formato = ImagenPerfilService.generar_variantes(datos)
+        imagen, _ = ImagenPerfil.objects.update_or_create(
+            usuario_id=usuario.pk,
+            defaults={
+                **variantes,
+                'formato': formato,
+                'hash': hashlib.sha256(variantes['original']).hexdigest(),
+            },
+        )
+        return imagen
+
+    @staticmethod
+    def eliminar(usuario):
+        ImagenPerfil.objects.filter(usuario_id=usuario.pk).delete()
+
+    @staticmethod
+    def metadatos(usuario_id):
+        """hash, formato y fecha de actualización, sin leer ninguna variante"""
+        return ImagenPerfil.objects.filter(usuario_id=usuario_id).values(
+            'hash', 'formato', 'actualizado'
+        ).first()
+
+    @staticmethod
+    def contenido(usuario_id, variante):
+        """Bytes de una sola variante (no se leen las demás columnas binarias)"""
+        if variante not in ImagenPerfil.VARIANTES:
+            return None
+        fila = ImagenPerfil.objects.filter(usuario_id=usuario_id).values_list(variante, 'formato').first()
+        if fila is None:
+            return None
+        return bytes(fila[0]), f"image/{fila[1].lower()}"
+
+
+class UsuarioCacheService:
+    """
+    Instantánea en caché del usuario autenticado junto con su moneda, usada por
+    EmailBackend.get_user para no cargar la fila completa con su moneda en cada request.
+
+    Sólo se guarda el perfil (nombres, moneda, preferencias). Los campos de los que depende
+    la autenticación (CAMPOS_AUTENTICACION) no se guardan: se leen de la base en cada
+    request con una consulta por clave primaria, así un cambio de contraseña o una
+    desactivación rige de inmediato en todos los procesos.
+    La instantánea se invalida al confirmar cambios del usuario (ver usuarios/signals.py),
+    por lo que sólo se usa con una caché compartida (core.cache.cache_compartida): con
+    LocMemCache la invalidación no llegaría a los demás procesos y el usuario se lee
+    completo de la base en cada request.
+    """
+
+    TIMEOUT = 60 * 15
+
+    # Columnas que casi ninguna página usa; se cargan bajo demanda si hacen falta
+    CAMPOS_DIFERIDOS = (
+        'documento_identidad',
+        'pin_acceso_rapido',
+        'codigo_recuperacion',
+        'codigo_expiracion',
+    )
+
+    # Hash de la sesión (password), acceso y permisos: siempre desde la base
+    CAMPOS_AUTENTICACION = ('password', 'is_active', 'is_staff', 'is_superuser')
+
+    @staticmethod
+    def clave(usuario_id):
+        return f'usuarios:sesion:{usuario_id}'
+
+    @staticmethod
+    def cargar(usuario_id):
+        """Una sola consulta: usuario + moneda, sin las columnas poco usadas ni las de autenticación"""
+        return Usuario.objects.select_related('id_moneda').defer(
+            *UsuarioCacheService.CAMPOS_DIFERIDOS,
+            *UsuarioCacheService.CAMPOS_AUTENTICACION,
+        ).get(pk=usuario_id)
+
+    @staticmethod
+    def obtener(usuario_id):
+        """
+        Usuario (con id_moneda ya resuelto): perfil desde la caché y campos de
+        autenticación desde la base de datos
+
+        Raises:
+            Usuario.DoesNotExist: Si el usuario no existe
+        """
+        if not cache_compartida():
+            return Usuario.objects.select_related('id_moneda').defer(
+                *UsuarioCacheService.CAMPOS_DIFERIDOS
+            ).get(pk=usuario_id)
+
+        autenticacion = Usuario.objects.filter(pk=usuario_id).values(
+            *UsuarioCacheService.CAMPOS_AUTENTICACION
+        ).first()
+        if autenticacion is None:
+            raise Usuario.DoesNotExist
+
+        clave = UsuarioCacheService.clave(usuario_id)
+        usuario = cache.get(clave)
+        if usuario is None:
+            usuario = UsuarioCacheService.cargar(usuario_id)
+            cache.set(clave, usuario, UsuarioCacheService.TIMEOUT)
+        for campo, valor in autenticacion.items():
+            setattr(usuario, campo, valor)
+        return usuario
+
+    @staticmethod
+    def invalidar(*usuario_ids):
+        if not cache_compartida():
+            return
+        cache.delete_many([UsuarioCacheService.clave(usuario_id) for usuario_id in usuario_ids])
+
+    @staticmethod
+    def invalidar_al_confirmar(*usuario_ids):
+        """Invalida al confirmar la transacción: antes, otra petición volvería a guardar los datos viejos"""
+        transaction.on_commit(lambda: UsuarioCacheService.invalidar(*usuario_ids))
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from cuentas.models import Moneda
+from .models import Usuario
+from .services import UsuarioCacheService
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario_en_cache(sender, instance, **kwargs):
+    """Descarta la instantánea en caché del usuario cuando cambia su perfil"""
+    UsuarioCacheService.invalidar_al_confirmar(instance.pk)
+
+@receiver(post_save, sender=Moneda)
+def invalidar_usuarios_de_moneda(sender, instance, created, **kwargs):
+    """La instantánea incluye la moneda: si se edita, descartar la de sus usuarios"""
+    if created:
+        return
+    UsuarioCacheService.invalidar_al_confirmar(
+        *Usuario.objects.filter(id_moneda=instance).values_list('id', flat=True)
+    )
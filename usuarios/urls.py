@@ -29,6 +29,9 @@ urlpatterns = [
     path('complete-onboarding/', views.complete_onboarding, name='complete_onboarding'),
     path('fix-onboarding/', views.fix_incomplete_onboarding, name='fix_onboarding'),
     
+    # Foto de perfil
+    path('imagen-perfil/<int:usuario_id>/<str:variante>/', views.imagen_perfil, name='imagen_perfil'),
+    
     # Utilidades y pruebas
     path('test/', views.test_view, name='test'),
     
@@ -1,14 +1,18 @@
 from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate , login
 from django.core.mail import send_mail
 from django.conf import settings
 
 from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
 
 from cuentas.models import Moneda, Cuenta
 from .models import Usuario
+from .services import ImagenPerfilService, ImagenPerfilError
 import random
 import json
 
@@ -185,12 +189,6 @@ def Register(request):
             error = "El saldo inicial debe ser un número válido."
             return render(request, "usuarios/register_simple.html", {"error": error, 'monedas': monedas})
 
-        if imagen_perfil:
-            import base64
-            imagen_b64 = base64.b64encode(imagen_perfil.read()).decode('utf-8')
-        else:
-            imagen_b64 = None
-
         if Usuario.objects.filter(correo=correo).exists():
             error = "El correo ya está registrado."
             return render(request, "usuarios/register_simple.html", {"error": error, 'monedas': monedas})
@@ -208,13 +206,19 @@ def Register(request):
                 password=contrasena,
                 telefono=int(telefono) if telefono else 0,  # Convertir a int o usar 0
                 pin_acceso_rapido=pin_acceso_rapido or '000000',  # PIN por defecto
-                imagen_perfil=imagen_b64,
                 email_verificado=True,  # Ya verificamos el correo con el código
                 id_moneda=moneda_obj
             )
             
             print(f"🔍 DEBUG: Usuario creado: {nuevo_usuario.correo}")
             
+            if imagen_perfil:
+                try:
+                    ImagenPerfilService.guardar(nuevo_usuario, imagen_perfil.read())
+                except ImagenPerfilError as e:
+                    # La foto es opcional: no bloquear el registro por una imagen inválida
+                    print(f"⚠️ Imagen de perfil ignorada: {e}")
+            
             # Crear la cuenta principal
             nueva_cuenta = Cuenta.objects.create(
                 id_usuario=nuevo_usuario,
@@ -329,12 +333,17 @@ def Verificacion_Correo(request):
                 correo=data['correo'],
                 password=data['contrasena'],
                 telefono=data['telefono'],
-                imagen_perfil=imagen_binario,
                 pin_acceso_rapido=data['pin_acceso_rapido'],
                 email_verificado=True,
                 id_moneda=moneda
             )
 
+            if imagen_binario:
+                try:
+                    ImagenPerfilService.guardar(usuario, imagen_binario)
+                except ImagenPerfilError as e:
+                    print(f"⚠️ Imagen de perfil ignorada: {e}")
+
             Cuenta.objects.create(
                 id_usuario=usuario,
                 nombre=data['nombre_cuenta'],
@@ -755,3 +764,38 @@ def test_view(request):
     except Exception as e:
         from django.http import HttpResponse
         return HttpResponse(f"Vista de prueba no disponible: {str(e)}", status=503)
+
+
+def _metadatos_imagen(request, usuario_id, variante):
+    if not request.user.is_authenticated or request.user.pk != usuario_id:
+        return None
+    # Se guarda en el request para que ETag y Last-Modified usen una sola consulta
+    if not hasattr(request, '_imagen_perfil'):
+        request._imagen_perfil = ImagenPerfilService.metadatos(usuario_id)
+    return request._imagen_perfil
+
+
+def _etag_imagen(request, usuario_id, variante):
+    metadatos = _metadatos_imagen(request, usuario_id, variante)
+    return f"{metadatos['hash']}-{variante}" if metadatos else None
+
+
+def _ultima_modificacion_imagen(request, usuario_id, variante):
+    metadatos = _metadatos_imagen(request, usuario_id, variante)
+    return metadatos['actualizado'] if metadatos else None
+
+
+@login_required
+@condition(etag_func=_etag_imagen, last_modified_func=_ultima_modificacion_imagen)
+def imagen_perfil(request, usuario_id, variante='mediana'):
+    """Sirve una variante de la foto de perfil con ETag/Last-Modified (responde 304 si no cambió)"""
+    if request.user.pk != usuario_id:
+        raise Http404
+    resultado = ImagenPerfilService.contenido(usuario_id, variante)
+    if resultado is None:
+        raise Http404
+    datos, content_type = resultado
+    response = HttpResponse(datos, content_type=content_type)
+    # La URL incluye el hash como versión, así que el navegador puede reutilizarla
+    patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 30)
+    return response